@@ -0,0 +1,480 @@
+"""
+多视频批处理
+一次处理一个目录（或清单）中的全部视频：各视频在独立线程中并发解码和颜色检测，
+OCR批次经公平调度器送入同一个常驻OCR进程池（模型只加载一次），每个视频写一个结果CSV，最后写汇总
+"""
+
+import argparse
+import collections
+import csv
+import dataclasses
+import io
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Deque, Dict, List, Optional, Tuple
+from video_preprocessor import FrameData
+from ocr_worker_pool import OCRWorkerPool
+from ocr_server import RemoteOCRPool
+from main_coordinator import MainCoordinator
+from config import (MAX_WORKERS, OCR_MODE, OCR_CACHE_ENABLED, PREPROCESS_WORKERS, DECODE_BACKEND, PROBE_MODE,
+                    PROBE_STEP, USE_FRAME_INDEX, OCR_TRANSPORT, SAMPLING_SCHEDULER, BISECT_STEP,
+                    BATCH_MAX_CONCURRENT_VIDEOS, BATCH_OCR_MAX_INFLIGHT, BATCH_VIDEO_EXTENSIONS, BATCH_SUMMARY_FILE)
+
+SUMMARY_CSV_HEADERS = ['视频', '优先级', '状态', '结果文件', '字幕数', '处理帧数', 'OCR任务数',
+                       '排队等待(秒)', '耗时(秒)', '错误']
+
+
+@dataclasses.dataclass
+class BatchJob:
+    """批处理中的一个视频（priority 越大越优先）及其处理结果"""
+    video_path: str
+    priority: int = 0
+    lut_path: Optional[str] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    output_file: Optional[str] = None  # 为空时为输出目录下的默认结果文件名
+
+    status: str = '等待'
+    caption_count: int = 0
+    total_frames: int = 0
+    ocr_tasks: int = 0
+    queue_wait_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    error: str = ''
+
+    @property
+    def name(self) -> str:
+        """视频文件名（不含扩展名）"""
+        return os.path.splitext(os.path.basename(self.video_path))[0]
+
+    def log_path(self, output_dir: str) -> str:
+        """处理日志文件：指定了结果文件时与其同名，否则为输出目录下的 <视频名>.log"""
+        if self.output_file:
+            return os.path.splitext(self.output_file)[0] + '.log'
+        return os.path.join(output_dir, f"{self.name}.log")
+
+
+def load_jobs(input_path: str) -> List[BatchJob]:
+    """
+    读取批处理任务
+
+    input_path 为目录时收集其中扩展名在 BATCH_VIDEO_EXTENSIONS 中的视频（按文件名排序，优先级均为0）；
+    为 JSON 清单时，清单是列表，每项为视频路径，或包含 video_path 及可选的
+    priority、lut_path、start_time、end_time、output_file 的对象（相对路径相对于清单所在目录）。
+    """
+    if os.path.isdir(input_path):
+        return [BatchJob(os.path.join(input_path, name)) for name in sorted(os.listdir(input_path))
+                if os.path.splitext(name)[1].lower() in BATCH_VIDEO_EXTENSIONS]
+
+    with open(input_path, encoding='utf-8') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"批处理清单必须是列表: {input_path}")
+
+    base_dir = os.path.dirname(os.path.abspath(input_path))
+    jobs = []
+    for entry in entries:
+        fields = {'video_path': entry} if isinstance(entry, str) else dict(entry)
+        unknown = set(fields) - {'video_path', 'priority', 'lut_path', 'start_time', 'end_time', 'output_file'}
+        if 'video_path' not in fields or unknown:
+            raise ValueError(f"无效的清单项: {entry}")
+        for key in ('video_path', 'lut_path', 'output_file'):
+            if fields.get(key):
+                fields[key] = os.path.join(base_dir, fields[key])
+        jobs.append(BatchJob(**fields))
+    return jobs
+
+
+class ScheduledOCRClient:
+    """
+    单个视频的OCR提交端（与 OCRWorkerPool 接口相同，作为 ocr_pool 传给 MainCoordinator）
+
+    submit 只把批次交给调度器排队，返回的 future 在批次实际由进程池处理完成后得到结果。
+    """
+
+    def __init__(self, scheduler: 'FairOCRScheduler', name: str, priority: int, order: int):
+        """由 FairOCRScheduler.client 创建"""
+        self.scheduler = scheduler
+        self.name = name
+        self.priority = priority
+        self.order = order  # 注册顺序，优先级和虚拟时间都相同时先注册的先调度
+        self.ocr_mode = scheduler.pool.ocr_mode
+        self.use_cache = scheduler.pool.use_cache
+
+        # 排队中的批次: (批次, 共享内存描述, 返回给调用方的 future, 入队时间)
+        self.queue: Deque[Tuple[List[FrameData], Optional[Tuple[str, int, int]], Future, float]] = collections.deque()
+        self.virtual_tasks = 0  # 公平调度的虚拟时间（已调度的任务数，按入队时的全局进度对齐）
+
+        self.batches = 0
+        self.tasks = 0
+        self.ocr_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+
+    def submit(self, frame_data_batch: List[FrameData],
+               ring_spec: Optional[Tuple[str, int, int]] = None) -> Future:
+        """提交一个OCR批次（排队等待调度），future 的结果为 (OCR结果列表, 批次统计)"""
+        return self.scheduler.enqueue(self, frame_data_batch, ring_spec)
+
+    def record(self, stats: dict):
+        """汇总一个已完成批次的统计（同时计入共享进程池）"""
+        with self.scheduler.condition:
+            self.scheduler.pool.record(stats)
+            self.batches += 1
+            self.tasks += stats['tasks']
+            self.ocr_seconds += stats['ocr_seconds']
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """共享进程池的缓存统计（各视频共用子进程，无法按视频区分）"""
+        with self.scheduler.condition:
+            return self.scheduler.pool.get_cache_stats()
+
+    def print_stats(self):
+        """打印本视频的调度与OCR统计"""
+        avg_task_ms = self.ocr_seconds / self.tasks * 1000 if self.tasks else 0.0
+        print(f"OCR调度: {self.batches} 个批次，{self.tasks} 个任务，单任务平均 {avg_task_ms:.1f} 毫秒，"
+              f"排队等待共 {self.queue_wait_seconds:.2f} 秒 (优先级 {self.priority})")
+
+
+class FairOCRScheduler:
+    """
+    多个视频共用一个OCR进程池的批次调度器
+
+    各视频提交的批次先在各自的队列中排队，调度线程保持进程池中最多 max_inflight 个批次：
+    优先级高的视频有排队批次时总是先调度（插队），优先级相同的视频按虚拟时间（已调度任务数）
+    轮流调度，新加入或空闲后重新提交的视频从当前全局进度开始计数，不会因此独占进程池。
+    各视频自身的在途批次仍由 MainCoordinator 的背压限制，解码快的视频不会无限排队。
+    """
+
+    def __init__(self, pool: OCRWorkerPool, max_inflight: int = BATCH_OCR_MAX_INFLIGHT):
+        """启动调度线程"""
+        self.pool = pool
+        self.max_inflight = max(1, max_inflight)
+        self.condition = threading.Condition()
+        self.clients: List[ScheduledOCRClient] = []
+        self.inflight = 0
+        self.virtual_time = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._dispatch_loop, name='ocr-scheduler', daemon=True)
+        self.thread.start()
+
+    def client(self, name: str, priority: int = 0) -> ScheduledOCRClient:
+        """为一个视频创建提交端"""
+        with self.condition:
+            client = ScheduledOCRClient(self, name, priority, len(self.clients))
+            self.clients.append(client)
+            return client
+
+    def enqueue(self, client: ScheduledOCRClient, batch: List[FrameData],
+                ring_spec: Optional[Tuple[str, int, int]]) -> Future:
+        """批次入队，返回其结果 future"""
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("OCR调度器已关闭")
+            if not client.queue:
+                client.virtual_tasks = max(client.virtual_tasks, self.virtual_time)
+            client.queue.append((batch, ring_spec, future, time.time()))
+            self.condition.notify_all()
+        return future
+
+    def _next_client(self) -> Optional[ScheduledOCRClient]:
+        """选出下一个调度的视频：优先级最高，其次虚拟时间最小"""
+        waiting = [client for client in self.clients if client.queue]
+        if not waiting:
+            return None
+        return min(waiting, key=lambda client: (-client.priority, client.virtual_tasks, client.order))
+
+    def _dispatch_loop(self):
+        """调度线程：进程池有空位时提交下一个排队批次"""
+        while True:
+            with self.condition:
+                client = self._next_client() if self.inflight < self.max_inflight else None
+                while client is None:
+                    if self.closed and self.inflight == 0 and not any(c.queue for c in self.clients):
+                        return
+                    self.condition.wait()
+                    client = self._next_client() if self.inflight < self.max_inflight else None
+
+                batch, ring_spec, future, enqueued_at = client.queue.popleft()
+                client.queue_wait_seconds += time.time() - enqueued_at
+                self.virtual_time = client.virtual_tasks
+                client.virtual_tasks += len(batch)
+                self.inflight += 1
+
+            try:
+                pool_future = self.pool.submit(batch, ring_spec)
+            except Exception as e:
+                with self.condition:
+                    self.inflight -= 1
+                future.set_exception(e)
+                continue
+            pool_future.add_done_callback(lambda done, future=future: self._on_batch_done(done, future))
+
+    def _on_batch_done(self, pool_future: Future, future: Future):
+        """进程池中的批次完成：释放一个调度空位，把结果转交给提交方"""
+        with self.condition:
+            self.inflight -= 1
+            self.condition.notify_all()
+        exception = pool_future.exception()
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(pool_future.result())
+
+    def close(self):
+        """等待排队和在途批次全部提交完成后停止调度线程"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+
+class ThreadLogRouter(io.TextIOBase):
+    """按线程分流的标准输出：视频处理线程的输出写入各自的日志文件，其余线程写原来的标准输出"""
+
+    def __init__(self, stream):
+        """stream 为原来的标准输出"""
+        self.stream = stream
+        self.files: Dict[int, io.TextIOBase] = {}
+
+    def register(self, log_file):
+        """当前线程的输出改写到 log_file"""
+        self.files[threading.get_ident()] = log_file
+
+    def unregister(self):
+        """当前线程的输出恢复到原来的标准输出"""
+        self.files.pop(threading.get_ident(), None)
+
+    def _target(self):
+        return self.files.get(threading.get_ident(), self.stream)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+
+class BatchRunner:
+    """多视频批处理：共用一个常驻OCR进程池，多个视频的解码阶段并发进行"""
+
+    def __init__(self, jobs: List[BatchJob], output_dir: str = '.',
+                 max_concurrent_videos: int = BATCH_MAX_CONCURRENT_VIDEOS,
+                 max_inflight: int = BATCH_OCR_MAX_INFLIGHT, ocr_pool: Optional[OCRWorkerPool] = None,
+                 ocr_workers: int = MAX_WORKERS, ocr_mode: str = OCR_MODE, use_ocr_cache: bool = OCR_CACHE_ENABLED,
+                 **coordinator_options):
+        """
+        初始化批处理（ocr_pool 为空时启动一个本次批处理专用的进程池）
+
+        coordinator_options 为传给每个 MainCoordinator 的其余参数（解码后端、采样调度、续跑等）
+        """
+        # 默认的结果文件名和日志文件名由视频文件名决定，重名的视频会相互覆盖
+        log_paths = [os.path.abspath(job.log_path(output_dir)) for job in jobs]
+        duplicates = {path for path in log_paths if log_paths.count(path) > 1}
+        if duplicates:
+            raise ValueError(f"批处理中有重名的视频，结果文件会相互覆盖（可在清单中指定 output_file）: "
+                             f"{sorted(duplicates)}")
+
+        self.jobs = jobs
+        self.output_dir = output_dir
+        self.max_concurrent_videos = max(1, max_concurrent_videos)
+        self.max_inflight = max_inflight
+        self.ocr_pool = ocr_pool
+        self.ocr_workers = ocr_workers
+        self.ocr_mode = ocr_mode
+        self.use_ocr_cache = use_ocr_cache
+        self.coordinator_options = coordinator_options
+        self.scheduler: Optional[FairOCRScheduler] = None
+        self.log_router: Optional[ThreadLogRouter] = None
+
+    def run(self, summary_file: Optional[str] = None) -> str:
+        """处理全部视频，返回汇总文件路径（单个视频失败不影响其他视频）"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        summary_file = summary_file or os.path.join(self.output_dir, BATCH_SUMMARY_FILE)
+        start_time = time.time()
+
+        # 优先级高的视频先开始解码（同优先级保持清单顺序）
+        ordered_jobs = sorted(self.jobs, key=lambda job: -job.priority)
+        print(f"批处理: {len(ordered_jobs)} 个视频，同时解码 {self.max_concurrent_videos} 个，"
+              f"共用 {self.ocr_pool.max_workers if self.ocr_pool else self.ocr_workers} 个OCR进程")
+
+        pool = self.ocr_pool or OCRWorkerPool(self.ocr_workers, ocr_mode=self.ocr_mode, use_cache=self.use_ocr_cache)
+        self.scheduler = FairOCRScheduler(pool, self.max_inflight)
+        self.log_router = ThreadLogRouter(sys.stdout)
+        sys.stdout = self.log_router
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrent_videos, thread_name_prefix='video') as executor:
+                pending = {executor.submit(self._run_job, job) for job in ordered_jobs}
+                while pending:
+                    done, pending = wait(pending, timeout=2.0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                    self._print_progress(start_time)
+        finally:
+            sys.stdout = self.log_router.stream
+            self.scheduler.close()
+            if pool is not self.ocr_pool:
+                pool.shutdown()
+
+        elapsed_time = time.time() - start_time
+        self.save_summary(summary_file)
+
+        failed = [job for job in self.jobs if job.status != '完成']
+        total_frames = sum(job.total_frames for job in self.jobs)
+        total_tasks = sum(job.ocr_tasks for job in self.jobs)
+        print("\n=== 批处理完成 ===")
+        print(f"总耗时: {elapsed_time:.2f} 秒，完成 {len(self.jobs) - len(failed)}/{len(self.jobs)} 个视频")
+        print(f"吞吐量: {total_frames / max(elapsed_time, 1e-9):.1f} 帧/秒，"
+              f"{total_tasks / max(elapsed_time, 1e-9):.1f} OCR任务/秒")
+        pool.print_stats()
+        for job in failed:
+            print(f"失败: {job.video_path}: {job.error}")
+        print(f"汇总文件: {summary_file}")
+        return summary_file
+
+    def _run_job(self, job: BatchJob):
+        """在视频线程中处理一个视频（输出写入该视频的日志文件）"""
+        job_start = time.time()
+        job.status = '处理中'
+        log_path = job.log_path(self.output_dir)
+        client = self.scheduler.client(job.name, job.priority)
+
+        with open(log_path, 'w', encoding='utf-8') as log_file:
+            self.log_router.register(log_file)
+            try:
+                coordinator = MainCoordinator(job.video_path, job.lut_path, job.start_time, job.end_time,
+                                              ocr_pool=client, **self.coordinator_options)
+                job.total_frames = coordinator.preprocessor.total_frames_to_process
+                output_file = job.output_file or os.path.join(
+                    self.output_dir, coordinator.result_processor.default_output_file())
+                coordinator.run(parallel=True, output_file=output_file)
+
+                job.output_file = coordinator.run_stats['output_file']
+                job.caption_count = coordinator.run_stats['caption_count']
+                job.status = '完成'
+            except Exception as e:
+                job.status = '失败'
+                job.error = str(e)
+                traceback.print_exc(file=log_file)
+            finally:
+                self.log_router.unregister()
+                job.ocr_tasks = client.tasks
+                job.queue_wait_seconds = client.queue_wait_seconds
+                job.elapsed_seconds = time.time() - job_start
+
+        print(f"\r[{job.status}] {job.video_path} ({job.elapsed_seconds:.2f} 秒，{job.caption_count} 条字幕，"
+              f"日志: {log_path})")
+
+    def _print_progress(self, start_time: float):
+        """打印批处理整体进度"""
+        done = sum(1 for job in self.jobs if job.status in ('完成', '失败'))
+        running = sum(1 for job in self.jobs if job.status == '处理中')
+        with self.scheduler.condition:
+            tasks = sum(client.tasks for client in self.scheduler.clients)
+        elapsed_time = time.time() - start_time
+        print(f"\r批处理进度: 完成 {done}/{len(self.jobs)} 个视频，处理中 {running} 个，"
+              f"OCR已完成 {tasks} 个任务 ({tasks / max(elapsed_time, 1e-9):.1f} 任务/秒)", end="", flush=True)
+
+    def save_summary(self, summary_file: str):
+        """写批处理汇总CSV（每个视频一行，按清单顺序）"""
+        with open(summary_file, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(SUMMARY_CSV_HEADERS)
+            for job in self.jobs:
+                writer.writerow([job.video_path, job.priority, job.status, job.output_file or '',
+                                 job.caption_count, job.total_frames, job.ocr_tasks,
+                                 f"{job.queue_wait_seconds:.2f}", f"{job.elapsed_seconds:.2f}", job.error])
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='多视频批处理：共用一个常驻OCR进程池处理目录或清单中的全部视频')
+    parser.add_argument('--input', '-i', type=str, required=True,
+                        help='视频目录，或JSON清单（每项为视频路径或含 video_path/priority 等字段的对象）')
+    parser.add_argument('--output_dir', '-o', type=str, default='.', help='结果文件、日志和汇总文件的目录')
+    parser.add_argument('--summary', type=str, default=None, help=f'汇总文件路径（默认为输出目录下的 {BATCH_SUMMARY_FILE}）')
+    parser.add_argument('--lut_path', '-l', type=str, help='LUT文件路径（清单项未指定时使用）')
+    parser.add_argument('--max_videos', type=int, default=BATCH_MAX_CONCURRENT_VIDEOS, help='同时解码的视频数')
+    parser.add_argument('--ocr_workers', type=int, default=MAX_WORKERS, help='共用的OCR进程数')
+    parser.add_argument('--max_inflight', type=int, default=BATCH_OCR_MAX_INFLIGHT,
+                        help='提交到OCR进程池的批次上限（越小优先级生效越及时）')
+    parser.add_argument('--preprocess_workers', '-p', type=int, default=PREPROCESS_WORKERS,
+                        help='每个视频分段并行预处理的进程数 (1 = 单进程解码)')
+    parser.add_argument('--decode_backend', type=str, choices=['opencv', 'ffmpeg'], default=DECODE_BACKEND,
+                        help='解码后端: opencv 解码整帧，ffmpeg 只解码ROI条带（不可用时回退到OpenCV）')
+    parser.add_argument('--two_pass', action='store_true', help='两遍扫描：先低频探测，只在有字幕的区间全帧率处理')
+    parser.add_argument('--probe_step', type=int, default=PROBE_STEP, help='两遍扫描第一遍的探测间隔(帧)')
+    parser.add_argument('--probe_mode', type=str, choices=['step', 'keyframes'], default=PROBE_MODE,
+                        help='两遍扫描第一遍的探测方式: step 每隔 probe_step 帧，keyframes 仅关键帧（需要 --frame_index）')
+    parser.add_argument('--frame_index', action='store_true', default=USE_FRAME_INDEX,
+                        help='使用帧索引文件（关键帧位置与PTS映射，首次运行时建立）加速随机访问')
+    parser.add_argument('--ocr_transport', type=str, choices=['shm', 'png'], default=OCR_TRANSPORT,
+                        help='OCR图像传输方式: shm 原始像素经共享内存传递，png PNG编码后序列化传递')
+    parser.add_argument('--ocr_mode', type=str, choices=['full', 'rec_only'], default=OCR_MODE,
+                        help='OCR模式: full 检测+识别，rec_only 单行字幕跳过文本检测（低置信度或多行时回退）')
+    parser.add_argument('--sampler', type=str, choices=['alternate', 'adaptive'], default=SAMPLING_SCHEDULER,
+                        help='OCR采样调度: alternate 每隔一帧检测，adaptive 字幕出现/变化时密集采样、稳定后指数退避')
+    parser.add_argument('--bisect_step', type=int, default=None,
+                        help=f'入点模式：每隔N帧采样（建议 {BISECT_STEP}），二分定位字幕入点，只对入点帧OCR')
+    parser.add_argument('--no_ocr_cache', action='store_true', help='不使用OCR结果缓存（每帧都重新识别）')
+    parser.add_argument('--resume', action='store_true', help='各视频从上次中断的处理继续（已完成的视频也会重新输出结果）')
+    parser.add_argument('--ocr_server', type=str, default=None,
+                        help='使用常驻OCR服务（ocr_server.py）的地址代替本地OCR进程池，例如 http://127.0.0.1:8766')
+
+    args = parser.parse_args()
+
+    ocr_pool = None
+    try:
+        jobs = load_jobs(args.input)
+        if not jobs:
+            print(f"错误: {args.input} 中没有视频")
+            return 1
+        for job in jobs:
+            job.lut_path = job.lut_path or args.lut_path
+        # 使用OCR服务时OCR模式和缓存设置以服务为准
+        ocr_pool = RemoteOCRPool(args.ocr_server) if args.ocr_server else None
+
+        runner = BatchRunner(
+            jobs, args.output_dir,
+            max_concurrent_videos=args.max_videos,
+            max_inflight=args.max_inflight,
+            ocr_workers=args.ocr_workers,
+            ocr_mode=args.ocr_mode,
+            use_ocr_cache=OCR_CACHE_ENABLED and not args.no_ocr_cache,
+            preprocess_workers=args.preprocess_workers,
+            decode_backend=args.decode_backend,
+            two_pass=args.two_pass,
+            probe_mode=args.probe_mode,
+            probe_step=args.probe_step,
+            use_frame_index=args.frame_index,
+            ocr_transport=args.ocr_transport,
+            sampler=args.sampler,
+            bisect_step=args.bisect_step,
+            resume=args.resume,
+            ocr_pool=ocr_pool
+        )
+        runner.run(args.summary)
+
+        if any(job.status != '完成' for job in jobs):
+            return 1
+
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        return 1
+    finally:
+        if ocr_pool:
+            ocr_pool.shutdown()
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
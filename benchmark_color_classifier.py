@@ -0,0 +1,101 @@
+"""
+颜色分类基准测试
+比较预编译查找表与逐帧HLS转换两种分类方式在字幕ROI上的耗时，并核对输出是否一致
+"""
+
+import argparse
+import time
+from typing import List, Tuple
+import cv2
+import numpy as np
+from color_classifier import ColorClassifier
+from config import ROI_TOP_RATIO, ROI_RIGHT_RATIO
+
+
+def make_roi_samples(height: int, width: int, seed: int = 0) -> List[Tuple[str, np.ndarray]]:
+    """生成测试ROI：黑底字幕（常见情况）与随机噪声（最坏情况）"""
+    rng = np.random.default_rng(seed)
+
+    caption = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.putText(caption, "VFX:shot_010_comp", (20, height * 2 // 5), cv2.FONT_HERSHEY_SIMPLEX,
+                height / 60, (60, 220, 60), max(1, height // 30))
+    cv2.putText(caption, "DI:grade_reel1", (20, height * 4 // 5), cv2.FONT_HERSHEY_SIMPLEX,
+                height / 60, (40, 140, 230), max(1, height // 30))
+
+    noise = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    return [('字幕', caption), ('噪声', noise)]
+
+
+def load_video_rois(video_path: str, count: int) -> List[Tuple[str, np.ndarray]]:
+    """从实际视频中均匀抽取 count 帧的字幕条带ROI（与 VideoPreprocessor.extract_roi 相同的范围）"""
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    rois = []
+    for frame_number in np.linspace(0, max(total_frames - 1, 0), count).astype(int):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_number))
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        height, width = frame.shape[:2]
+        roi = frame[0:int(height * ROI_TOP_RATIO), int(width * ROI_RIGHT_RATIO):width]
+        rois.append((f"帧{frame_number}", np.ascontiguousarray(roi)))
+    cap.release()
+    return rois
+
+
+def time_classify(classify, roi: np.ndarray, repeat: int) -> float:
+    """单次分类的平均耗时（毫秒）"""
+    classify(roi)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        classify(roi)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def benchmark_classifiers(samples: List[Tuple[str, np.ndarray]], repeat: int, recommend: bool):
+    """测量查找表编译耗时，以及两种方式在各测试ROI上的分类耗时"""
+    start = time.perf_counter()
+    classifier = ColorClassifier(method='table')
+    build_seconds = time.perf_counter() - start
+    print(f"查找表编译: {build_seconds:.2f} 秒，{classifier.table.nbytes / (1 << 20):.0f} MB（每个进程一次）")
+
+    print(f"{'ROI':>10} {'尺寸':>12} {'查找表(ms)':>12} {'HLS(ms)':>10} {'输出一致':>8}")
+    totals = {'table': 0.0, 'hls': 0.0}
+    for name, roi in samples:
+        table_ms = time_classify(classifier.classify, roi, repeat)
+        hls_ms = time_classify(classifier.classify_hls, roi, repeat)
+        totals['table'] += table_ms
+        totals['hls'] += hls_ms
+        identical = '是' if all(np.array_equal(a, b) for (_, a), (_, b) in
+                               zip(classifier.classify(roi), classifier.classify_hls(roi))) else '否'
+        size = f"{roi.shape[0]}x{roi.shape[1]}"
+        print(f"{name:>10} {size:>12} {table_ms:>12.3f} {hls_ms:>10.3f} {identical:>8}")
+
+    # 查找表的耗时取决于画面颜色的分布（颜色越分散缓存命中越差），只按实际素材给出建议
+    if recommend:
+        faster = min(totals, key=totals.get)
+        print(f"\n合计: 查找表 {totals['table']:.3f} ms，HLS {totals['hls']:.3f} ms，"
+              f"推荐 COLOR_CLASSIFIER = '{faster}'")
+    else:
+        print("\n合成ROI只反映两种极端情况，请用 --video 在实际素材上测量后再决定 COLOR_CLASSIFIER")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='颜色分类基准测试')
+    parser.add_argument('--video', help='从实际视频抽取ROI测量（不指定则使用合成ROI）')
+    parser.add_argument('--frames', type=int, default=20, help='从视频中抽取的帧数')
+    parser.add_argument('--height', type=int, default=216, help='合成ROI高度')
+    parser.add_argument('--width', type=int, default=1920, help='合成ROI宽度')
+    parser.add_argument('--repeat', type=int, default=200, help='每种情况重复次数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    if args.video:
+        samples = load_video_rois(args.video, args.frames)
+    else:
+        samples = make_roi_samples(args.height, args.width, args.seed)
+    benchmark_classifiers(samples, args.repeat, recommend=bool(args.video))
+
+
+if __name__ == "__main__":
+    main()
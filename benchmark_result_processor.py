@@ -0,0 +1,377 @@
+"""
+结果后处理基准测试
+用合成的 OCRResult 测量后处理各步骤随结果数的扩展性，并与原有实现核对输出是否一致
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+import tracemalloc
+from typing import List
+from paddle_ocr_service import OCRResult
+from result_processor import ResultProcessor
+from result_store import ColumnarResults
+from text_normalizer import TextNormalizer
+from config import (CAPTION_MERGE_WINDOW, CAPTION_MAX_FRAME_GAP, CAPTION_IOU_THRESHOLD, CAPTION_MIN_FRAMES,
+                    TEXT_NORMALIZATION_RULES)
+
+# 合成结果使用的文本（含常见的识别混淆，相近文本之间相似度高于0.8）
+SYNTHETIC_TEXTS = {
+    'VFX': ['VFX:shot_010_comp', 'VFX:shot_010_comp_v2', 'VFX:shot_020_roto', 'VFX:shot_030_paint'],
+    'DI': ['DI:grade_reel1', 'DI:grade_reel1_v2', 'DI:grade_reel2', 'DI:sky_window'],
+}
+
+
+# 字幕的文本框：两两IoU都低于去重阈值
+SYNTHETIC_BBOXES = [(0, 0, 320, 32), (200, 0, 520, 32), (0, 40, 320, 72), (400, 40, 720, 72)]
+
+
+def make_synthetic_results(count: int, seed: int = 0, max_frame_step: int = 40,
+                           flicker: bool = False) -> List[OCRResult]:
+    """
+    生成按帧号排列的合成OCR结果（共享不可变字段以节省内存）
+
+    结果组成一条条字幕：每条字幕 CAPTION_MIN_FRAMES ~ 6 倍个结果，约两成是结果数不足的误检；
+    同一字幕相邻结果间隔 1 ~ max_frame_step 帧，字幕之间无间隙切换（换位置和文本）或间隔超过
+    CAPTION_MAX_FRAME_GAP 帧。flicker 为真时字幕的文本框时常跳到其他位置、文本时常误识别，
+    相邻结果常常文本不相似、需要比较文本框IoU（两者同时发生时字幕断开）
+    """
+    rng = random.Random(seed)
+    raw_ocr_data = {}
+    results = []
+    frame_number = 0
+
+    while len(results) < count:
+        if rng.random() < 0.2:
+            length = rng.randint(1, CAPTION_MIN_FRAMES - 1)
+        else:
+            length = rng.randint(CAPTION_MIN_FRAMES, CAPTION_MIN_FRAMES * 6)
+        text_type = 'VFX' if rng.random() < 0.5 else 'DI'
+        caption_text = rng.choice(SYNTHETIC_TEXTS[text_type])
+        if rng.random() < 0.3:
+            caption_text += str(rng.randint(0, 9))
+        caption_bbox = rng.choice(SYNTHETIC_BBOXES)
+
+        for _ in range(min(length, count - len(results))):
+            text, bbox = caption_text, caption_bbox
+            if flicker:
+                if rng.random() < 0.2:
+                    bbox = rng.choice(SYNTHETIC_BBOXES)
+                if rng.random() < 0.2:
+                    text = rng.choice(SYNTHETIC_TEXTS[text_type])
+            results.append(OCRResult(
+                frame_number=frame_number,
+                timecode='',
+                text=text,
+                pixel_count=rng.randint(700, 5000),
+                confidence=rng.choice([0.85, 0.9, 0.95, 0.99]),
+                text_type=text_type,
+                bbox=bbox,
+                roi_png_path='',
+                raw_ocr_data=raw_ocr_data
+            ))
+            frame_number += rng.randint(1, max_frame_step)
+
+        # 无间隙切换，或字幕消失一段时间
+        if rng.random() >= 0.3:
+            frame_number += rng.randint(CAPTION_MAX_FRAME_GAP + 1, 250)
+    return results
+
+
+def make_pipeline_results(count: int, seed: int = 0) -> List[OCRResult]:
+    """生成与OCR服务输出形状相同的结果（每个结果有自己的时间码、文本和 raw_ocr_data），用于测量内存"""
+    rng = random.Random(seed)
+    results = []
+    for frame_number in range(count):
+        text_type = 'VFX' if rng.random() < 0.5 else 'DI'
+        text = rng.choice(SYNTHETIC_TEXTS[text_type]) + str(frame_number // 50)
+        confidence = rng.choice([0.85, 0.9, 0.95, 0.99])
+        bbox = (rng.randint(0, 5), 0, rng.randint(315, 320), 32)
+        results.append(OCRResult(
+            frame_number=frame_number,
+            timecode=f"{frame_number // 90000:02d}:{frame_number // 1500 % 60:02d}:"
+                     f"{frame_number // 25 % 60:02d}:{frame_number % 25:02d}",
+            text=text,
+            pixel_count=rng.randint(700, 5000),
+            confidence=confidence,
+            text_type=text_type,
+            bbox=bbox,
+            roi_png_path='',
+            raw_ocr_data={'items': [{'text': text, 'score': confidence, 'bbox': bbox}],
+                          'avg_confidence': confidence}
+        ))
+    return results
+
+
+def merge_similar_texts_reference(processor: ResultProcessor, ocr_results: List[OCRResult],
+                                  max_frame_diff: int = CAPTION_MERGE_WINDOW) -> List[OCRResult]:
+    """原有的逐对比较实现（O(n²)），作为一致性核对的基准"""
+    merged = []
+    used_indices = set()
+
+    for i, result in enumerate(ocr_results):
+        if i in used_indices:
+            continue
+
+        similar_group = [result]
+        for j in range(i + 1, len(ocr_results)):
+            if j in used_indices:
+                continue
+
+            other = ocr_results[j]
+            similarity = processor._text_similarity(result.text, other.text)
+            time_diff = abs(result.frame_number - other.frame_number)
+            if result.text_type == other.text_type and similarity > 0.8 and time_diff <= max_frame_diff:
+                similar_group.append(other)
+                used_indices.add(j)
+
+        merged.append(processor._select_best_from_group(similar_group))
+
+    return merged
+
+
+def process_text_reference(text: str, text_type: str) -> str:
+    """原有的逐条 str.replace 实现（ResultProcessor.process_text），作为一致性核对的基准"""
+    if not text:
+        return ""
+
+    if text_type == "VFX":
+        # 替换各种变体
+        text = text.replace('VEX:', 'VFX:')
+        text = text.replace('VFX;', 'VFX:')
+        text = text.replace('VEX;', 'VFX:')
+        text = text.replace('VFX.', 'VFX:')  # 处理点号
+        text = text.replace('VEX.', 'VFX:')
+        text = text.replace('FX:', 'VFX:')
+        text = text.replace('VVFX:', 'VFX:')
+
+        # 如果不以"VFX:"开头，但以"VFX"开头，添加冒号
+        if not text.startswith('VFX:') and text.startswith('VFX'):
+            text = 'VFX:' + text[3:]
+        elif not text.startswith('VFX:'):
+            if text[:4].lower().replace(' ', '') in ['vfx', 'vex', 'vpx', 'vix']:
+                colon_pos = text.find(':')
+                semicolon_pos = text.find(';')
+                if colon_pos != -1:
+                    text = 'VFX:' + text[colon_pos + 1:]
+                elif semicolon_pos != -1:
+                    text = 'VFX:' + text[semicolon_pos + 1:]
+                else:
+                    text = 'VFX:' + text[4:]
+            else:
+                text = 'VFX:' + text
+    else:  # DI
+        text = text.replace('D1:', 'DI:')
+        text = text.replace('D1;', 'DI:')
+        text = text.replace('Di', 'DI:')
+        text = text.replace('Di;', 'DI:')
+        text = text.replace('Di:', 'DI:')
+        text = text.replace('Dl:', 'DI:')
+        text = text.replace('D|:', 'DI:')
+        text = text.replace('DL:', 'DI:')
+        text = text.replace('01:', 'DI:')
+        text = text.replace('DI;', 'DI:')
+        text = text.replace('D1;', 'DI:')
+        text = text.replace('Dl;', 'DI:')
+        text = text.replace('D|;', 'DI:')
+        text = text.replace('DL;', 'DI:')
+        text = text.replace('01;', 'DI:')
+        if not text.startswith('DI:') and text.startswith('DI'):
+            text = 'DI:' + text[3:]
+        elif not text.startswith('DI:'):
+            if text[:3].lower().replace(' ', '') in ['di', 'd1', 'dl', 'ol', 'oi', '01']:
+                colon_pos = text.find(':')
+                semicolon_pos = text.find(';')
+                if colon_pos != -1:
+                    text = 'DI:' + text[colon_pos + 1:]
+                elif semicolon_pos != -1:
+                    text = 'DI:' + text[semicolon_pos + 1:]
+                else:
+                    text = 'DI:' + text[3:]
+            else:
+                text = 'DI:' + text
+
+    return text
+
+
+def legacy_process_text_reference(text: str, text_type: str) -> str:
+    """原有的逐条 str.replace 实现（VideoOCRPaddle.process_text），作为一致性核对的基准"""
+    if not text:
+        return ""
+    if text_type == "VFX":
+        text = text.replace('VEX:', 'VFX:')
+        text = text.replace('VFX;', 'VFX:')
+        text = text.replace('VEX;', 'VFX:')
+        if not text.startswith('VFX:'):
+            if text[:4].lower().replace(' ', '') in ['vfx', 'vex', 'vpx', 'vix']:
+                colon_pos = text.find(':')
+                semicolon_pos = text.find(';')
+                if colon_pos != -1:
+                    text = 'VFX:' + text[colon_pos + 1:]
+                elif semicolon_pos != -1:
+                    text = 'VFX:' + text[semicolon_pos + 1:]
+                else:
+                    text = 'VFX:' + text[4:]
+            else:
+                text = 'VFX:' + text
+    else:
+        text = text.replace('D1:', 'DI:')
+        text = text.replace('Dl:', 'DI:')
+        text = text.replace('D|:', 'DI:')
+        text = text.replace('DL:', 'DI:')
+        text = text.replace('01:', 'DI:')
+        text = text.replace('DI;', 'DI:')
+        text = text.replace('D1;', 'DI:')
+        text = text.replace('Dl;', 'DI:')
+        text = text.replace('D|;', 'DI:')
+        text = text.replace('DL;', 'DI:')
+        text = text.replace('01;', 'DI:')
+        if not text.startswith('DI:'):
+            if text[:3].lower().replace(' ', '') in ['di', 'd1', 'dl', 'ol', 'oi', '01']:
+                colon_pos = text.find(':')
+                semicolon_pos = text.find(';')
+                if colon_pos != -1:
+                    text = 'DI:' + text[colon_pos + 1:]
+                elif semicolon_pos != -1:
+                    text = 'DI:' + text[semicolon_pos + 1:]
+                else:
+                    text = 'DI:' + text[3:]
+            else:
+                text = 'DI:' + text
+    return text
+
+
+def benchmark_merge_scaling(sizes: List[int], reference_limit: int, seed: int = 0):
+    """测量 merge_similar_texts 在不同结果数下的耗时；结果数不超过 reference_limit 时与原有实现核对"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor = ResultProcessor("benchmark")
+
+    print(f"{'结果数':>10} {'合并后':>10} {'索引实现(秒)':>14} {'逐对比较(秒)':>14} {'输出一致':>8}")
+    for size in sizes:
+        results = make_synthetic_results(size, seed)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            merged = processor.merge_similar_texts(results)
+        indexed_seconds = time.perf_counter() - start
+
+        reference_seconds, identical = '-', '-'
+        if size <= reference_limit:
+            start = time.perf_counter()
+            reference = merge_similar_texts_reference(processor, results)
+            reference_seconds = f"{time.perf_counter() - start:.3f}"
+            identical = '是' if len(reference) == len(merged) and all(
+                a is b for a, b in zip(reference, merged)) else '否'
+
+        print(f"{size:>10} {len(merged):>10} {indexed_seconds:>14.3f} {reference_seconds:>14} {identical:>8}")
+
+
+def benchmark_columnar_dedup(sizes: List[int], reference_limit: int, seed: int = 0, flicker: bool = False):
+    """测量列式存储上的连续帧去重耗时；结果数不超过 reference_limit 时与逐个结果的实现核对"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor = ResultProcessor("benchmark")
+
+    print(f"{'结果数':>10} {'保留':>8} {'建列(秒)':>10} {'列式去重(秒)':>14} {'逐个实现(秒)':>14} {'输出一致':>8}")
+    for size in sizes:
+        results = make_synthetic_results(size, seed, max_frame_step=3, flicker=flicker)
+
+        start = time.perf_counter()
+        store = ColumnarResults.from_results(results)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            best_rows, start_rows = processor.deduplicate_columnar(
+                store, CAPTION_MAX_FRAME_GAP, CAPTION_IOU_THRESHOLD, CAPTION_MIN_FRAMES)
+        columnar_seconds = time.perf_counter() - start
+
+        reference_seconds, identical = '-', '-'
+        if size <= reference_limit:
+            start_frames = [results[store.sources[row]].frame_number for row in start_rows.tolist()]
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                reference = processor.deduplicate_by_continuous_frames_iou(
+                    results, CAPTION_MAX_FRAME_GAP, CAPTION_IOU_THRESHOLD, CAPTION_MIN_FRAMES)
+            reference_seconds = f"{time.perf_counter() - start:.3f}"
+            identical = '是' if len(reference) == len(best_rows) and all(
+                result is results[store.sources[row]] and result.frame_number == frame_number
+                for result, row, frame_number in zip(reference, best_rows.tolist(), start_frames)) else '否'
+
+        print(f"{size:>10} {len(best_rows):>8} {build_seconds:>10.3f} {columnar_seconds:>14.3f} "
+              f"{reference_seconds:>14} {identical:>8}")
+
+
+def benchmark_result_memory(count: int, seed: int = 0):
+    """比较 OCRResult 列表与列式存储每个结果占用的内存"""
+    tracemalloc.start()
+    results = make_pipeline_results(count, seed)
+    list_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    store = ColumnarResults.from_results(results)
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"{count} 个结果: OCRResult 列表 {list_bytes / count:.0f} 字节/结果，"
+          f"列式存储 {store_bytes / count:.0f} 字节/结果（其中列数据 {store.column_bytes / count:.0f} 字节，"
+          f"其余为 {len(store.texts)} 个文本和 {len(store.timecodes)} 个时间码的驻留表）")
+
+
+def benchmark_text_normalization(count: int, seed: int = 0):
+    """比较原有实现、规则引擎（不记忆）与规则引擎（记忆）规范化 count 个OCR文本的耗时"""
+    rng = random.Random(seed)
+    results = make_synthetic_results(count, seed)
+    # 加入常见识别混淆，模拟OCR原始输出
+    confusions = [('VFX:', 'VEX;'), ('VFX:', 'FX:'), ('DI:', 'D1:'), ('DI:', 'Dl;'), ('DI:', '01:')]
+    texts = []
+    for result in results:
+        text = result.text
+        for canonical, confused in confusions:
+            if text.startswith(canonical) and rng.random() < 0.3:
+                text = confused + text[len(canonical):]
+        texts.append((text, result.text_type))
+
+    normalizer = TextNormalizer(TEXT_NORMALIZATION_RULES['refactored'])
+    timings = []
+    for name, normalize in (('原有实现', process_text_reference), ('规则引擎', normalizer._normalize),
+                            ('规则引擎+记忆', normalizer.normalize)):
+        start = time.perf_counter()
+        for text, text_type in texts:
+            normalize(text, text_type)
+        timings.append((name, time.perf_counter() - start))
+
+    info = normalizer.cache_info()
+    print(f"{count} 个文本（{info.currsize} 种不同文本）: " +
+          "，".join(f"{name} {seconds:.3f} 秒" for name, seconds in timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='结果后处理基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                        help='合成结果数')
+    parser.add_argument('--reference_limit', type=int, default=5000,
+                        help='结果数不超过该值时同时运行原有实现并核对输出')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    print("=== merge_similar_texts 扩展性 ===")
+    benchmark_merge_scaling(args.sizes, args.reference_limit, args.seed)
+
+    print("\n=== 列式存储连续帧去重 ===")
+    benchmark_columnar_dedup(args.sizes, max(args.sizes), args.seed)
+
+    print("\n=== 列式存储连续帧去重（文本框闪烁，大量位置需要比较IoU） ===")
+    benchmark_columnar_dedup(args.sizes, max(args.sizes), args.seed, flicker=True)
+
+    print("\n=== 每个结果的内存 ===")
+    benchmark_result_memory(min(max(args.sizes), 100000), args.seed)
+
+    print("\n=== 文本规范化 ===")
+    benchmark_text_normalization(min(max(args.sizes), 1000000), args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+颜色分类服务
+按字幕颜色的HLS范围分类像素；可选把HLS范围预编译为 BGR→类别位掩码 查找表，逐像素一次查表得到全部类别的位掩码
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple
+from config import CAPTION_COLOR_CLASSES, COLOR_CLASSIFIER
+
+# 已编译的查找表缓存（每个进程、每组颜色范围只编译一次）
+_TABLE_CACHE: Dict[tuple, np.ndarray] = {}
+
+# 位掩码表每个条目的位数，即最多支持的颜色类别数
+MAX_COLOR_CLASSES = 8
+
+
+def _ranges_key(color_classes: List[Tuple[str, np.ndarray, np.ndarray]]) -> tuple:
+    """颜色范围配置的缓存键"""
+    return tuple((name, tuple(int(v) for v in lower), tuple(int(v) for v in upper))
+                 for name, lower, upper in color_classes)
+
+
+def build_class_table(color_classes: List[Tuple[str, np.ndarray, np.ndarray]]) -> np.ndarray:
+    """
+    编译完整的 2^24 BGR→类别位掩码 查找表（16MB）
+
+    对全部 2^24 种BGR颜色执行一次与逐帧检测完全相同的 cvtColor + inRange，
+    因此查表结果与原始HLS路径逐像素一致。索引为 B | G << 8 | R << 16。
+    """
+    key = _ranges_key(color_classes)
+    if key in _TABLE_CACHE:
+        return _TABLE_CACHE[key]
+
+    if len(color_classes) > MAX_COLOR_CLASSES:
+        raise ValueError(f"颜色类别数超过上限 {MAX_COLOR_CLASSES}: {len(color_classes)}")
+
+    # 4096x4096 的图像恰好覆盖全部BGR颜色
+    codes = np.arange(1 << 24, dtype=np.uint32).reshape(4096, 4096)
+    all_colors = np.empty((4096, 4096, 3), dtype=np.uint8)
+    all_colors[..., 0] = codes & 0xFF
+    all_colors[..., 1] = (codes >> 8) & 0xFF
+    all_colors[..., 2] = (codes >> 16) & 0xFF
+    hls = cv2.cvtColor(all_colors, cv2.COLOR_BGR2HLS)
+
+    table = np.zeros(1 << 24, dtype=np.uint8)
+    for bit, (_, lower, upper) in enumerate(color_classes):
+        mask = cv2.inRange(hls, lower, upper).reshape(-1)
+        table[mask > 0] |= np.uint8(1 << bit)
+
+    _TABLE_CACHE[key] = table
+    return table
+
+
+class ColorClassifier:
+    """颜色分类器：输出每个字幕颜色类别的二值掩码"""
+
+    def __init__(self, color_classes: List[Tuple[str, np.ndarray, np.ndarray]] = CAPTION_COLOR_CLASSES,
+                 method: str = COLOR_CLASSIFIER):
+        """初始化颜色分类器"""
+        if method not in ('table', 'hls'):
+            raise ValueError(f"不支持的颜色分类方式: {method}")
+
+        self.color_classes = color_classes
+        self.method = method
+        self.table = build_class_table(color_classes) if method == 'table' else None
+
+    def classify(self, roi: np.ndarray) -> List[Tuple[str, np.ndarray]]:
+        """
+        返回 [(类别名, 0/255掩码)]，顺序与颜色类别配置一致
+
+        查找表路径每帧只查一次表，但每个类别仍要一次 bitwise_and + compare 提取位平面，
+        开销随类别数线性增长（与HLS路径每类一次 inRange 相当）。按类别存 0/255 的多通道表
+        虽然一次查表即得全部掩码，但二维表的逐像素gather慢数倍，实测不如逐类提取位平面。
+        """
+        if self.table is None:
+            return self.classify_hls(roi)
+
+        # BGR→BGRA 后按 uint32 读取，低24位即查表索引
+        bgra = cv2.cvtColor(roi, cv2.COLOR_BGR2BGRA)
+        codes = bgra.view(np.uint32)[..., 0] & 0xFFFFFF
+        class_bits = np.take(self.table, codes)
+
+        masks = []
+        for bit, (name, _, _) in enumerate(self.color_classes):
+            bit_plane = cv2.bitwise_and(class_bits, 1 << bit)
+            masks.append((name, cv2.compare(bit_plane, 0, cv2.CMP_GT)))
+        return masks
+
+    def classify_hls(self, roi: np.ndarray) -> List[Tuple[str, np.ndarray]]:
+        """原始路径：逐帧HLS转换 + 每个类别一次 inRange（查找表的参照实现）"""
+        hls = cv2.cvtColor(roi, cv2.COLOR_BGR2HLS)
+        return [(name, cv2.inRange(hls, lower, upper)) for name, lower, upper in self.color_classes]
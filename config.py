@@ -6,6 +6,12 @@ import numpy as np
 
 # 视频处理参数
 DEFAULT_FPS = 25.0
+DECODE_BACKEND = 'opencv'  # 解码后端: 'opencv'（整帧解码）或 'ffmpeg'（只解码ROI条带）
+FFMPEG_BINARY = 'ffmpeg'  # ffmpeg可执行文件路径
+FFMPEG_CROP_PADDING = 16  # ffmpeg预裁剪余量(像素)，保证ROI边缘的色度插值与整帧解码一致
+FORWARD_GRAB_LIMIT = 16  # 随机访问时目标帧在当前位置之后不超过该帧数则顺序grab，否则seek
+USE_FRAME_INDEX = False  # 是否使用帧索引（关键帧位置与PTS映射，首次运行时建立）
+FRAME_INDEX_SUFFIX = '.frameindex.json'  # 帧索引文件后缀（保存在视频文件旁）
 
 # ROI 区域参数
 ROI_TOP_RATIO = 0.06  # 视频高度的6%
@@ -20,29 +26,186 @@ UPPER_GREEN_HLS = np.array([75, 195, 255])
 LOWER_ORANGE_HLS = np.array([10, 106, 75])
 UPPER_ORANGE_HLS = np.array([25, 160, 245])
 
+# 字幕颜色类别：(文本类型, HLS下限, HLS上限)，按顺序检测，最多8类
+CAPTION_COLOR_CLASSES = [
+    ('VFX', LOWER_GREEN_HLS, UPPER_GREEN_HLS),
+    ('DI', LOWER_ORANGE_HLS, UPPER_ORANGE_HLS),
+]
+COLOR_CLASSIFIER = 'hls'  # 颜色分类方式: 'hls'（逐帧HLS转换）或 'table'（预编译BGR查找表，用 benchmark_color_classifier.py 实测更快时再启用）
+
 # 检测参数
 PIXEL_THRESHOLD = 680  # 像素阈值
 FRAME_WINDOW = 5  # 滑动窗口大小
 INCREASE_THRESHOLD = 2.0  # 增长阈值
 
+# 静态ROI跳过参数
+STATIC_ROI_SKIP = True  # 字幕条带未变化时复用上一次的颜色检测结果
+STATIC_ROI_DOWNSCALE = 4  # 变化检测的下采样倍数
+STATIC_ROI_MAX_DIFF = 2  # 下采样签名逐像素最大差值不超过该值视为未变化
+
+# 两遍扫描参数
+PROBE_MODE = 'step'  # 第一遍探测方式: 'step'（每隔PROBE_STEP帧）或 'keyframes'（仅关键帧，需要帧索引）
+PROBE_STEP = 10  # 第一遍探测间隔(帧)，应不大于最短字幕持续帧数
+PROBE_GUARD_FRAMES = 12  # 活跃区间两侧额外的保护带(帧)
+
+# 入点二分定位参数
+BISECT_STEP = 25  # 稀疏采样间隔(帧)，应不大于最短字幕持续帧数
+BISECT_SIGNATURE_DOWNSCALE = 8  # 颜色掩码签名的下采样倍数
+BISECT_SIGNATURE_MAX_DIFF = 128  # 掩码签名逐格差值都不超过该值（覆盖率变化不到一半）视为同一条字幕
+BISECT_MIN_CAPTION_FRAMES = 19  # 与密集扫描一致：隔帧采样持续19帧才能得到去重要求的10个连续结果
+BISECT_FALLBACK_FRAMES = 2  # 入点帧之外每条字幕再OCR的帧数（入点常在淡入中，识别失败或置信度过低时改用这些帧的结果）
+BISECT_FALLBACK_STEP = 4  # 备用帧之间以及与入点帧的间隔(帧)
+
 # LUT文件路径
 DEFAULT_LUT_PATH = "/Users/sbr/Desktop/JXXS_OCR/JXXS_OCR.cube"
+LUT_TABLE_BITS = 7  # LUT查找表每通道量化位数（8 = 与浮点三线性插值逐像素一致，表大小48MB）
 
 # PaddleOCR 参数
 OCR_LANG = 'ch'
 OCR_USE_TEXTLINE_ORIENTATION = False
 OCR_USE_DOC_UNWARPER = False
+OCR_WARMUP = True  # OCR进程启动时用空白图像预热一次推理
+OCR_REC_BATCH_SIZE = 8  # PaddleOCR识别模型内部的批大小（text_recognition_batch_size）
+OCR_PREDICT_BATCH_SIZE = 8  # 每次 predict 调用的图像数（按尺寸分桶，可用 --benchmark_batch_sizes 测定）
+OCR_MODE = 'full'  # 'full' 检测+识别 / 'rec_only' 单行字幕直接送识别模型，低置信度或多行时回退到检测+识别
+OCR_REC_MODEL_NAME = None  # 仅识别模式的识别模型名称（None 使用PaddleOCR默认模型）
+OCR_REC_MIN_CONFIDENCE = 0.9  # 仅识别模式的最低置信度，低于此值回退到检测+识别
+OCR_CACHE_ENABLED = True  # 按OCR图像内容缓存识别结果（跨帧、跨运行复用）
+OCR_CACHE_FILE = "ocr_cache.sqlite"  # 持久化缓存文件（位于临时文件目录）
+OCR_CACHE_MEMORY_ENTRIES = 4096  # 每个进程内存LRU的条目数
+OCR_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 持久化缓存大小上限，超过时淘汰最久未使用的条目
+OCR_CACHE_TOUCH_BATCH = 256  # 磁盘命中的最近使用时间攒够该条数（或下次写入时）才写回文件
+
+# OCR图像参数
+OCR_CROP_TO_TEXT = True  # 把触发的ROI裁剪到颜色掩码的外接矩形
+OCR_CROP_MARGIN = 8  # 裁剪边距(像素)
+OCR_LINE_HEIGHT = None  # 裁剪图像缩放到的固定行高(像素)，None 表示不缩放
+OCR_BINARIZE = False  # 输出二值化单通道图像（白底黑字）代替彩色图像
+OCR_LINE_MIN_GAP = 3  # 掩码中至少隔开这么多空行才视为不同的文本行
+OCR_LINE_MIN_HEIGHT = 8  # 低于此高度的行段不计为文本行（像素）
 
 # 批处理参数
 BATCH_SIZE = 20  # OCR批处理大小，根据测试结果调整
 MAX_WORKERS = 3  # 并发PaddleOCR实例数量，根据并发测试结果调整
+PREPROCESS_WORKERS = 1  # 分段并行预处理的进程数（1 = 单进程顺序解码）
+MIN_FRAMES_PER_CHUNK = 500  # 每个预处理分段的最少帧数，避免分段过碎
+MAX_FRAMES_PER_CHUNK = 1500  # 每个预处理分段的最多帧数：长视频切成更多分段按需提交，首批OCR不必等待整段解码
+WORKER_START_METHOD = 'forkserver'  # OCR与分段预处理子进程的启动方式（不从多线程的主进程 fork；不支持时用 'spawn'）
+
+# OCR图像传输参数
+OCR_TRANSPORT = 'shm'  # 'shm' 原始像素经共享内存环形缓冲区传给OCR进程 / 'png' PNG编码后序列化传递
+OCR_MAX_PENDING_BATCHES = 2 * MAX_WORKERS  # 流水线中已提交未完成的OCR批次上限（有界队列）
+SHM_RING_SLOTS = OCR_MAX_PENDING_BATCHES * BATCH_SIZE  # 环形缓冲区槽位数（决定在途图像上限）
+
+# 多视频批处理参数
+BATCH_MAX_CONCURRENT_VIDEOS = 4  # 同时解码的视频数（OCR子进程最多同时附加 MAX_ATTACHED_RINGS=4 个共享内存块）
+BATCH_OCR_MAX_INFLIGHT = MAX_WORKERS + 1  # 调度器提交到OCR进程池的批次上限，其余批次按优先级排队
+BATCH_VIDEO_EXTENSIONS = ['.mov', '.mp4', '.mxf', '.avi', '.mkv', '.m4v']  # 按目录批处理时收集的视频扩展名
+BATCH_SUMMARY_FILE = 'batch_summary.csv'  # 批处理汇总文件名（位于输出目录）
 
-# 时间参数
+# 分布式处理参数（协调器切分帧区间，多台机器上的工作节点经HTTP领取工作单元）
+DISTRIBUTED_HOST = '127.0.0.1'  # 协调器监听地址（多台机器时改为 0.0.0.0；各节点须能以相同路径访问视频）
+DISTRIBUTED_PORT = 8765  # 协调器监听端口
+DISTRIBUTED_UNIT_FRAMES = 1500  # 每个工作单元的帧数
+DISTRIBUTED_LEASE_SECONDS = 60.0  # 租约时长：工作节点每隔 1/3 租约时长续约，超时未续约的单元重新分配
+DISTRIBUTED_MAX_ATTEMPTS = 3  # 同一单元失败或租约超时的次数达到此值时，该视频标记为失败
+DISTRIBUTED_POLL_SECONDS = 1.0  # 暂无可分配的单元时工作节点的等待间隔
+DISTRIBUTED_CONNECT_SECONDS = 30.0  # 工作节点连接不上协调器时的最长重试时间（之后视为处理已结束）
+
+# OCR服务参数（ocr_server.py：常驻的本机OCR服务，流水线、质检脚本等工具共用一份模型）
+OCR_SERVER_HOST = '127.0.0.1'  # 监听地址（只服务本机）
+OCR_SERVER_PORT = 8766  # 监听端口
+OCR_SERVER_MAX_BATCH_SIZE = OCR_PREDICT_BATCH_SIZE  # 每个微批次的最大图像数（并发请求的图像合并推理）
+OCR_SERVER_MAX_WAIT_MS = 10.0  # 微批次凑批的最长等待时间（从批内最早的图像入队起算，毫秒）
+OCR_SERVER_METRICS_WINDOW = 1000  # 计算延迟分位数使用的最近请求/批次数
+OCR_SERVER_CLIENT_CONNECTIONS = MAX_WORKERS + 1  # 作为流水线的远程OCR后端时的并发请求数
+OCR_SERVER_CLIENT_RETRIES = 2  # 远程OCR后端请求失败（连接错误、超时、服务端错误）时的重试次数，仍失败则该批次失败
+OCR_SERVER_CLIENT_RETRY_SECONDS = 1.0  # 第一次重试前的等待时间(秒)，之后每次加倍
+
+# 时间参数（按25fps计的帧数，自适应采样按视频帧率换算）
 MIN_DETECTION_INTERVAL = 25  # 最短检测间隔(帧)
 MAX_DETECTION_INTERVAL = 10 * 25  # 最长检测间隔(10秒*25fps)
 
+# 采样调度参数
+SAMPLING_SCHEDULER = 'alternate'  # 'alternate' 每隔一帧检测 / 'adaptive' 出现时密集采样、稳定后指数退避
+ADAPTIVE_ONSET_SAMPLES = 10  # 字幕出现或变化后的连续采样次数（不少于去重要求的连续帧组长度）
+ADAPTIVE_ONSET_STEP = 2  # 出现阶段的采样间隔(帧)，须小于去重允许的最大帧间距
+ADAPTIVE_CHANGE_RATIO = 0.2  # 像素数相对上次采样变化超过此比例视为字幕变化
+ADAPTIVE_ONSET_GAP = 3  # 超过此帧数未超过阈值视为字幕消失，再次出现时重新进入出现阶段
+
 # 临时文件目录
 TMP_DIR = "tmp"
 
+# 断点续跑参数
+JOURNAL_ENABLED = True  # 处理时在临时文件目录追加写入续跑日志（--resume 时从最后一个检查点继续）
+JOURNAL_CHECKPOINT_SECONDS = 5.0  # 写检查点的最短间隔(秒)
+JOURNAL_KEEP_ON_SUCCESS = False  # 处理成功后保留续跑日志（可修改后处理参数后用 --resume 直接重新后处理）
+
+# 字幕跟踪与去重参数
+CAPTION_MIN_CONFIDENCE = 0.1  # 低于此置信度的OCR结果丢弃
+CAPTION_MIN_FRAMES = 10  # 连续帧组至少包含的结果数，更短的视为误检
+CAPTION_MAX_FRAME_GAP = 12  # 同一字幕相邻两个结果允许的最大帧间距
+CAPTION_IOU_THRESHOLD = 0.8  # 与字幕首个结果的文本框IoU不低于此值（或文本相似）视为同一字幕
+CAPTION_MERGE_WINDOW = 25  # 入点相差不超过此帧数的相似字幕合并
+CAPTION_TRACK_PER_TYPE = False  # True: 各类型独立跟踪；False: 与批量去重一致，其他类型的结果会结束当前字幕
+
+# 文本规范化规则（text_normalizer 编译一次后使用，增改规则无需改代码）
+# 每个规则集按字幕类型给出：
+#   replace      一次扫描完成的替换 [(正则, 替换为)]，替换结果不再参与匹配，各正则的匹配不能相互重叠
+#   prefix       规范前缀，已有该前缀的文本不再处理
+#   bare_prefix  (缺冒号的前缀, 去掉的字符数)：以其开头时替换为规范前缀
+#   aliases      开头 alias_width 个字符去掉空格、转小写后在此列表中时，视为识别错误的前缀：
+#                按 separators 顺序查找分隔符，找到时保留其首次出现之后的部分，否则去掉开头 alias_width 个字符
+#   其余文本直接加上规范前缀；fallback 为未列出类型使用的规则
+TEXT_NORMALIZATION_RULES = {
+    # 重构版（ResultProcessor）
+    'refactored': {
+        'fallback': 'DI',
+        'types': {
+            'VFX': {
+                # VEX:/VFX;/VEX;/VFX./VEX. → VFX:，以及前面不是V的 FX: → VFX:
+                'replace': [(r'V[EF]X[:;.]', 'VFX:'), (r'(?<!V)FX:', 'VFX:')],
+                'prefix': 'VFX:',
+                'bare_prefix': ('VFX', 3),
+                'alias_width': 4,
+                'aliases': ['vfx', 'vex', 'vpx', 'vix'],
+                'separators': [':', ';'],
+            },
+            'DI': {
+                # D1/Dl/D|/DL/01 后接冒号或分号、DI; → DI:，Di → DI:
+                'replace': [(r'D[1l|L][:;]|01[:;]|DI;|Di', 'DI:')],
+                'prefix': 'DI:',
+                'bare_prefix': ('DI', 3),  # 与原实现一致：去掉 DI 之后的一个字符
+                'alias_width': 3,
+                'aliases': ['di', 'd1', 'dl', 'ol', 'oi', '01'],
+                'separators': [':', ';'],
+            },
+        },
+    },
+    # 单体版（videoOCR_Paddle.py）
+    'legacy': {
+        'fallback': 'DI',
+        'types': {
+            'VFX': {
+                'replace': [(r'VEX[:;]|VFX;', 'VFX:')],
+                'prefix': 'VFX:',
+                'bare_prefix': None,
+                'alias_width': 4,
+                'aliases': ['vfx', 'vex', 'vpx', 'vix'],
+                'separators': [':', ';'],
+            },
+            'DI': {
+                'replace': [(r'D[1l|L][:;]|01[:;]|DI;', 'DI:')],
+                'prefix': 'DI:',
+                'bare_prefix': None,
+                'alias_width': 3,
+                'aliases': ['di', 'd1', 'dl', 'ol', 'oi', '01'],
+                'separators': [':', ';'],
+            },
+        },
+    },
+}
+TEXT_NORMALIZATION_CACHE_SIZE = 65536  # 规范化结果的记忆条目数（相同文本只处理一次）
+
 # 输出参数
 OUTPUT_CSV_HEADERS = ['帧数', '时间码', '文本内容', '像素数量', '置信度', '类型']
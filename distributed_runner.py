@@ -0,0 +1,636 @@
+"""
+分布式处理
+协调器把一个或多个视频的处理范围切分为工作单元，经HTTP工作队列分发给（多台机器上的）工作节点，
+工作节点领取单元、解码并OCR后交回结果；租约超时的单元重新分配，全部完成后协调器合并结果并后处理
+
+每段帧区间分两个阶段处理，保证采样与单机处理一致：
+扫描单元解码并做颜色检测，交回裁剪到文本区域的候选帧；协调器按帧顺序回放采样调度，
+把选中的候选帧作为OCR单元下发，工作节点直接由候选帧生成OCR任务（不再解码）并交回 OCRResult
+"""
+
+import argparse
+import base64
+import collections
+import dataclasses
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from video_preprocessor import VideoPreprocessor, FrameData, OCRCandidate
+from paddle_ocr_service import PaddleOCRService, OCRResult
+from result_processor import ResultProcessor
+from sampling_scheduler import create_sampler, encode_signature, decode_signature
+from config import (BATCH_SIZE, DECODE_BACKEND, USE_FRAME_INDEX, OCR_TRANSPORT, OCR_MODE, OCR_CACHE_ENABLED,
+                    SAMPLING_SCHEDULER, DISTRIBUTED_HOST, DISTRIBUTED_PORT, DISTRIBUTED_UNIT_FRAMES,
+                    DISTRIBUTED_LEASE_SECONDS, DISTRIBUTED_MAX_ATTEMPTS, DISTRIBUTED_POLL_SECONDS,
+                    DISTRIBUTED_CONNECT_SECONDS)
+
+
+def encode_candidate(candidate: OCRCandidate) -> dict:
+    """候选帧转换为可JSON序列化的形式（裁剪图像PNG无损编码）"""
+    success, encoded_image = cv2.imencode('.png', candidate.image)
+    if not success:
+        raise ValueError(f"候选帧图像编码失败: 帧{candidate.frame_number}")
+    return {
+        'frame': candidate.frame_number, 'type': candidate.text_type, 'pixels': candidate.pixel_count,
+        'image': base64.b64encode(encoded_image.tobytes()).decode('ascii'),
+        'crop_offset': list(candidate.crop_offset), 'text_rect': list(candidate.text_rect),
+        'text_lines': candidate.text_lines, 'signature': encode_signature(candidate.signature),
+    }
+
+
+def decode_candidate(values: dict) -> OCRCandidate:
+    """encode_candidate 的逆运算"""
+    image = cv2.imdecode(np.frombuffer(base64.b64decode(values['image']), dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    return OCRCandidate(values['frame'], values['type'], values['pixels'], image, tuple(values['crop_offset']),
+                        tuple(values['text_rect']), values['text_lines'], decode_signature(values['signature']))
+
+
+def scan_frame_ranges(preprocessor: VideoPreprocessor, frame_ranges: List[Tuple[int, int]],
+                      should_stop: Optional[Callable[[], bool]] = None) -> dict:
+    """
+    扫描单元：顺序解码各帧区间并做颜色检测，返回全部超过阈值的候选帧（不应用采样）
+
+    候选帧已裁剪到文本区域，与单机分段预处理的 collect_ocr_candidates 相同；
+    协调器只保留采样选中的候选帧，OCR单元由它们直接生成任务，每帧只解码一次。
+    """
+    candidates, stats = preprocessor.collect_ocr_candidates(frame_ranges, should_stop)
+    decoded_frames = stats.pop('decoded_frames')
+    return {'candidates': [encode_candidate(candidate) for candidate in candidates],
+            'decoded_frames': decoded_frames, 'detection_stats': stats}
+
+
+@dataclasses.dataclass
+class WorkUnit:
+    """一个工作单元：一个视频中一段帧区间的扫描或OCR"""
+    unit_id: int
+    kind: str  # 'scan' 扫描 / 'ocr' 对选中的帧OCR
+    video_index: int
+    chunk_index: int
+    frame_ranges: List[Tuple[int, int]]
+    candidates: List[dict] = dataclasses.field(default_factory=list)  # OCR单元选中的候选帧（encode_candidate）
+
+    state: str = 'pending'  # 'pending' 等待分配 / 'leased' 已租出 / 'done' 已完成
+    lease_id: int = 0
+    worker: str = ''
+    deadline: float = 0.0
+    attempts: int = 0  # 已分配次数
+
+
+class DistributedVideo:
+    """协调器中一个视频的处理状态"""
+
+    def __init__(self, video_path: str, lut_path: Optional[str], start_time: Optional[str],
+                 end_time: Optional[str], options: dict, unit_frames: int):
+        """只读取视频信息确定处理范围（不创建解码器），并切分为工作单元的帧区间"""
+        self.video_path = os.path.abspath(video_path)
+        self.lut_path = os.path.abspath(lut_path) if lut_path else None
+        self.options = options
+        self.video_info, start_frame, end_frame = VideoPreprocessor.probe_frame_range(
+            self.video_path, start_time, end_time, use_frame_index=options['use_frame_index'])
+        self.sampler = create_sampler(options['sampler'], self.video_info.fps, VideoPreprocessor.same_signature)
+
+        num_units = -(-(end_frame - start_frame) // max(1, unit_frames))
+        self.chunks = VideoPreprocessor.partition_frame_ranges([(start_frame, end_frame)], num_units)
+
+        self.scan_results: Dict[int, list] = {}  # 已完成但尚未回放采样的扫描结果
+        self.next_replay = 0  # 下一个回放采样的分段
+        self.ocr_results: Dict[int, List[OCRResult]] = {}
+        self.decoded_frames = 0
+        self.detection_stats = {'analyzed_frames': 0, 'static_skipped_frames': 0}
+        self.status = '处理中'
+        self.error = ''
+        self.output_file: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        """全部分段都已回放采样并完成OCR"""
+        return self.next_replay == len(self.chunks) and len(self.ocr_results) == len(self.chunks)
+
+    def replay_sampling(self, candidates: List[dict]) -> List[dict]:
+        """按帧顺序回放采样调度（必须按分段顺序调用），返回需要OCR的候选帧；每帧最多一个"""
+        selected = []
+        skip_frame = None
+        for values in candidates:
+            if values['frame'] == skip_frame:
+                continue
+            if self.sampler.should_sample(values['type'], values['pixels'], values['frame'],
+                                          decode_signature(values['signature'])):
+                skip_frame = values['frame']
+                selected.append(values)
+        return selected
+
+    def merged_results(self) -> List[OCRResult]:
+        """按帧顺序合并各分段的OCR结果"""
+        return [result for index in range(len(self.chunks)) for result in self.ocr_results[index]]
+
+
+class WorkQueueRequestHandler(BaseHTTPRequestHandler):
+    """工作队列的HTTP接口：POST /lease、/renew、/complete、/fail（JSON），GET /status"""
+
+    def do_POST(self):
+        coordinator = self.server.coordinator
+        routes = {'/lease': coordinator.lease, '/renew': coordinator.renew,
+                  '/complete': coordinator.complete, '/fail': coordinator.fail}
+        if self.path not in routes:
+            self._reply(404, {'error': f"未知接口: {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        except ValueError:
+            self._reply(400, {'error': "请求不是有效的JSON"})
+            return
+        self._reply(200, routes[self.path](request))
+
+    def do_GET(self):
+        if self.path != '/status':
+            self._reply(404, {'error': f"未知接口: {self.path}"})
+            return
+        self._reply(200, self.server.coordinator.get_status())
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """不逐个打印请求"""
+
+
+class DistributedCoordinator:
+    """
+    分布式处理协调器：切分工作单元、分配租约、回放采样并合并结果
+
+    工作节点领取单元时获得一个租约，处理期间定期续约；租约超时（节点崩溃、断网）的单元重新分配，
+    同一单元分配 max_attempts 次仍未完成时该视频标记为失败。单元的结果与由哪个节点处理无关，
+    因此重新分配后先交回的结果被采用，之后交回的重复结果被忽略。
+    """
+
+    def __init__(self, videos: List[dict], output_dir: str = '.', host: str = DISTRIBUTED_HOST,
+                 port: int = DISTRIBUTED_PORT, unit_frames: int = DISTRIBUTED_UNIT_FRAMES,
+                 lease_seconds: float = DISTRIBUTED_LEASE_SECONDS, max_attempts: int = DISTRIBUTED_MAX_ATTEMPTS,
+                 decode_backend: str = DECODE_BACKEND, use_frame_index: bool = USE_FRAME_INDEX,
+                 ocr_transport: str = OCR_TRANSPORT, sampler: str = SAMPLING_SCHEDULER):
+        """
+        初始化协调器
+
+        videos 每项包含 video_path 及可选的 lut_path、start_time、end_time；
+        解码后端等选项随单元下发，各工作节点按相同配置处理
+        """
+        options = {'decode_backend': decode_backend, 'use_frame_index': use_frame_index,
+                   'ocr_transport': ocr_transport, 'sampler': sampler}
+        self.videos = [DistributedVideo(video['video_path'], video.get('lut_path'), video.get('start_time'),
+                                        video.get('end_time'), options, unit_frames) for video in videos]
+        self.output_dir = output_dir
+        self.host = host
+        self.port = port
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self.units: Dict[int, WorkUnit] = {}
+        self.pending_scans: Deque[int] = collections.deque()
+        self.pending_ocr: Deque[int] = collections.deque()  # OCR单元优先分配，尽早完成已扫描的分段
+        for video_index, video in enumerate(self.videos):
+            for chunk_index, chunk in enumerate(video.chunks):
+                unit = self._add_unit('scan', video_index, chunk_index, chunk)
+                self.pending_scans.append(unit.unit_id)
+
+        self.condition = threading.Condition()
+        self.next_lease_id = 1
+        self.reissued_units = 0
+        self.finished = False
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def _add_unit(self, kind: str, video_index: int, chunk_index: int, frame_ranges: List[Tuple[int, int]],
+                  candidates: Optional[List[dict]] = None) -> WorkUnit:
+        unit = WorkUnit(len(self.units), kind, video_index, chunk_index, frame_ranges, candidates or [])
+        self.units[unit.unit_id] = unit
+        return unit
+
+    @property
+    def url(self) -> str:
+        """工作节点连接的地址"""
+        host = socket.gethostname() if self.host in ('0.0.0.0', '') else self.host
+        return f"http://{host}:{self.port}"
+
+    def lease(self, request: dict) -> dict:
+        """分配一个单元：{'unit': ...}，暂无可分配的单元时 {'wait': 秒}，全部完成时 {'done': True}"""
+        with self.condition:
+            self._expire_leases()
+            if self.finished:
+                return {'done': True}
+
+            unit = None
+            for queue in (self.pending_ocr, self.pending_scans):
+                while queue and unit is None:
+                    candidate = self.units[queue.popleft()]
+                    if candidate.state == 'pending' and self.videos[candidate.video_index].status == '处理中':
+                        unit = candidate
+            if unit is None:
+                return {'wait': DISTRIBUTED_POLL_SECONDS}
+
+            unit.state = 'leased'
+            unit.lease_id = self.next_lease_id
+            self.next_lease_id += 1
+            unit.worker = request.get('worker', '')
+            unit.deadline = time.time() + self.lease_seconds
+            unit.attempts += 1
+
+            video = self.videos[unit.video_index]
+            return {'unit': {
+                'unit_id': unit.unit_id, 'lease_id': unit.lease_id, 'kind': unit.kind,
+                'video_path': video.video_path, 'lut_path': video.lut_path, 'options': video.options,
+                'frame_ranges': unit.frame_ranges, 'candidates': unit.candidates, 'lease_seconds': self.lease_seconds,
+            }}
+
+    def renew(self, request: dict) -> dict:
+        """续约；单元已完成或已重新分配给其他节点时返回 ok=False"""
+        with self.condition:
+            unit = self.units.get(request.get('unit_id'))
+            if unit is None or unit.state != 'leased' or unit.lease_id != request.get('lease_id'):
+                return {'ok': False}
+            unit.deadline = time.time() + self.lease_seconds
+            return {'ok': True}
+
+    def complete(self, request: dict) -> dict:
+        """交回单元的结果（单元已完成或视频已失败时忽略）"""
+        with self.condition:
+            unit = self.units.get(request.get('unit_id'))
+            if unit is None or unit.state == 'done' or self.videos[unit.video_index].status != '处理中':
+                return {'accepted': False}
+
+            unit.state = 'done'
+            video = self.videos[unit.video_index]
+            result = request['result']
+            if unit.kind == 'scan':
+                video.scan_results[unit.chunk_index] = result['candidates']
+                video.decoded_frames += result['decoded_frames']
+                for key in video.detection_stats:
+                    video.detection_stats[key] += result['detection_stats'].get(key, 0)
+                self._replay_ready_chunks(unit.video_index)
+            else:
+                video.ocr_results[unit.chunk_index] = [OCRResult.from_dict(values) for values in result['results']]
+            self.condition.notify_all()
+            return {'accepted': True}
+
+    def fail(self, request: dict) -> dict:
+        """工作节点处理单元出错：重新分配，达到最大分配次数时该视频标记为失败"""
+        with self.condition:
+            unit = self.units.get(request.get('unit_id'))
+            if unit is None or unit.state != 'leased' or unit.lease_id != request.get('lease_id'):
+                return {'accepted': False}
+            self._requeue(unit, f"节点 {unit.worker} 处理出错: {request.get('error', '')}")
+            self.condition.notify_all()
+            return {'accepted': True}
+
+    def _replay_ready_chunks(self, video_index: int):
+        """按分段顺序回放已连续完成扫描的分段，为选中的候选帧生成OCR单元（未选中的候选帧随即释放）"""
+        video = self.videos[video_index]
+        while video.next_replay in video.scan_results:
+            chunk_index = video.next_replay
+            selected = video.replay_sampling(video.scan_results.pop(chunk_index))
+            if selected:
+                unit = self._add_unit('ocr', video_index, chunk_index, video.chunks[chunk_index], selected)
+                self.pending_ocr.append(unit.unit_id)
+            else:
+                video.ocr_results[chunk_index] = []
+            video.next_replay += 1
+
+    def _expire_leases(self):
+        """租约超时的单元重新分配"""
+        now = time.time()
+        for unit in self.units.values():
+            if unit.state == 'leased' and unit.deadline < now:
+                self._requeue(unit, f"节点 {unit.worker} 的租约超时")
+
+    def _requeue(self, unit: WorkUnit, reason: str):
+        video = self.videos[unit.video_index]
+        if unit.attempts >= self.max_attempts:
+            unit.state = 'done'
+            video.status = '失败'
+            video.error = f"{unit.kind} 单元 {unit.frame_ranges} 已分配 {unit.attempts} 次仍未完成: {reason}"
+            print(f"\n⚠️ 警告: {video.video_path}: {video.error}")
+            return
+        unit.state = 'pending'
+        self.reissued_units += 1
+        queue = self.pending_scans if unit.kind == 'scan' else self.pending_ocr
+        queue.appendleft(unit.unit_id)
+        print(f"\n{reason}，重新分配单元 {unit.unit_id} ({unit.kind} {unit.frame_ranges})")
+
+    def get_status(self) -> dict:
+        """处理进度"""
+        with self.condition:
+            counts = collections.Counter((unit.kind, unit.state) for unit in self.units.values())
+            return {
+                'units': {f"{kind}_{state}": count for (kind, state), count in sorted(counts.items())},
+                'reissued_units': self.reissued_units,
+                'videos': [{'video_path': video.video_path, 'status': video.status,
+                            'chunks': len(video.chunks), 'scanned': video.next_replay,
+                            'ocr_done': len(video.ocr_results), 'error': video.error} for video in self.videos],
+            }
+
+    def run(self, local_workers: int = 0, worker_args: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+        """
+        启动工作队列并等待全部视频处理完成，返回 {视频: 结果文件}（失败的视频为 None）
+
+        local_workers > 0 时在本机另外启动这么多个工作节点进程（输出写入输出目录下的 worker_N.log）
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        start_time = time.time()
+        self.server = ThreadingHTTPServer((self.host, self.port), WorkQueueRequestHandler)
+        self.server.daemon_threads = True
+        self.server.coordinator = self
+        server_thread = threading.Thread(target=self.server.serve_forever, name='work-queue', daemon=True)
+        server_thread.start()
+
+        total_units = len(self.units)
+        print(f"协调器已启动: {self.url}，{len(self.videos)} 个视频，{total_units} 个扫描单元，"
+              f"租约 {self.lease_seconds:.0f} 秒")
+
+        workers = []
+        for index in range(local_workers):
+            log_file = open(os.path.join(self.output_dir, f"worker_{index}.log"), 'w', encoding='utf-8')
+            command = [sys.executable, os.path.abspath(__file__), 'worker', '--url', self.url] + (worker_args or [])
+            workers.append((subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT), log_file))
+
+        try:
+            pending_videos = list(self.videos)
+            while pending_videos:
+                with self.condition:
+                    self.condition.wait(timeout=DISTRIBUTED_POLL_SECONDS)
+                    self._expire_leases()
+                    ready = [video for video in pending_videos if video.status != '处理中' or video.complete]
+                for video in ready:
+                    pending_videos.remove(video)
+                    if video.status == '处理中':
+                        self._finish_video(video)
+                self._print_progress()
+
+            # 保持服务到工作节点下一次领取单元，让它们收到完成通知后退出
+            with self.condition:
+                self.finished = True
+            time.sleep(2 * DISTRIBUTED_POLL_SECONDS)
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+            for process, log_file in workers:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.terminate()
+                    process.wait()
+                log_file.close()
+
+        elapsed_time = time.time() - start_time
+        total_frames = sum(video.decoded_frames for video in self.videos)
+        print("\n=== 分布式处理完成 ===")
+        print(f"总耗时: {elapsed_time:.2f} 秒，解码 {total_frames} 帧 ({total_frames / max(elapsed_time, 1e-9):.1f} 帧/秒)，"
+              f"重新分配 {self.reissued_units} 次")
+        for video in self.videos:
+            print(f"[{video.status}] {video.video_path}: {video.output_file or video.error}")
+        return {video.video_path: video.output_file for video in self.videos}
+
+    def _finish_video(self, video: DistributedVideo):
+        """合并视频的全部OCR结果，后处理并保存"""
+        results = video.merged_results()
+        result_processor = ResultProcessor(video.video_path)
+        filtered_results = result_processor.process_results(results)
+        output_file = os.path.join(self.output_dir, result_processor.default_output_file())
+        video.output_file = result_processor.save_to_csv(filtered_results, output_file)
+        video.status = '完成'
+        print(f"\n{video.video_path}: {len(results)} 个OCR结果，后处理后 {len(filtered_results)} 个")
+
+    def _print_progress(self):
+        """打印整体进度"""
+        with self.condition:
+            scans = [unit for unit in self.units.values() if unit.kind == 'scan']
+            ocr_units = [unit for unit in self.units.values() if unit.kind == 'ocr']
+            leased = sum(1 for unit in self.units.values() if unit.state == 'leased')
+            print(f"\r分布式进度: 扫描 {sum(u.state == 'done' for u in scans)}/{len(scans)}，"
+                  f"OCR {sum(u.state == 'done' for u in ocr_units)}/{len(ocr_units)}，处理中 {leased} 个单元",
+                  end="", flush=True)
+
+
+class DistributedWorker:
+    """分布式工作节点：循环领取单元、处理并交回结果，处理期间在后台线程中续约"""
+
+    def __init__(self, url: str, worker_id: Optional[str] = None, ocr_mode: str = OCR_MODE,
+                 use_ocr_cache: bool = OCR_CACHE_ENABLED, connect_seconds: float = DISTRIBUTED_CONNECT_SECONDS):
+        """初始化工作节点（OCR模型在第一个OCR单元时加载，之后一直复用）"""
+        self.url = url.rstrip('/')
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.ocr_mode = ocr_mode
+        self.use_ocr_cache = use_ocr_cache
+        self.connect_seconds = connect_seconds
+        self._ocr_service: Optional[PaddleOCRService] = None
+        self.preprocessors: Dict[tuple, VideoPreprocessor] = {}  # 按视频和解码选项缓存，同一视频的单元复用
+        self.processed_units = 0
+
+    @property
+    def ocr_service(self) -> PaddleOCRService:
+        if self._ocr_service is None:
+            self._ocr_service = PaddleOCRService(self.ocr_mode, self.use_ocr_cache)
+        return self._ocr_service
+
+    def _request(self, path: str, payload: dict) -> dict:
+        request = urllib.request.Request(self.url + path, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.loads(response.read())
+
+    def run(self) -> int:
+        """处理到协调器通知全部完成（或长时间连接不上）为止，返回处理的单元数"""
+        print(f"工作节点 {self.worker_id} 连接 {self.url}")
+        last_contact = time.time()
+        while True:
+            try:
+                reply = self._request('/lease', {'worker': self.worker_id})
+            except (urllib.error.URLError, OSError) as e:
+                if time.time() - last_contact > self.connect_seconds:
+                    print(f"无法连接协调器 ({e})，结束")
+                    break
+                time.sleep(DISTRIBUTED_POLL_SECONDS)
+                continue
+            last_contact = time.time()
+
+            if reply.get('done'):
+                print("协调器通知全部完成，结束")
+                break
+            if 'unit' not in reply:
+                time.sleep(reply.get('wait', DISTRIBUTED_POLL_SECONDS))
+                continue
+            self.process_unit(reply['unit'])
+            last_contact = time.time()
+
+        print(f"工作节点 {self.worker_id} 共处理 {self.processed_units} 个单元")
+        return self.processed_units
+
+    def process_unit(self, unit: dict):
+        """处理一个单元并交回结果（出错时报告失败，由协调器重新分配）"""
+        identity = {'unit_id': unit['unit_id'], 'lease_id': unit['lease_id']}
+        frame_ranges = [tuple(frame_range) for frame_range in unit['frame_ranges']]
+        print(f"领取单元 {unit['unit_id']}: {unit['kind']} {os.path.basename(unit['video_path'])} {frame_ranges}")
+
+        stop_renewing = threading.Event()
+        lease_lost = threading.Event()  # 续约被拒绝：单元已超时重新分配（或已由其他节点完成）
+        renewer = threading.Thread(target=self._renew_lease,
+                                   args=(identity, unit['lease_seconds'] / 3, stop_renewing, lease_lost), daemon=True)
+        renewer.start()
+        try:
+            unit_start = time.time()
+            preprocessor = self._get_preprocessor(unit)
+            if unit['kind'] == 'scan':
+                result = scan_frame_ranges(preprocessor, frame_ranges, lease_lost.is_set)
+            else:
+                result = {'results': [ocr_result.to_dict() for ocr_result in
+                                      self._ocr_candidates(preprocessor, unit['candidates'], lease_lost.is_set)]}
+            if lease_lost.is_set():
+                print(f"单元 {unit['unit_id']} 的租约已失效，放弃处理 ({time.time() - unit_start:.2f} 秒)")
+                return
+            reply = self._request('/complete', dict(identity, result=result))
+            self.processed_units += 1
+            print(f"单元 {unit['unit_id']} 完成 ({time.time() - unit_start:.2f} 秒)"
+                  f"{'' if reply.get('accepted') else '，结果已由其他节点交回'}")
+        except Exception as e:
+            print(f"单元 {unit['unit_id']} 处理失败: {e}")
+            try:
+                self._request('/fail', dict(identity, error=str(e)))
+            except (urllib.error.URLError, OSError):
+                pass  # 连接不上时等租约超时后重新分配
+        finally:
+            stop_renewing.set()
+            renewer.join()
+
+    def _renew_lease(self, identity: dict, interval: float, stop: threading.Event, lost: threading.Event):
+        """后台续约，直到单元处理完成；协调器拒绝续约时设置 lost 并停止续约"""
+        while not stop.wait(interval):
+            try:
+                reply = self._request('/renew', identity)
+            except (urllib.error.URLError, OSError):
+                continue  # 连接不上时继续处理，租约超时前恢复即可
+            if not reply.get('ok'):
+                lost.set()
+                return
+
+    def _get_preprocessor(self, unit: dict) -> VideoPreprocessor:
+        """同一视频、同一解码选项和采样调度的预处理器只创建一次"""
+        options = unit['options']
+        key = (unit['video_path'], unit['lut_path'], options['decode_backend'], options['use_frame_index'],
+               options['ocr_transport'], options['sampler'])
+        if key not in self.preprocessors:
+            # 采样调度器与协调器相同，扫描交回的候选帧才会带上调度器需要的掩码签名
+            self.preprocessors[key] = VideoPreprocessor(
+                unit['video_path'], lut_path=unit['lut_path'], decode_backend=options['decode_backend'],
+                use_frame_index=options['use_frame_index'], ocr_transport=options['ocr_transport'],
+                sampler=options['sampler'])
+        return self.preprocessors[key]
+
+    def _ocr_candidates(self, preprocessor: VideoPreprocessor, candidates: List[dict],
+                        should_stop: Optional[Callable[[], bool]] = None) -> List[OCRResult]:
+        """
+        由选中的候选帧生成OCR任务（应用LUT并编码）并按 BATCH_SIZE 分批OCR（失败的候选帧跳过）
+
+        should_stop 每个任务前调用，返回真时提前结束（结果不完整，由调用方丢弃）
+        """
+        results: List[OCRResult] = []
+        batch: List[FrameData] = []
+        for values in candidates:
+            if should_stop and should_stop():
+                return results
+            frame_data = preprocessor.build_task(decode_candidate(values))
+            if not frame_data:
+                continue
+            batch.append(frame_data)
+            if len(batch) == BATCH_SIZE:
+                results.extend(self.ocr_service.process_batch(batch))
+                batch = []
+        if batch:
+            results.extend(self.ocr_service.process_batch(batch))
+        return results
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='分布式处理：协调器分发帧区间工作单元，工作节点领取并处理')
+    subparsers = parser.add_subparsers(dest='role', required=True)
+
+    coordinator_parser = subparsers.add_parser('coordinator', help='启动协调器（工作队列）')
+    coordinator_parser.add_argument('--video_path', '-v', type=str, action='append', required=True,
+                                    help='视频文件路径（可重复指定多个视频；各节点须能以相同路径访问）')
+    coordinator_parser.add_argument('--lut_path', '-l', type=str, help='LUT文件路径')
+    coordinator_parser.add_argument('--start_time', '-s', type=str, help='开始时间 (HH:MM:SS 或 MM:SS 或 SS)')
+    coordinator_parser.add_argument('--end_time', '-e', type=str, help='结束时间 (HH:MM:SS 或 MM:SS 或 SS)')
+    coordinator_parser.add_argument('--output_dir', '-o', type=str, default='.', help='结果文件目录')
+    coordinator_parser.add_argument('--host', type=str, default=DISTRIBUTED_HOST, help='监听地址')
+    coordinator_parser.add_argument('--port', type=int, default=DISTRIBUTED_PORT, help='监听端口')
+    coordinator_parser.add_argument('--unit_frames', type=int, default=DISTRIBUTED_UNIT_FRAMES, help='每个工作单元的帧数')
+    coordinator_parser.add_argument('--lease_seconds', type=float, default=DISTRIBUTED_LEASE_SECONDS,
+                                    help='租约时长(秒)，超时未续约的单元重新分配')
+    coordinator_parser.add_argument('--max_attempts', type=int, default=DISTRIBUTED_MAX_ATTEMPTS,
+                                    help='同一单元的最大分配次数')
+    coordinator_parser.add_argument('--local_workers', type=int, default=0,
+                                    help='在本机另外启动的工作节点进程数（单机测试或利用协调器所在机器）')
+    coordinator_parser.add_argument('--decode_backend', type=str, choices=['opencv', 'ffmpeg'], default=DECODE_BACKEND,
+                                    help='解码后端: opencv 解码整帧，ffmpeg 只解码ROI条带')
+    coordinator_parser.add_argument('--frame_index', action='store_true', default=USE_FRAME_INDEX,
+                                    help='使用帧索引文件加速各单元起点的定位')
+    coordinator_parser.add_argument('--ocr_transport', type=str, choices=['shm', 'png'], default=OCR_TRANSPORT,
+                                    help='工作节点内的OCR图像格式: shm 原始像素，png PNG编码')
+    coordinator_parser.add_argument('--sampler', type=str, choices=['alternate', 'adaptive'],
+                                    default=SAMPLING_SCHEDULER, help='OCR采样调度')
+
+    worker_parser = subparsers.add_parser('worker', help='启动工作节点')
+    for role_parser in (coordinator_parser, worker_parser):
+        role_parser.add_argument('--ocr_mode', type=str, choices=['full', 'rec_only'], default=OCR_MODE,
+                                 help='工作节点的OCR模式: full 检测+识别，rec_only 单行字幕跳过文本检测')
+        role_parser.add_argument('--no_ocr_cache', action='store_true', help='工作节点不使用OCR结果缓存')
+    worker_parser.add_argument('--url', type=str, default=f"http://{DISTRIBUTED_HOST}:{DISTRIBUTED_PORT}",
+                               help='协调器地址')
+    worker_parser.add_argument('--worker_id', type=str, default=None, help='节点名称（默认为 主机名-进程号）')
+
+    args = parser.parse_args()
+
+    try:
+        if args.role == 'worker':
+            DistributedWorker(args.url, args.worker_id, args.ocr_mode,
+                              OCR_CACHE_ENABLED and not args.no_ocr_cache).run()
+            return 0
+
+        videos = [{'video_path': video_path, 'lut_path': args.lut_path,
+                   'start_time': args.start_time, 'end_time': args.end_time} for video_path in args.video_path]
+        coordinator = DistributedCoordinator(
+            videos, args.output_dir, args.host, args.port,
+            unit_frames=args.unit_frames,
+            lease_seconds=args.lease_seconds,
+            max_attempts=args.max_attempts,
+            decode_backend=args.decode_backend,
+            use_frame_index=args.frame_index,
+            ocr_transport=args.ocr_transport,
+            sampler=args.sampler
+        )
+        worker_args = ['--ocr_mode', args.ocr_mode] + (['--no_ocr_cache'] if args.no_ocr_cache else [])
+        output_files = coordinator.run(args.local_workers, worker_args)
+        if not all(output_files.values()):
+            return 1
+
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,184 @@
+"""
+帧索引服务
+一次性扫描视频包信息，记录关键帧位置和PTS到帧号的映射，保存为视频旁的索引文件
+"""
+
+import bisect
+import json
+import os
+import shutil
+import subprocess
+from typing import List, Optional, Tuple
+from config import FFMPEG_BINARY, FRAME_INDEX_SUFFIX, TMP_DIR
+
+# 索引文件格式版本，格式变化时递增以强制重建
+FRAME_INDEX_VERSION = 2
+
+# 包标志位（libavcodec AV_PKT_FLAG_*）
+PACKET_FLAG_KEY = 0x1
+PACKET_FLAG_DISCARD = 0x4
+
+# 无时间戳（AV_NOPTS_VALUE），framecrc 原样输出为 -2^63
+NOPTS_VALUE = -(1 << 63)
+
+
+class FrameIndex:
+    """帧索引：按显示顺序排列的帧PTS与关键帧帧号"""
+
+    def __init__(self, video_path: str, time_base: Tuple[int, int], pts: List[int], keyframes: List[int]):
+        """初始化帧索引"""
+        self.video_path = video_path
+        self.time_base = time_base
+        self.pts = pts
+        self.keyframes = keyframes
+
+    @property
+    def frame_count(self) -> int:
+        """实际帧数（不依赖容器中可能不准确的帧数字段）"""
+        return len(self.pts)
+
+    @property
+    def is_intra_only(self) -> bool:
+        """是否每一帧都是关键帧（ProRes等帧内编码）"""
+        return len(self.keyframes) == len(self.pts)
+
+    def frame_time(self, frame_number: int) -> float:
+        """帧号对应的显示时间（秒，相对第一帧）"""
+        frame_number = min(max(frame_number, 0), self.frame_count - 1)
+        numerator, denominator = self.time_base
+        return (self.pts[frame_number] - self.pts[0]) * numerator / denominator
+
+    def time_to_frame(self, seconds: float) -> int:
+        """显示时间（秒）对应的第一个不早于该时间的帧号"""
+        numerator, denominator = self.time_base
+        target_pts = self.pts[0] + seconds * denominator / numerator
+        return bisect.bisect_left(self.pts, target_pts - 1e-6)
+
+    def keyframe_at_or_before(self, frame_number: int) -> int:
+        """不晚于指定帧的最近关键帧"""
+        position = bisect.bisect_right(self.keyframes, frame_number) - 1
+        return self.keyframes[position] if position >= 0 else 0
+
+    def keyframes_in_range(self, start_frame: int, end_frame: int) -> List[int]:
+        """[start_frame, end_frame) 内的关键帧"""
+        left = bisect.bisect_left(self.keyframes, start_frame)
+        right = bisect.bisect_left(self.keyframes, end_frame)
+        return self.keyframes[left:right]
+
+    @staticmethod
+    def sidecar_path(video_path: str) -> str:
+        """视频旁的索引文件路径"""
+        return video_path + FRAME_INDEX_SUFFIX
+
+    @staticmethod
+    def fallback_path(video_path: str) -> str:
+        """视频目录不可写时使用的临时目录索引文件路径"""
+        return os.path.join(TMP_DIR, os.path.basename(video_path) + FRAME_INDEX_SUFFIX)
+
+    @classmethod
+    def load_or_build(cls, video_path: str) -> Optional['FrameIndex']:
+        """读取有效的索引文件；不存在或已过期时扫描视频并保存"""
+        for path in (cls.sidecar_path(video_path), cls.fallback_path(video_path)):
+            index = cls.load(video_path, path)
+            if index:
+                return index
+
+        if shutil.which(FFMPEG_BINARY) is None:
+            print(f"⚠️ 警告: 未找到ffmpeg ({FFMPEG_BINARY})，无法建立帧索引")
+            return None
+
+        print(f"正在建立帧索引: {video_path}")
+        index = cls.build(video_path)
+        if index:
+            index.save()
+            print(f"帧索引完成: {index.frame_count} 帧，{len(index.keyframes)} 个关键帧")
+        return index
+
+    @classmethod
+    def load(cls, video_path: str, path: str) -> Optional['FrameIndex']:
+        """读取索引文件，视频文件变化（大小或修改时间）时视为无效"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        stat = os.stat(video_path)
+        if (data.get('version') != FRAME_INDEX_VERSION or
+                data.get('video_size') != stat.st_size or
+                data.get('video_mtime_ns') != stat.st_mtime_ns or
+                not data.get('pts')):
+            return None
+
+        return cls(video_path, tuple(data['time_base']), data['pts'], data['keyframes'])
+
+    @classmethod
+    def build(cls, video_path: str) -> Optional['FrameIndex']:
+        """用ffmpeg的framecrc复用器逐包读取（不解码）视频流的PTS和关键帧标志"""
+        command = [
+            FFMPEG_BINARY, '-nostdin', '-loglevel', 'error',
+            '-i', video_path,
+            '-map', '0:v:0', '-c', 'copy',
+            '-f', 'framecrc', 'pipe:1'
+        ]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   universal_newlines=True)
+
+        time_base = None
+        packets: List[Tuple[int, bool]] = []
+        for line in process.stdout:
+            if line.startswith('#tb 0:'):
+                numerator, denominator = line.split(':', 1)[1].strip().split('/')
+                time_base = (int(numerator), int(denominator))
+                continue
+            if line.startswith('#') or not line.strip():
+                continue
+
+            # 格式: stream, dts, pts, duration, size, crc[, F=0x标志]（关键帧不输出标志）
+            fields = [field.strip() for field in line.split(',')]
+            flags = PACKET_FLAG_KEY
+            if len(fields) > 6 and fields[6].startswith('F='):
+                flags = int(fields[6][2:], 16)
+            if flags & PACKET_FLAG_DISCARD:
+                continue
+            # 没有PTS的包（部分AVI/裸流）用DTS代替；两者都没有则无法定位，跳过
+            packet_pts = int(fields[2])
+            if packet_pts == NOPTS_VALUE:
+                packet_pts = int(fields[1])
+                if packet_pts == NOPTS_VALUE:
+                    continue
+            packets.append((packet_pts, bool(flags & PACKET_FLAG_KEY)))
+
+        _, stderr = process.communicate()
+        if process.returncode != 0 or not time_base or not packets:
+            print(f"⚠️ 警告: 帧索引建立失败: {stderr.strip()}")
+            return None
+
+        # 包按解码顺序输出，按PTS排序即为显示顺序
+        packets.sort(key=lambda packet: packet[0])
+        pts = [packet_pts for packet_pts, _ in packets]
+        keyframes = [frame_number for frame_number, (_, is_key) in enumerate(packets) if is_key]
+        return cls(video_path, time_base, pts, keyframes)
+
+    def save(self):
+        """保存索引文件；视频目录不可写时保存到临时目录"""
+        stat = os.stat(self.video_path)
+        data = {
+            'version': FRAME_INDEX_VERSION,
+            'video_size': stat.st_size,
+            'video_mtime_ns': stat.st_mtime_ns,
+            'time_base': list(self.time_base),
+            'keyframes': self.keyframes,
+            'pts': self.pts
+        }
+
+        for path in (self.sidecar_path(self.video_path), self.fallback_path(self.video_path)):
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, separators=(',', ':'))
+                return
+            except OSError as e:
+                print(f"⚠️ 警告: 无法写入帧索引 {path}: {e}")
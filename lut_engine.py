@@ -0,0 +1,92 @@
+"""
+LUT引擎
+每个进程只解析一次 .cube 文件，并预编译为整数索引的 uint8 查找表
+"""
+
+import numpy as np
+from typing import Dict, Tuple
+from config import LUT_TABLE_BITS
+import colour
+
+# 已编译的LUT引擎缓存（每个进程、每个LUT文件只编译一次）
+_ENGINE_CACHE: Dict[Tuple[str, int], 'LutEngine'] = {}
+
+# 编译查找表时每次求值的颜色数，限制浮点中间结果的内存占用
+COMPILE_CHUNK_SIZE = 1 << 20
+
+
+def get_lut_engine(lut_path: str, table_bits: int = LUT_TABLE_BITS) -> 'LutEngine':
+    """获取（必要时编译并缓存）指定LUT文件的引擎"""
+    key = (lut_path, table_bits)
+    if key not in _ENGINE_CACHE:
+        _ENGINE_CACHE[key] = LutEngine(lut_path, table_bits)
+    return _ENGINE_CACHE[key]
+
+
+class LutEngine:
+    """LUT引擎：uint8 BGR → uint8 BGR 直接查表，只处理非零（掩码内）像素"""
+
+    def __init__(self, lut_path: str, table_bits: int = LUT_TABLE_BITS):
+        """解析LUT文件并编译查找表"""
+        if not 1 <= table_bits <= 8:
+            raise ValueError(f"LUT查找表位数必须在1-8之间: {table_bits}")
+
+        self.lut_path = lut_path
+        self.table_bits = table_bits
+        self.shift = 8 - table_bits
+
+        lut = colour.io.read_LUT(lut_path)
+        self.table = self._compile(lut)
+        # 掩码外的黑色像素同样经过LUT（与整图应用LUT的结果一致）
+        self.black_bgr = self._evaluate(lut, np.zeros((1, 3), dtype=np.float32))[0, ::-1].copy()
+
+    @staticmethod
+    def _evaluate(lut, rgb_normalized: np.ndarray) -> np.ndarray:
+        """按原有的浮点路径对一组RGB颜色求值，返回 uint8 RGB"""
+        try:
+            processed = lut.apply(rgb_normalized)
+        except Exception:
+            # 备用方法
+            processed = colour.algebra.table_interpolation_trilinear(rgb_normalized, lut.table)
+
+        # 裁剪到有效范围并转换回uint8（与逐帧浮点路径相同的截断方式）
+        processed = np.clip(processed, 0.0, 1.0)
+        return (processed * 255).astype(np.uint8)
+
+    def _compile(self, lut) -> np.ndarray:
+        """
+        在量化网格上对LUT求值，生成 (2^(3*bits), 3) 的 uint8 BGR 查找表
+
+        索引为 B' << 2*bits | G' << bits | R'（X' = X >> (8 - bits)），
+        网格点取每个量化区间的中心；bits = 8 时与逐帧浮点路径逐像素一致。
+        """
+        levels = 1 << self.table_bits
+        bucket_centers = ((np.arange(levels) << self.shift) + ((1 << self.shift) - 1) / 2.0) / 255.0
+
+        codes = np.arange(levels ** 3, dtype=np.uint32)
+        table = np.empty((levels ** 3, 3), dtype=np.uint8)
+        for start in range(0, len(codes), COMPILE_CHUNK_SIZE):
+            chunk = codes[start:start + COMPILE_CHUNK_SIZE]
+            rgb = np.stack([
+                bucket_centers[chunk & (levels - 1)],
+                bucket_centers[(chunk >> self.table_bits) & (levels - 1)],
+                bucket_centers[chunk >> (2 * self.table_bits)]
+            ], axis=1).astype(np.float32)
+            table[start:start + len(chunk)] = self._evaluate(lut, rgb)[:, ::-1]
+        return table
+
+    def apply(self, image_bgr: np.ndarray) -> np.ndarray:
+        """对BGR图像应用LUT：非零像素查表，全零像素直接填充LUT(黑)"""
+        image_bgr = np.ascontiguousarray(image_bgr)
+        output = np.empty_like(image_bgr)
+        output[:] = self.black_bgr
+
+        pixels = image_bgr.reshape(-1, 3)
+        selected = np.flatnonzero(pixels.any(axis=1))
+        if len(selected):
+            colors = pixels[selected] >> self.shift
+            codes = ((colors[:, 0].astype(np.uint32) << (2 * self.table_bits)) |
+                     (colors[:, 1].astype(np.uint32) << self.table_bits) |
+                     colors[:, 2])
+            output.reshape(-1, 3)[selected] = self.table[codes]
+        return output
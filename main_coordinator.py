@@ -4,75 +4,189 @@
 
 import time
 import argparse
-import cv2
 import numpy as np
 import os
 import glob
-from typing import List, Optional
-from concurrent.futures import ProcessPoolExecutor
-from video_preprocessor import VideoPreprocessor, FrameData
+import collections
+import dataclasses
+import itertools
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from video_preprocessor import VideoPreprocessor, FrameData, OCRCandidate
 from paddle_ocr_service import PaddleOCRService, OCRResult
-from result_processor import ResultProcessor
-from config import BATCH_SIZE, MAX_WORKERS, TMP_DIR
-
-
-def process_ocr_batch_parallel(frame_data_batch: List[FrameData]) -> List[OCRResult]:
-    """在子进程中处理单个OCR批次（模块级函数，避免序列化问题）"""
-    try:
-        # 为每个子进程创建独立的OCR服务实例
-        ocr_service = PaddleOCRService()
-
-        # OCR处理
-        ocr_results = []
-        if frame_data_batch:
-            ocr_results = ocr_service.process_batch(frame_data_batch)
-
-        return ocr_results
-
-    except Exception as e:
-        print(f"OCR子进程处理错误: {e}")
-        return []
+from result_processor import ResultProcessor, CaptionTracker
+from shared_frame_ring import SharedFrameRing, SHARED_MEMORY_AVAILABLE
+from ocr_worker_pool import OCRWorkerPool, worker_mp_context
+from ocr_server import RemoteOCRPool
+from run_journal import RunJournal, ResumePoint
+from config import (BATCH_SIZE, TMP_DIR, PREPROCESS_WORKERS, MIN_FRAMES_PER_CHUNK, MAX_FRAMES_PER_CHUNK,
+                    DECODE_BACKEND, PROBE_MODE, PROBE_STEP, USE_FRAME_INDEX, OCR_TRANSPORT, SHM_RING_SLOTS,
+                    OCR_MAX_PENDING_BATCHES, OCR_MODE, OCR_CACHE_ENABLED, OCR_PREDICT_BATCH_SIZE, MAX_WORKERS,
+                    SAMPLING_SCHEDULER, BISECT_STEP, JOURNAL_ENABLED, JOURNAL_KEEP_ON_SUCCESS,
+                    CAPTION_MIN_CONFIDENCE)
+
+
+# 分段预处理子进程中按 (视频, LUT, 解码选项) 缓存的预处理器（同一进程依次处理多个分段和建任务请求）
+_CHUNK_PREPROCESSORS = {}
+
+
+def _get_chunk_preprocessor(video_path: str, lut_path: Optional[str], decode_backend: str,
+                            use_frame_index: bool, ocr_transport: str, sampler: str) -> VideoPreprocessor:
+    """
+    每个子进程只为同一视频打开一次解码器（帧索引由主进程建立，子进程直接读取索引文件）
+
+    采样调度器与主进程相同，候选帧才会带上调度器需要的掩码签名（采样本身由主进程回放）
+    """
+    key = (video_path, lut_path, decode_backend, use_frame_index, ocr_transport, sampler)
+    if key not in _CHUNK_PREPROCESSORS:
+        _CHUNK_PREPROCESSORS.clear()
+        _CHUNK_PREPROCESSORS[key] = VideoPreprocessor(video_path, lut_path=lut_path, decode_backend=decode_backend,
+                                                      use_frame_index=use_frame_index, ocr_transport=ocr_transport,
+                                                      sampler=sampler)
+    return _CHUNK_PREPROCESSORS[key]
+
+
+def preprocess_chunk_parallel(video_path: str, lut_path: Optional[str], frame_ranges: List[Tuple[int, int]],
+                              decode_backend: str = DECODE_BACKEND,
+                              use_frame_index: bool = USE_FRAME_INDEX,
+                              ocr_transport: str = OCR_TRANSPORT,
+                              sampler: str = SAMPLING_SCHEDULER) -> Tuple[List[OCRCandidate], dict]:
+    """在子进程中解码并检测一个分段的帧区间，返回裁剪后的候选帧（模块级函数，避免序列化问题）"""
+    preprocessor = _get_chunk_preprocessor(video_path, lut_path, decode_backend, use_frame_index, ocr_transport,
+                                           sampler)
+    return preprocessor.collect_ocr_candidates(frame_ranges)
+
+
+def build_tasks_parallel(video_path: str, lut_path: Optional[str], candidates: List[OCRCandidate],
+                         decode_backend: str = DECODE_BACKEND, use_frame_index: bool = USE_FRAME_INDEX,
+                         ocr_transport: str = OCR_TRANSPORT, sampler: str = SAMPLING_SCHEDULER) -> List[FrameData]:
+    """在子进程中为采样选中的候选帧应用LUT并编码，按输入顺序返回OCR任务（失败的候选帧跳过）"""
+    preprocessor = _get_chunk_preprocessor(video_path, lut_path, decode_backend, use_frame_index, ocr_transport,
+                                           sampler)
+    tasks = (preprocessor.build_task(candidate) for candidate in candidates)
+    return [frame_data for frame_data in tasks if frame_data]
 
 
 class MainCoordinator:
     """主进程协调器"""
 
     def __init__(self, video_path: str, lut_path: Optional[str] = None,
-                 start_time: Optional[str] = None, end_time: Optional[str] = None):
-        """初始化协调器"""
+                 start_time: Optional[str] = None, end_time: Optional[str] = None,
+                 preprocess_workers: int = PREPROCESS_WORKERS, decode_backend: str = DECODE_BACKEND,
+                 two_pass: bool = False, probe_mode: str = PROBE_MODE, probe_step: int = PROBE_STEP,
+                 use_frame_index: bool = USE_FRAME_INDEX, ocr_transport: str = OCR_TRANSPORT,
+                 ocr_pool: Optional[OCRWorkerPool] = None, ocr_mode: str = OCR_MODE,
+                 use_ocr_cache: bool = OCR_CACHE_ENABLED, sampler: str = SAMPLING_SCHEDULER,
+                 bisect_step: Optional[int] = None, resume: bool = False, journal: bool = JOURNAL_ENABLED):
+        """
+        初始化协调器（传入 ocr_pool 时多个视频复用同一个常驻OCR进程池）
+
+        bisect_step 不为空时使用入点模式：每隔 bisect_step 帧采样并二分定位字幕入点，只对入点帧OCR
+        journal 为真时处理过程中写续跑日志；resume 为真时从同一视频、同一配置的日志中最后一个检查点继续
+        """
+        if bisect_step is not None and (bisect_step < 1 or two_pass):
+            raise ValueError("入点模式的采样间隔必须为正整数，且不能与两遍扫描同时使用")
+        if bisect_step is not None and resume:
+            raise ValueError("入点模式不支持断点续跑")
+
         self.video_path = video_path
         self.lut_path = lut_path
         self.start_time = start_time
         self.end_time = end_time
+        self.preprocess_workers = preprocess_workers
+        self.two_pass = two_pass
+        self.probe_mode = probe_mode
+        self.probe_step = probe_step
+        self.use_frame_index = use_frame_index
+        self.sampler = sampler
+        self.bisect_step = bisect_step
+
+        # 分段预处理子进程汇总的颜色检测统计
+        self.worker_detection_stats = {'analyzed_frames': 0, 'static_skipped_frames': 0}
 
         # 初始化服务
-        self.preprocessor = VideoPreprocessor(video_path, start_time, end_time, lut_path)
-        self.ocr_service = PaddleOCRService()
+        self.preprocessor = VideoPreprocessor(video_path, start_time, end_time, lut_path, decode_backend,
+                                              use_frame_index=use_frame_index, ocr_transport=ocr_transport,
+                                              sampler=sampler)
+        self.ocr_pool = ocr_pool
+        self.ocr_mode = ocr_pool.ocr_mode if ocr_pool else ocr_mode
+        self.use_ocr_cache = ocr_pool.use_cache if ocr_pool else use_ocr_cache
+        self._ocr_service: Optional[PaddleOCRService] = None  # 顺序模式使用，首次使用时加载模型
+        self._own_pool_cache_stats: Optional[dict] = None  # 本次处理单独启动的进程池的缓存统计
         self.result_processor = ResultProcessor(video_path)
+        self.run_stats: Optional[dict] = None  # 最近一次 run() 的统计（原始结果统计、结果文件、输出字幕数、耗时）
+
+        # 断点续跑日志（入点模式不写日志）
+        self.resume = resume
+        self.resume_frame: Optional[int] = None  # 续跑时本次处理的起始帧
+        self.journal: Optional[RunJournal] = None
+        self._journal_valid = True  # OCR批次失败后不再写检查点，续跑时重新处理失败之后的帧
+        # 分段模式回放采样时记录的 (选中帧, 该帧处理完时的采样状态)：回放领先于任务产出，写检查点时不能取当前状态
+        self._replayed_states: Optional[Deque[Tuple[int, dict]]] = None
+        if journal and bisect_step is None:
+            self.journal = RunJournal(video_path, {
+                'start_frame': self.preprocessor.start_frame,
+                'end_frame': self.preprocessor.end_frame,
+                'lut_path': os.path.abspath(lut_path) if lut_path else None,
+                'two_pass': two_pass, 'probe_mode': probe_mode, 'probe_step': probe_step,
+                'preprocess_workers': preprocess_workers, 'ocr_mode': self.ocr_mode, 'sampler': sampler,
+                # 实际使用的解码方式（ffmpeg 不可用时回退）、帧索引和静态ROI跳过
+                'decode_backend': self.preprocessor.decode_backend,
+                'use_frame_index': self.preprocessor.frame_index is not None,
+                'static_skip': self.preprocessor.change_detector is not None,
+            })
 
         print("主协调器初始化完成")
 
-    def run(self, parallel: bool = True) -> str:
-        """运行完整的处理流程"""
+    @property
+    def ocr_service(self) -> PaddleOCRService:
+        """主进程中的OCR服务（只有顺序模式需要，避免并行模式在主进程中多加载一次模型）"""
+        if self._ocr_service is None:
+            self._ocr_service = PaddleOCRService(self.ocr_mode, self.use_ocr_cache)
+        return self._ocr_service
+
+    def run(self, parallel: bool = True, output_file: Optional[str] = None) -> str:
+        """运行完整的处理流程（output_file 为空时使用默认的结果文件名）"""
         start_time = time.time()
 
         try:
+            resume_point = self._start_journal()
+
             # 选择处理模式
-            if parallel and self.preprocessor.total_frames_to_process > 1000:  # 长视频使用并行
+            if parallel and self.ocr_pool:  # 传入了常驻进程池时不在主进程中另外加载模型
+                print("使用常驻OCR进程池，并行处理")
+                results = self.iter_video_parallel()
+            elif parallel and self.preprocessor.total_frames_to_process > 1000:  # 长视频使用并行
                 print("检测到长视频，使用并行处理模式")
-                results = self.process_video_parallel()
+                results = self.iter_video_parallel()
             else:
                 print("使用顺序处理模式")
-                results = self.process_video_sequential()
-
-            # 完整的后处理流程（包括过滤和去重）
-            filtered_results = self.result_processor.process_results(results)
-
-            # 保存结果
-            output_file = self.result_processor.save_to_csv(filtered_results)
+                results = self.iter_video_sequential()
+
+            # 续跑时已处理部分的结果在前，与新结果合并后一起后处理
+            if resume_point:
+                results = itertools.chain(resume_point.results, results)
+
+            if self.bisect_step:
+                # 入点模式每条字幕只保留一个结果（入点帧或备用帧），无需连续帧去重
+                results = self._select_inpoint_results(list(results))
+                filtered_results = self.result_processor.process_results(results, continuous_dedup=False)
+                stats = self.result_processor.get_statistics(results)
+                output_file = self.result_processor.save_to_csv(filtered_results, output_file)
+                caption_count = len(filtered_results)
+            else:
+                # 在线字幕跟踪：结果按帧顺序到达时即过滤、去重，字幕结束后立即写入CSV
+                # （文件与批量后处理的输出一致，内存中只保留未结束和尚在合并窗口内的字幕）
+                tracker = CaptionTracker(self.result_processor)
+                output_file, result_count = self.result_processor.stream_to_csv(
+                    (event.result for event in tracker.track(results)), output_file)
+                stats = tracker.get_statistics()
+                caption_count = result_count
+                print(f"\n字幕跟踪完成: 最终 {result_count} 个结果 "
+                      f"(出现 {tracker.transitions['appear']}，变化 {tracker.transitions['change']}，"
+                      f"消失 {tracker.transitions['disappear']})")
 
             # 显示统计信息
-            stats = self.result_processor.get_statistics(results)
             elapsed_time = time.time() - start_time
 
             print("\n=== 处理完成 ===")
@@ -81,10 +195,20 @@ class MainCoordinator:
             print(f"VFX字幕: {stats['vfx_count']} 个")
             print(f"DI字幕: {stats['di_count']} 个")
             print(f"帧范围: {stats['frame_range']}")
+            detection_stats = self.get_detection_stats()
+            print(f"颜色检测: 完整分析 {detection_stats['analyzed_frames']} 帧，"
+                  f"静态ROI跳过 {detection_stats['static_skipped_frames']} 帧")
+            cache_stats = self.get_cache_stats()
+            if cache_stats['lookups']:
+                print(f"OCR缓存: 命中 {cache_stats['hits']}/{cache_stats['lookups']} "
+                      f"({cache_stats['hits'] / cache_stats['lookups'] * 100:.1f}%)")
             print(f"结果文件: {output_file}")
+            self.run_stats = dict(stats, output_file=output_file, caption_count=caption_count,
+                                  elapsed_seconds=elapsed_time)
 
-            # 清理临时文件
+            # 清理临时文件（结果文件已写完，续跑日志不再需要）
             self._cleanup_tmp_files()
+            self._remove_journal()
 
             return output_file
 
@@ -92,6 +216,66 @@ class MainCoordinator:
             print(f"处理过程中发生错误: {e}")
             raise
 
+        finally:
+            if self.journal:
+                self.journal.close()
+
+    def _start_journal(self) -> Optional[ResumePoint]:
+        """打开续跑日志；续跑时恢复最后一个检查点的采样状态并确定起始帧，返回检查点"""
+        if not self.journal:
+            return None
+
+        resume_point = self.journal.load() if self.resume else None
+        if resume_point:
+            self.resume_frame = resume_point.frame_number + 1
+            self.preprocessor.sampler.set_state(resume_point.sampler_state)
+            print(f"从续跑日志恢复: 帧 {self.preprocessor.start_frame}-{resume_point.frame_number} 已处理 "
+                  f"({len(resume_point.results)} 个OCR结果)，从帧 {self.resume_frame} 继续")
+        elif self.resume:
+            print("没有可用的续跑日志，从头处理")
+
+        self.journal.open(resume_point)
+        print(f"续跑日志: {self.journal.path}")
+        return resume_point
+
+    def _journal_record(self, results: List[OCRResult], frame_number: int, sampler_state: dict,
+                        force: bool = False):
+        """记录已按帧顺序完成的OCR结果，frame_number 及之前的帧已全部处理完"""
+        if self.journal and self._journal_valid:
+            self.journal.record(results, frame_number, sampler_state, force)
+
+    def _finish_journal(self):
+        """处理范围全部完成：写最终检查点"""
+        self._journal_record([], self.preprocessor.end_frame - 1, self.preprocessor.sampler.get_state(), force=True)
+
+    def _remove_journal(self):
+        """处理成功后删除续跑日志（OCR批次失败时保留，续跑时重新处理失败之后的帧）"""
+        if self.journal and self._journal_valid and not JOURNAL_KEEP_ON_SUCCESS:
+            self.journal.remove()
+            print(f"已删除续跑日志: {self.journal.path}")
+
+    def get_detection_stats(self) -> dict:
+        """汇总主进程与分段子进程的颜色检测统计"""
+        return {
+            key: self.preprocessor.detection_stats[key] + self.worker_detection_stats[key]
+            for key in self.worker_detection_stats
+        }
+
+    def get_cache_stats(self) -> dict:
+        """汇总OCR进程池与主进程的OCR缓存命中统计"""
+        cache_stats = {'hits': 0, 'lookups': 0}
+        sources = []
+        if self.ocr_pool:
+            sources.append(self.ocr_pool.get_cache_stats())
+        if self._own_pool_cache_stats:
+            sources.append(self._own_pool_cache_stats)
+        if self._ocr_service and self._ocr_service.get_cache_stats():
+            sources.append(self._ocr_service.get_cache_stats())
+        for source in sources:
+            for key in cache_stats:
+                cache_stats[key] += source[key]
+        return cache_stats
+
     def _cleanup_tmp_files(self):
         """清理临时目录中的临时文件"""
         try:
@@ -109,149 +293,439 @@ class MainCoordinator:
         except Exception as e:
             print(f"\n清理临时文件失败: {e}")
 
-    def process_video_sequential(self) -> List[OCRResult]:
-        """顺序处理视频（适合短视频或调试）"""
+    def iter_video_sequential(self) -> Iterator[OCRResult]:
+        """顺序处理视频，按帧顺序逐个产出OCR结果"""
         print("使用顺序处理模式")
 
         # 顺序处理所有帧
-        ocr_tasks = self._sequential_preprocess_frames()
+        if self.bisect_step:
+            ocr_tasks = self._iter_inpoint_ocr_tasks()
+        else:
+            ocr_tasks = self._iter_sequential_ocr_tasks()
 
         # 顺序OCR处理
-        all_results = []
         for task in ocr_tasks:
             result = self.ocr_service.process_single_frame(task)
+            self._journal_record([result] if result else [], task.frame_number,
+                                 self.preprocessor.sampler.get_state())
             if result:
-                all_results.append(result)
-
-        return all_results
+                yield result
+        self._finish_journal()
 
-    def process_video_parallel(self) -> List[OCRResult]:
-        """并行处理视频（适合长视频）"""
+    def iter_video_parallel(self) -> Iterator[OCRResult]:
+        """并行处理视频：预处理与OCR流水线并行，OCR进程边解码边消费任务，按帧顺序产出OCR结果"""
         print("开始并行处理视频...")
 
-        # 阶段1: 顺序预处理
-        ocr_tasks = self._sequential_preprocess_frames()
-
-        # 阶段2: 并发OCR处理
-        results = self._concurrent_batch_ocr(ocr_tasks)
-
-        return results
-
-    def _sequential_preprocess_frames(self) -> List[FrameData]:
-        """顺序读取视频帧，逐帧进行预处理和颜色检测，积累需要OCR的帧数据"""
-        print("阶段1: 顺序预处理视频帧...")
-        ocr_tasks: List[FrameData] = []
-
-        # 使用预处理器的 VideoCapture，避免重复打开
-        cap = self.preprocessor.cap
-        if not cap.isOpened():
-            raise ValueError(f"无法打开视频文件: {self.video_path}")
-
+        # 阶段1: 预处理（可选分段多进程解码），按帧顺序逐个产出OCR任务
+        if self.bisect_step:
+            ocr_tasks = self._iter_inpoint_ocr_tasks()
+        elif self.preprocess_workers > 1:
+            ocr_tasks = self._iter_chunked_ocr_tasks()
+        else:
+            ocr_tasks = self._iter_sequential_ocr_tasks()
+
+        # 阶段2: 并发OCR处理（与阶段1同时进行）
+        yield from self._iter_concurrent_batch_ocr(ocr_tasks)
+        self._finish_journal()
+
+    def benchmark_ocr_batch_sizes(self, num_samples: int = 64) -> Optional[Tuple[int, int]]:
+        """
+        取处理范围内前 num_samples 个OCR任务，测量本机最快的 predict 批大小（单进程推理）
+        和最快的 BATCH_SIZE（进程池端到端吞吐量），返回 (predict批大小, BATCH_SIZE)
+        """
+        sample_tasks: List[FrameData] = []
+        for frame_data in self._iter_sequential_ocr_tasks():
+            sample_tasks.append(frame_data)
+            if len(sample_tasks) >= num_samples:
+                break
+
+        if not sample_tasks:
+            print("处理范围内没有OCR任务，无法测量批大小")
+            return None
+
+        print(f"\n使用 {len(sample_tasks)} 个OCR任务测量 predict 批大小...")
+        throughput = self.ocr_service.benchmark_batch_sizes(sample_tasks)
+        best_predict_size = max(throughput, key=throughput.get)
+        print(f"推荐 OCR_PREDICT_BATCH_SIZE = {best_predict_size} ({throughput[best_predict_size]:.1f} 图像/秒)")
+
+        # BATCH_SIZE 决定进程间的负载均衡和每批的序列化开销，与单进程推理的批大小分开测量
+        candidates = sorted({OCR_PREDICT_BATCH_SIZE * factor for factor in (1, 2, 4, 8)} | {BATCH_SIZE})
+        pool_throughput = self._benchmark_pool_batch_sizes(sample_tasks, candidates)
+        best_batch_size = max(pool_throughput, key=pool_throughput.get)
+        print(f"推荐 BATCH_SIZE = {best_batch_size} ({pool_throughput[best_batch_size]:.1f} 图像/秒，"
+              f"{MAX_WORKERS} 个OCR进程，OCR_PREDICT_BATCH_SIZE = {OCR_PREDICT_BATCH_SIZE})")
+        return best_predict_size, best_batch_size
+
+    def _benchmark_pool_batch_sizes(self, sample_tasks: List[FrameData], batch_sizes: List[int],
+                                    rounds: int = 4, repeats: int = 2) -> Dict[int, float]:
+        """
+        用不带缓存的OCR进程池测量不同 BATCH_SIZE 的端到端吞吐量（图像/秒）
+
+        样本任务重复 rounds 遍以保证每个进程都分到多个批次；先整体预热一次（加载模型），
+        每个批大小取 repeats 次中最快的一次。任务随批次序列化传递，不经过共享内存。
+        """
+        tasks = sample_tasks * rounds
+        print(f"\n使用 {len(tasks)} 个OCR任务测量进程池 BATCH_SIZE...")
+
+        throughput = {}
+        with OCRWorkerPool(ocr_mode=self.ocr_mode, use_cache=False) as pool:
+            # 预热：每个进程加载模型
+            wait([pool.submit(sample_tasks[i::pool.max_workers])
+                  for i in range(min(pool.max_workers, len(sample_tasks)))])
+
+            for batch_size in batch_sizes:
+                best_seconds = None
+                for _ in range(repeats):
+                    start = time.time()
+                    futures = [pool.submit(tasks[i:i + batch_size]) for i in range(0, len(tasks), batch_size)]
+                    for future in futures:
+                        future.result()
+                    elapsed = time.time() - start
+                    if best_seconds is None or elapsed < best_seconds:
+                        best_seconds = elapsed
+                throughput[batch_size] = len(tasks) / max(best_seconds, 1e-9)
+                print(f"BATCH_SIZE {batch_size:>3}: {throughput[batch_size]:.1f} 图像/秒")
+
+        return throughput
+
+    def _get_preprocess_ranges(self) -> List[Tuple[int, int]]:
+        """获取需要全帧率预处理的帧区间（两遍扫描模式下只包含活跃区间）"""
         start_frame = self.preprocessor.start_frame
         end_frame = self.preprocessor.end_frame
-        total_frames_to_process = self.preprocessor.total_frames_to_process
+        if not self.two_pass:
+            return self._clip_to_resume([(start_frame, end_frame)])
+
+        probe_frames = self.preprocessor.get_probe_frames(self.probe_mode, self.probe_step)
+        print(f"两遍扫描: 第一遍探测 {len(probe_frames)} 帧...")
+        probe_start = time.time()
+        frame_ranges = self.preprocessor.probe_active_intervals(probe_frames)
+        active_frames = sum(end - start for start, end in frame_ranges)
+        coverage = active_frames / max(1, self.preprocessor.total_frames_to_process) * 100
+        print(f"探测完成 ({time.time() - probe_start:.2f} 秒): {len(frame_ranges)} 个活跃区间，"
+              f"共 {active_frames} 帧 (占处理范围 {coverage:.2f}%)")
+        return self._clip_to_resume(frame_ranges)
+
+    def _clip_to_resume(self, frame_ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """续跑时去掉已处理的帧"""
+        if self.resume_frame is None:
+            return frame_ranges
+        return [(max(start, self.resume_frame), end) for start, end in frame_ranges if end > self.resume_frame]
+
+    def _iter_sequential_ocr_tasks(self) -> Iterator[FrameData]:
+        """顺序读取视频帧，逐帧进行预处理和颜色检测，按帧顺序产出需要OCR的帧数据"""
+        frame_ranges = self._get_preprocess_ranges()
+        print("阶段1: 顺序预处理视频帧...")
+        task_count = 0
 
-        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-        frame_number = start_frame
+        total_frames = sum(end - start for start, end in frame_ranges)
         processed_count = 0
 
-        try:
-            while frame_number < end_frame:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                frame_data = self._preprocess_single_frame(frame, frame_number)
+        # 使用预处理器的解码后端，避免重复打开视频
+        for start_frame, end_frame in frame_ranges:
+            for frame_number, roi in self.preprocessor.iter_roi_frames(start_frame, end_frame):
+                frame_data = self._preprocess_single_frame(roi, frame_number)
                 if frame_data:
-                    ocr_tasks.append(frame_data)
+                    task_count += 1
+                    yield frame_data
 
                 processed_count += 1
-                progress = self.preprocessor.get_progress_info(processed_count)
-                print(f"\r预处理进度: {progress} ({processed_count}/{total_frames_to_process} 帧)", end="", flush=True)
-                frame_number += 1
-        finally:
-            # 确保 VideoCapture 被释放（虽然预处理器的 __del__ 也会释放）
-            pass  # cap 由 VideoPreprocessor 管理
-
-        print(f"\n预处理完成，获得 {len(ocr_tasks)} 个OCR任务")
-        return ocr_tasks
-
-    def _preprocess_single_frame(self, frame: np.ndarray, frame_number: int) -> Optional[FrameData]:
-        """预处理单帧：颜色检测，决定是否需要OCR"""
+                progress = self.preprocessor.get_progress_info(processed_count, total_frames)
+                print(f"\r预处理进度: {progress} ({processed_count}/{total_frames} 帧)", end="", flush=True)
+
+        print(f"\n预处理完成，获得 {task_count} 个OCR任务")
+
+    def _select_inpoint_results(self, results: List[OCRResult]) -> List[OCRResult]:
+        """
+        入点模式：每条字幕的入点帧和备用帧结果中保留一个，帧号和时间码取入点帧
+
+        置信度达到 CAPTION_MIN_CONFIDENCE 且文本非空的结果中取最好的一个（与连续帧去重的组内选择相同），
+        入点帧处于淡入、识别失败或置信度过低时由备用帧的结果代替。
+        """
+        groups = {}
+        for result in results:
+            inpoint_frame = self.preprocessor.inpoint_frames.get((result.frame_number, result.text_type),
+                                                                 result.frame_number)
+            groups.setdefault((inpoint_frame, result.text_type), []).append(result)
+
+        selected = []
+        for (inpoint_frame, _), group in groups.items():
+            usable = [result for result in group if result.confidence >= CAPTION_MIN_CONFIDENCE and result.text.strip()]
+            best_result = self.result_processor._select_best_from_group(usable or group)
+            if best_result.frame_number != inpoint_frame:
+                best_result.frame_number = inpoint_frame
+                best_result.timecode = self.preprocessor.frame_to_smpte(inpoint_frame)
+            selected.append(best_result)
+        return selected
+
+    def _iter_inpoint_ocr_tasks(self) -> Iterator[FrameData]:
+        """入点模式：稀疏采样并二分定位字幕入点，产出入点帧的OCR任务（在主进程中解码）"""
+        print(f"阶段1: 每隔 {self.bisect_step} 帧采样，二分定位字幕入点...")
+        stats_before = self.get_detection_stats()
+        task_count = 0
+
+        for frame_data in self.preprocessor.iter_inpoint_tasks(self.bisect_step):
+            task_count += 1
+            yield frame_data
+
+        stats_after = self.get_detection_stats()
+        decoded_frames = sum(stats_after[key] - stats_before[key] for key in stats_after)
+        coverage = decoded_frames / max(1, self.preprocessor.total_frames_to_process) * 100
+        print(f"入点定位完成: 解码 {decoded_frames} 帧 (占处理范围 {coverage:.2f}%)，获得 {task_count} 个OCR任务")
+
+    def _iter_chunked_ocr_tasks(self) -> Iterator[FrameData]:
+        """
+        分段多进程预处理：分段按完成顺序返回裁剪后的候选帧，按分段顺序回放采样逻辑，
+        只把选中的候选帧交回进程池应用LUT并编码，按帧顺序产出OCR任务
+
+        分段不超过 MAX_FRAMES_PER_CHUNK 帧，按需提交：尚未产出完的分段不超过
+        进程数 + 1 个，第一个分段完成即可开始OCR，内存只与分段长度有关，与视频长度无关。
+        """
+        frame_ranges = self._get_preprocess_ranges()
+        total_frames = sum(end - start for start, end in frame_ranges)
+        num_chunks = max(min(self.preprocess_workers, max(1, total_frames // MIN_FRAMES_PER_CHUNK)),
+                         -(-total_frames // MAX_FRAMES_PER_CHUNK))
+        chunks = self.preprocessor.partition_frame_ranges(frame_ranges, num_chunks)
+        num_workers = min(self.preprocess_workers, len(chunks))
+        print(f"阶段1: 分段并行预处理视频帧... ({len(chunks)} 个分段，{num_workers} 个进程)")
+        if not chunks:
+            print("预处理完成，获得 0 个OCR任务")
+            return
+
+        # 已完成但尚未轮到的分段（重排缓冲），保证采样回放与帧顺序一致
+        finished_chunks = {}
+        next_chunk = 0
+        next_submit = 0
+        yielded_chunks = 0
+        max_outstanding = num_workers + 1
+        scan_futures = {}
+        build_futures = collections.deque()  # 按分段顺序排列的建任务请求
+        task_count = 0
+        processed_count = 0
+        worker_options = (self.preprocessor.decode_backend, self.use_frame_index, self.preprocessor.ocr_transport,
+                          self.sampler)
+        if self.journal:
+            self._replayed_states = collections.deque()
+
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=worker_mp_context()) as executor:
+            while next_submit < len(chunks) or scan_futures or build_futures:
+                # 已完成的建任务请求按分段顺序产出
+                while build_futures and build_futures[0].done():
+                    for frame_data in build_futures.popleft().result():
+                        task_count += 1
+                        yield frame_data
+                    yielded_chunks += 1
+
+                # 按需提交分段：已提交但尚未产出完的分段数有上限
+                while next_submit < len(chunks) and next_submit - yielded_chunks < max_outstanding:
+                    future = executor.submit(preprocess_chunk_parallel, self.video_path, self.lut_path,
+                                             chunks[next_submit], *worker_options)
+                    scan_futures[future] = next_submit
+                    next_submit += 1
+
+                if not scan_futures:
+                    if build_futures:
+                        wait([build_futures[0]])
+                    continue
+
+                done, _ = wait(list(scan_futures) + list(build_futures)[:1], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future not in scan_futures:
+                        continue
+                    index = scan_futures.pop(future)
+                    chunk_frames = sum(end - start for start, end in chunks[index])
+                    candidates, chunk_stats = future.result()
+                    decoded_frames = chunk_stats['decoded_frames']
+                    for key in self.worker_detection_stats:
+                        self.worker_detection_stats[key] += chunk_stats.get(key, 0)
+                    if decoded_frames < chunk_frames:
+                        print(f"\n⚠️ 警告: 分段 {chunks[index][0][0]}-{chunks[index][-1][1]} "
+                              f"仅解码 {decoded_frames}/{chunk_frames} 帧")
+
+                    finished_chunks[index] = candidates
+                    processed_count += chunk_frames
+                    progress = self.preprocessor.get_progress_info(processed_count, total_frames)
+                    print(f"\r预处理进度: {progress} ({processed_count}/{total_frames} 帧)", end="", flush=True)
+
+                while next_chunk in finished_chunks:
+                    selected = list(self._replay_sampling(finished_chunks.pop(next_chunk)))
+                    build_futures.append(executor.submit(build_tasks_parallel, self.video_path, self.lut_path,
+                                                         selected, *worker_options))
+                    next_chunk += 1
+
+        print(f"\n预处理完成，获得 {task_count} 个OCR任务")
+
+    def _replay_sampling(self, candidates: List[OCRCandidate]) -> Iterator[OCRCandidate]:
+        """对一个分段的候选帧按帧顺序回放 should_detect_ocr，产出选中的候选帧（必须按分段顺序调用）"""
+        skip_frame = None
+        for candidate in candidates:
+            # 与 _preprocess_single_frame 一致：每帧最多生成一个OCR任务
+            if candidate.frame_number == skip_frame:
+                continue
+            if self.preprocessor.should_detect_ocr(candidate.text_type, candidate.pixel_count,
+                                                   candidate.frame_number, candidate.signature):
+                skip_frame = candidate.frame_number
+                if self._replayed_states is not None:
+                    self._replayed_states.append((candidate.frame_number, self.preprocessor.sampler.get_state()))
+                yield candidate
+
+    def _preprocess_single_frame(self, roi: np.ndarray, frame_number: int) -> Optional[FrameData]:
+        """预处理单帧ROI：颜色检测，决定是否需要OCR"""
         # 使用预处理器的颜色检测逻辑
-        color_results = self.preprocessor.get_colored_pixel_count(frame)
+        color_results = self.preprocessor.detect_colors_in_roi(roi)
 
         for text_type, pixel_count, filtered_roi in color_results:
             # 检查是否应该进行OCR检测（已包含采样逻辑）
-            if self.preprocessor.should_detect_ocr(text_type, pixel_count):
-                # 应用LUT处理
-                processed_roi = filtered_roi
-                if self.preprocessor.lut_available and self.preprocessor.lut_path:
-                    try:
-                        processed_roi = self.preprocessor.apply_lut_processing(filtered_roi, self.preprocessor.lut_path)
-                        print(f"\n已应用LUT处理: 帧 {frame_number} ({text_type})")
-                    except Exception as e:
-                        print(f"\nLUT处理失败，使用原图: {e}")
-
-                # 将处理后的图像编码为字节流
-                success, encoded_img = cv2.imencode('.png', processed_roi)
-                if success:
-                    image_bytes = encoded_img.tobytes()
-                    frame_data = FrameData(
-                        frame_number=frame_number,
-                        timecode=self.preprocessor.frame_to_smpte(frame_number),
-                        image_bytes=image_bytes,
-                        pixel_count=pixel_count,
-                        text_type=text_type,
-                        image_shape=processed_roi.shape
-                    )
-                    return frame_data
-                else:
-                    print(f"图像编码失败: 帧{frame_number}")
-                    return None
+            if self.preprocessor.should_detect_ocr(text_type, pixel_count, frame_number,
+                                                   self.preprocessor.sampling_signature(filtered_roi)):
+                # 应用LUT处理并编码为字节流
+                return self.preprocessor.build_frame_data(frame_number, text_type, pixel_count, filtered_roi)
 
         return None
 
-    def _concurrent_batch_ocr(self, ocr_tasks: List[FrameData]) -> List[OCRResult]:
-        """并发处理OCR批次"""
-        if not ocr_tasks:
-            return []
-
-        # 分批处理
-        ocr_batches = []
-        for i in range(0, len(ocr_tasks), BATCH_SIZE):
-            batch = ocr_tasks[i:i + BATCH_SIZE]
-            ocr_batches.append(batch)
-
-        print(f"OCR任务分批: {len(ocr_tasks)} 个任务 → {len(ocr_batches)} 个批次")
-
-        # 使用进程池并发处理OCR批次
-        all_ocr_results = []
-        with ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(ocr_batches))) as executor:
-            # 提交所有OCR批次任务
-            future_to_batch = {}
-            for batch in ocr_batches:
-                future = executor.submit(process_ocr_batch_parallel, batch)
-                future_to_batch[future] = batch
-
-            # 收集结果
-            completed_batches = 0
-            for future in future_to_batch:
+    def _iter_concurrent_batch_ocr(self, ocr_tasks: Iterable[FrameData]) -> Iterator[OCRResult]:
+        """
+        并发处理OCR批次（流式）：边从 ocr_tasks 取任务边提交批次，边产出已完成的结果
+
+        在途批次数不超过 OCR_MAX_PENDING_BATCHES（共享内存传输时还受槽位数限制），
+        队列满时等待任一批次完成后再继续读取任务，内存占用与视频长度无关。
+        批次按完成顺序返回，经重排缓冲后按提交顺序产出结果。
+        """
+        ring = self._create_frame_ring()
+        ring_spec = ring.spec if ring else None
+
+        ready_results: List[OCRResult] = []  # 已按提交顺序排好、尚未产出的结果
+        finished_batches = {}  # 已完成但尚未轮到的批次结果（重排缓冲）
+        next_batch = 0
+        pending = {}  # future → (批次序号, 占用的槽位)
+        checkpoints = {}  # 批次序号 → (批次最后一帧, 该帧之后的采样状态)，用于续跑日志
+        submitted_batches = 0
+        completed_batches = 0
+
+        def collect(futures):
+            nonlocal next_batch, completed_batches
+            for future in futures:
+                index, slots = pending.pop(future)
+                if ring:
+                    ring.release(slots)
                 try:
-                    batch_results = future.result()
-                    all_ocr_results.extend(batch_results)
-
+                    finished_batches[index], batch_stats = future.result()
+                    pool.record(batch_stats)
                     completed_batches += 1
-                    progress_percentage = (completed_batches / len(ocr_batches)) * 100
-                    progress = f"OCR进度: {progress_percentage:.2f}% ({completed_batches}/{len(ocr_batches)} 批次)"
-                    print(f"\r{progress}", end="", flush=True)
-
                 except Exception as e:
-                    batch = future_to_batch[future]
+                    finished_batches[index] = []
+                    self._journal_valid = False
                     print(f"OCR批次处理失败: {e}")
 
-        print(f"\rOCR进度: 100.00% ({len(ocr_batches)}/{len(ocr_batches)} 批次)")
-        return all_ocr_results
+                while next_batch in finished_batches:
+                    batch_results = finished_batches.pop(next_batch)
+                    ready_results.extend(batch_results)
+                    if next_batch in checkpoints:
+                        self._journal_record(batch_results, *checkpoints.pop(next_batch))
+                    next_batch += 1
+
+                print(f"\rOCR进度: {completed_batches}/{submitted_batches} 批次", end="", flush=True)
+
+        def submit(batch):
+            nonlocal submitted_batches
+            # 背压：在途批次过多或槽位不足时等待任一在途批次完成
+            while pending and (len(pending) >= OCR_MAX_PENDING_BATCHES or
+                               (ring and ring.free_slots < len(batch))):
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            if self.journal:
+                last_frame = batch[-1].frame_number
+                checkpoints[submitted_batches] = (last_frame, self._sampler_state_after(last_frame))
+            slots = []
+            if ring:
+                batch, slots = self._stage_batch(batch, ring)
+            future = pool.submit(batch, ring_spec)
+            pending[future] = (submitted_batches, slots)
+            submitted_batches += 1
+
+        # 使用常驻进程池并发处理OCR批次（未传入进程池时为本次处理单独启动一个）
+        pool = self.ocr_pool or OCRWorkerPool(ocr_mode=self.ocr_mode, use_cache=self.use_ocr_cache)
+        try:
+            batch: List[FrameData] = []
+            for frame_data in ocr_tasks:
+                batch.append(frame_data)
+                if len(batch) == BATCH_SIZE:
+                    submit(batch)
+                    batch = []
+                    yield from ready_results
+                    ready_results.clear()
+            if batch:
+                submit(batch)
+                if self.journal:
+                    # 任务已取完：最后一个批次完成时处理范围内的帧全部处理完
+                    checkpoints[submitted_batches - 1] = (self.preprocessor.end_frame - 1,
+                                                          self.preprocessor.sampler.get_state())
+
+            print(f"OCR任务分批: {submitted_batches} 个批次")
+            for future in as_completed(list(pending)):
+                collect([future])
+                yield from ready_results
+                ready_results.clear()
+        finally:
+            if pool is not self.ocr_pool:
+                self._own_pool_cache_stats = pool.get_cache_stats()
+                pool.shutdown()
+            if ring:
+                ring.close()
+
+        print(f"\rOCR进度: 100.00% ({completed_batches}/{submitted_batches} 批次)")
+        pool.print_stats()
+
+    def _sampler_state_after(self, frame_number: int) -> dict:
+        """
+        frame_number 处理完时的采样状态（写检查点用）
+
+        顺序和单进程流水线按需生成任务，取出任务时采样恰好推进到该帧；分段模式整段回放后才产出任务，
+        当前状态已包含之后的候选帧，因此取回放时记录的状态
+        """
+        if self._replayed_states is None:
+            return self.preprocessor.sampler.get_state()
+        state = None
+        while self._replayed_states and self._replayed_states[0][0] <= frame_number:
+            state = self._replayed_states.popleft()[1]
+        return state if state is not None else self.preprocessor.sampler.get_state()
+
+    def _create_frame_ring(self) -> Optional[SharedFrameRing]:
+        """创建OCR图像的共享内存环形缓冲区（PNG传输或共享内存不可用时返回 None）"""
+        if self.preprocessor.ocr_transport != 'shm':
+            return None
+        if not SHARED_MEMORY_AVAILABLE:
+            print("⚠️ 警告: 共享内存不可用，OCR图像随任务序列化传递")
+            return None
+
+        # 槽位按整条ROI的大小分配：裁剪后的图像不会更大（缩放到固定行高后超出的图像随任务传递）
+        slot_bytes = self.preprocessor.roi_top * (self.preprocessor.video_info.width - self.preprocessor.roi_right) * 3
+        num_slots = max(BATCH_SIZE, SHM_RING_SLOTS)
+        try:
+            return SharedFrameRing(num_slots, slot_bytes)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 警告: 共享内存创建失败，OCR图像随任务序列化传递: {e}")
+            return None
+
+    @staticmethod
+    def _stage_batch(batch: List[FrameData], ring: SharedFrameRing) -> Tuple[List[FrameData], List[int]]:
+        """把批次中的原始像素写入环形缓冲区，任务只保留槽位号、形状和数据类型"""
+        staged: List[FrameData] = []
+        slots: List[int] = []
+
+        for frame_data in batch:
+            slot = None
+            if frame_data.image_format == 'raw':
+                image = np.frombuffer(frame_data.image_bytes, dtype=frame_data.image_dtype)
+                slot = ring.put(image)
+
+            if slot is None:
+                staged.append(frame_data)
+            else:
+                staged.append(dataclasses.replace(frame_data, image_bytes=b'', shm_slot=slot))
+                slots.append(slot)
+
+        return staged, slots
 
 
 def main():
@@ -262,16 +736,58 @@ def main():
     parser.add_argument('--start_time', '-s', type=str, help='开始时间 (HH:MM:SS 或 MM:SS 或 SS)')
     parser.add_argument('--end_time', '-e', type=str, help='结束时间 (HH:MM:SS 或 MM:SS 或 SS)')
     parser.add_argument('--sequential', action='store_true', help='强制使用顺序处理模式')
+    parser.add_argument('--preprocess_workers', '-p', type=int, default=PREPROCESS_WORKERS,
+                        help='分段并行预处理的进程数 (1 = 单进程解码)')
+    parser.add_argument('--decode_backend', type=str, choices=['opencv', 'ffmpeg'], default=DECODE_BACKEND,
+                        help='解码后端: opencv 解码整帧，ffmpeg 只解码ROI条带（不可用时回退到OpenCV）')
+    parser.add_argument('--two_pass', action='store_true', help='两遍扫描：先低频探测，只在有字幕的区间全帧率处理')
+    parser.add_argument('--probe_step', type=int, default=PROBE_STEP, help='两遍扫描第一遍的探测间隔(帧)')
+    parser.add_argument('--probe_mode', type=str, choices=['step', 'keyframes'], default=PROBE_MODE,
+                        help='两遍扫描第一遍的探测方式: step 每隔 probe_step 帧，keyframes 仅关键帧（需要 --frame_index）')
+    parser.add_argument('--frame_index', action='store_true', default=USE_FRAME_INDEX,
+                        help='使用帧索引文件（关键帧位置与PTS映射，首次运行时建立）加速随机访问')
+    parser.add_argument('--ocr_transport', type=str, choices=['shm', 'png'], default=OCR_TRANSPORT,
+                        help='OCR图像传输方式: shm 原始像素经共享内存传递，png PNG编码后序列化传递')
+    parser.add_argument('--ocr_mode', type=str, choices=['full', 'rec_only'], default=OCR_MODE,
+                        help='OCR模式: full 检测+识别，rec_only 单行字幕跳过文本检测（低置信度或多行时回退）')
+    parser.add_argument('--sampler', type=str, choices=['alternate', 'adaptive'], default=SAMPLING_SCHEDULER,
+                        help='OCR采样调度: alternate 每隔一帧检测，adaptive 字幕出现/变化时密集采样、稳定后指数退避')
+    parser.add_argument('--bisect_step', type=int, default=None,
+                        help=f'入点模式：每隔N帧采样（建议 {BISECT_STEP}，不大于最短字幕持续帧数），二分定位字幕入点，只对入点帧OCR')
+    parser.add_argument('--no_ocr_cache', action='store_true', help='不使用OCR结果缓存（每帧都重新识别）')
+    parser.add_argument('--resume', action='store_true',
+                        help='从上次中断的处理继续（同一视频、同一配置的续跑日志中最后一个检查点之后）')
+    parser.add_argument('--benchmark_batch_sizes', action='store_true',
+                        help='只测量本机不同OCR批大小的吞吐量并给出推荐值，不生成结果文件')
+    parser.add_argument('--ocr_server', type=str, default=None,
+                        help='使用常驻OCR服务（ocr_server.py）的地址作为OCR后端，例如 http://127.0.0.1:8766')
 
     args = parser.parse_args()
 
+    ocr_pool = None
     try:
+        # 使用OCR服务时OCR模式和缓存设置以服务为准
+        ocr_pool = RemoteOCRPool(args.ocr_server) if args.ocr_server else None
+
         # 创建协调器
         coordinator = MainCoordinator(
             args.video_path,
             args.lut_path,
             args.start_time,
-            args.end_time
+            args.end_time,
+            preprocess_workers=args.preprocess_workers,
+            decode_backend=args.decode_backend,
+            two_pass=args.two_pass,
+            probe_mode=args.probe_mode,
+            probe_step=args.probe_step,
+            use_frame_index=args.frame_index,
+            ocr_transport=args.ocr_transport,
+            ocr_mode=args.ocr_mode,
+            use_ocr_cache=OCR_CACHE_ENABLED and not args.no_ocr_cache,
+            sampler=args.sampler,
+            bisect_step=args.bisect_step,
+            resume=args.resume,
+            ocr_pool=ocr_pool
         )
 
         # 显示处理信息
@@ -285,6 +801,10 @@ def main():
 
         print(f"开始分析视频: {args.video_path}{time_info}")
 
+        if args.benchmark_batch_sizes:
+            coordinator.benchmark_ocr_batch_sizes()
+            return 0
+
         # 运行处理
         use_parallel = not args.sequential
         output_file = coordinator.run(parallel=use_parallel)
@@ -294,6 +814,9 @@ def main():
     except Exception as e:
         print(f"错误: {str(e)}")
         return 1
+    finally:
+        if ocr_pool:
+            ocr_pool.shutdown()
 
     return 0
 
@@ -0,0 +1,182 @@
+"""
+OCR结果缓存
+以OCR图像像素的哈希为键缓存模型输出（文本、置信度、文本框），
+内存LRU + 临时目录下的SQLite持久化存储，跨帧、跨运行复用
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+from config import TMP_DIR, OCR_CACHE_FILE, OCR_CACHE_MEMORY_ENTRIES, OCR_CACHE_MAX_BYTES, OCR_CACHE_TOUCH_BATCH
+
+# 缓存格式版本，缓存内容的结构变化时递增以使旧条目失效
+OCR_CACHE_VERSION = 1
+
+
+class OCRCache:
+    """两级OCR结果缓存：进程内LRU在前，SQLite文件在后（多个进程可共用同一个文件）"""
+
+    def __init__(self, namespace: str, db_path: Optional[str] = None,
+                 memory_entries: int = OCR_CACHE_MEMORY_ENTRIES, max_bytes: int = OCR_CACHE_MAX_BYTES):
+        """
+        初始化缓存
+
+        namespace 标识产生结果的OCR配置（引擎、模式、语言、模型），不同配置的结果互不命中。
+        """
+        self.namespace = f"v{OCR_CACHE_VERSION}|{namespace}"
+        self.db_path = db_path or os.path.join(TMP_DIR, OCR_CACHE_FILE)
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.memory: 'OrderedDict[str, List[Dict[str, Any]]]' = OrderedDict()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        # 尚未写回文件的磁盘命中时间（key → last_used），攒够一批或下次写入时一并提交
+        self.pending_touches: Dict[str, float] = {}
+
+        self.connection = None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self.connection = sqlite3.connect(self.db_path, timeout=30)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_cache ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS ocr_cache_last_used ON ocr_cache (last_used)")
+            self._create_size_counter()
+            self.connection.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ 警告: OCR缓存文件不可用，只使用内存缓存: {e}")
+            self.connection = None
+
+    def _create_size_counter(self):
+        """
+        条目总大小记录在 ocr_cache_meta 表中，由触发器随插入、更新、删除维护，
+        多个进程共用同一文件时也保持一致，写入时不必扫描全表求和
+        """
+        self.connection.execute("CREATE TABLE IF NOT EXISTS ocr_cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.connection.execute(
+            "CREATE TRIGGER IF NOT EXISTS ocr_cache_size_insert AFTER INSERT ON ocr_cache BEGIN "
+            "UPDATE ocr_cache_meta SET value = value + NEW.size WHERE name = 'total_bytes'; END"
+        )
+        self.connection.execute(
+            "CREATE TRIGGER IF NOT EXISTS ocr_cache_size_update AFTER UPDATE OF size ON ocr_cache BEGIN "
+            "UPDATE ocr_cache_meta SET value = value + NEW.size - OLD.size WHERE name = 'total_bytes'; END"
+        )
+        self.connection.execute(
+            "CREATE TRIGGER IF NOT EXISTS ocr_cache_size_delete AFTER DELETE ON ocr_cache BEGIN "
+            "UPDATE ocr_cache_meta SET value = value - OLD.size WHERE name = 'total_bytes'; END"
+        )
+        # 计数器不存在时（新文件或旧版本的缓存文件）统计一次已有条目
+        self.connection.execute(
+            "INSERT OR IGNORE INTO ocr_cache_meta (name, value) "
+            "SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM ocr_cache"
+        )
+
+    def make_key(self, image: np.ndarray) -> str:
+        """OCR图像的内容键：配置命名空间 + 形状 + 数据类型 + 全部像素的哈希"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{self.namespace}|{image.shape}|{image.dtype.name}".encode('utf-8'))
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """查询缓存，未命中返回 None"""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.stats['memory_hits'] += 1
+            return self.memory[key]
+
+        if self.connection:
+            try:
+                row = self.connection.execute("SELECT payload FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+                if row:
+                    self.pending_touches[key] = time.time()
+                    if len(self.pending_touches) >= OCR_CACHE_TOUCH_BATCH:
+                        self._flush_touches()
+                        self.connection.commit()
+                    payload = json.loads(row[0])
+                    self._remember(key, payload)
+                    self.stats['disk_hits'] += 1
+                    return payload
+            except sqlite3.Error as e:
+                print(f"⚠️ 警告: OCR缓存读取失败: {e}")
+
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, key: str, payload: List[Dict[str, Any]]):
+        """写入缓存（payload 须可JSON序列化），文件超过大小上限时淘汰最久未使用的条目"""
+        self._remember(key, payload)
+        if not self.connection:
+            return
+
+        text = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+        try:
+            # UPSERT 而不是 INSERT OR REPLACE：REPLACE 删除旧行时不触发删除触发器，总大小会偏大
+            self.connection.execute(
+                "INSERT INTO ocr_cache (key, payload, size, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET payload = excluded.payload, size = excluded.size, "
+                "last_used = excluded.last_used",
+                (key, text, len(text.encode('utf-8')), time.time())
+            )
+            self._flush_touches()
+            self._evict()
+            self.connection.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ 警告: OCR缓存写入失败: {e}")
+
+    def _remember(self, key: str, payload: List[Dict[str, Any]]):
+        """放入进程内LRU"""
+        self.memory[key] = payload
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _flush_touches(self):
+        """把攒下的磁盘命中时间写回文件（由调用方提交）"""
+        if not self.pending_touches:
+            return
+        self.connection.executemany("UPDATE ocr_cache SET last_used = ? WHERE key = ?",
+                                    [(last_used, key) for key, last_used in self.pending_touches.items()])
+        self.pending_touches.clear()
+
+    def _evict(self):
+        """持久化条目总大小超过上限时，按最久未使用淘汰到上限的90%（一条语句批量删除）"""
+        total_bytes = self.connection.execute(
+            "SELECT value FROM ocr_cache_meta WHERE name = 'total_bytes'").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        # 沿 last_used 索引累计大小，找到释放足够空间的截止时间
+        excess_bytes = total_bytes - self.max_bytes * 0.9
+        released = 0
+        cutoff = None
+        for last_used, size in self.connection.execute("SELECT last_used, size FROM ocr_cache ORDER BY last_used"):
+            released += size
+            cutoff = last_used
+            if released >= excess_bytes:
+                break
+        if cutoff is not None:
+            self.connection.execute("DELETE FROM ocr_cache WHERE last_used <= ?", (cutoff,))
+
+    def get_stats(self) -> dict:
+        """命中统计"""
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        lookups = hits + self.stats['misses']
+        return dict(self.stats, hits=hits, lookups=lookups, hit_rate=hits / lookups if lookups else 0.0)
+
+    def close(self):
+        """关闭缓存文件"""
+        if self.connection:
+            try:
+                self._flush_touches()
+                self.connection.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ 警告: OCR缓存写入失败: {e}")
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,547 @@
+"""
+OCR服务
+常驻的本机OCR服务：进程中只加载一份模型，流水线、批处理和质检脚本等工具经HTTP提交ROI图像；
+各请求的图像进入同一个队列，由推理线程按最大批大小和最长等待时间合并为微批次推理，再按请求拆分结果返回
+
+请求格式（POST /ocr）：4字节（大端）头部长度 + JSON头部 + 按顺序拼接的图像字节。
+头部的 frames 为各帧的 FrameData 字段（不含 image_bytes，另有 image_size 为该帧图像的字节数），
+ring 为共享内存环形缓冲区的描述（槽位中的图像由服务直接读取，只适用于同一台机器）
+"""
+
+import argparse
+import collections
+import dataclasses
+import json
+import os
+import struct
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import numpy as np
+from video_preprocessor import FrameData
+from paddle_ocr_service import PaddleOCRService, OCRResult
+from shared_frame_ring import SharedFrameRing
+from config import (OCR_MODE, OCR_CACHE_ENABLED, OCR_WARMUP, OCR_SERVER_HOST, OCR_SERVER_PORT,
+                    OCR_SERVER_MAX_BATCH_SIZE, OCR_SERVER_MAX_WAIT_MS, OCR_SERVER_METRICS_WINDOW,
+                    OCR_SERVER_CLIENT_CONNECTIONS, OCR_SERVER_CLIENT_RETRIES, OCR_SERVER_CLIENT_RETRY_SECONDS)
+
+# FrameData 中以元组表示的字段（JSON中为列表）
+TUPLE_FIELDS = ('image_shape', 'crop_offset', 'text_bbox')
+
+
+def encode_request(frame_batch: List[FrameData], ring_spec: Optional[Tuple[str, int, int]] = None) -> bytes:
+    """把一批任务编码为 /ocr 请求体"""
+    frames = []
+    for frame_data in frame_batch:
+        values = {field.name: getattr(frame_data, field.name) for field in dataclasses.fields(FrameData)
+                  if field.name != 'image_bytes'}
+        values['image_size'] = len(frame_data.image_bytes)
+        frames.append(values)
+    header = json.dumps({'frames': frames, 'ring': list(ring_spec) if ring_spec else None}).encode('utf-8')
+    return b''.join([struct.pack('>I', len(header)), header] + [frame_data.image_bytes for frame_data in frame_batch])
+
+
+def decode_request(body: bytes) -> Tuple[List[FrameData], Optional[Tuple[str, int, int]]]:
+    """解析 /ocr 请求体，返回 (任务列表, 环形缓冲区描述)；格式错误时抛出 ValueError"""
+    if len(body) < 4:
+        raise ValueError("请求体过短")
+    header_size = struct.unpack('>I', body[:4])[0]
+    header = json.loads(body[4:4 + header_size])
+
+    frame_batch = []
+    offset = 4 + header_size
+    for values in header['frames']:
+        image_size = values.pop('image_size')
+        if offset + image_size > len(body):
+            raise ValueError("图像数据不完整")
+        for name in TUPLE_FIELDS:
+            values[name] = tuple(values[name])
+        frame_batch.append(FrameData(image_bytes=body[offset:offset + image_size], **values))
+        offset += image_size
+
+    ring_spec = tuple(header['ring']) if header.get('ring') else None
+    return frame_batch, ring_spec
+
+
+def summarize_latencies(samples: List[float]) -> dict:
+    """一组耗时（秒）的平均值和分位数（毫秒）"""
+    if not samples:
+        return {'avg_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+    ordered = sorted(samples)
+
+    def percentile(ratio: float) -> float:
+        return ordered[min(len(ordered) - 1, int(ratio * len(ordered)))] * 1000
+
+    return {'avg_ms': sum(ordered) / len(ordered) * 1000, 'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95), 'max_ms': ordered[-1] * 1000}
+
+
+@dataclasses.dataclass
+class PendingRequest:
+    """一个 /ocr 请求：各图像的识别结果按位置填入，全部完成后 done 置位"""
+    results: List[Optional[OCRResult]]
+    remaining: int
+    done: threading.Event = dataclasses.field(default_factory=threading.Event)
+    ocr_seconds: float = 0.0  # 该请求的图像分摊到的推理耗时
+
+
+@dataclasses.dataclass
+class QueuedImage:
+    """等待合批的单张图像"""
+    request: PendingRequest
+    index: int
+    frame_data: FrameData
+    image: Optional[np.ndarray]
+    enqueued: float
+
+
+class ServerMetrics:
+    """队列深度、批大小和延迟统计（延迟分位数按最近 window 个样本计算）"""
+
+    def __init__(self, window: int = OCR_SERVER_METRICS_WINDOW):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.failed_requests = 0
+        self.images = 0
+        self.batches = 0
+        self.batch_sizes: Dict[int, int] = collections.Counter()
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.request_seconds: Deque[float] = collections.deque(maxlen=window)
+        self.queue_wait_seconds: Deque[float] = collections.deque(maxlen=window)
+        self.batch_seconds: Deque[float] = collections.deque(maxlen=window)
+
+    def record_enqueue(self, count: int):
+        with self.lock:
+            self.queue_depth += count
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+    def record_batch(self, batch: List[QueuedImage], started: float, elapsed: float):
+        with self.lock:
+            self.queue_depth -= len(batch)
+            self.batches += 1
+            self.images += len(batch)
+            self.batch_sizes[len(batch)] += 1
+            self.batch_seconds.append(elapsed)
+            self.queue_wait_seconds.extend(started - item.enqueued for item in batch)
+
+    def record_request(self, elapsed: float, failed: bool = False):
+        with self.lock:
+            self.requests += 1
+            self.failed_requests += failed
+            self.request_seconds.append(elapsed)
+
+    def snapshot(self) -> dict:
+        """当前统计（GET /metrics 的内容）"""
+        with self.lock:
+            uptime = time.time() - self.started
+            return {
+                'uptime_seconds': uptime,
+                'requests': self.requests,
+                'failed_requests': self.failed_requests,
+                'images': self.images,
+                'images_per_second': self.images / max(uptime, 1e-9),
+                'batches': self.batches,
+                'avg_batch_size': self.images / self.batches if self.batches else 0.0,
+                'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                'queue_depth': self.queue_depth,
+                'max_queue_depth': self.max_queue_depth,
+                'request_latency': summarize_latencies(list(self.request_seconds)),
+                'queue_wait': summarize_latencies(list(self.queue_wait_seconds)),
+                'batch_inference': summarize_latencies(list(self.batch_seconds)),
+            }
+
+
+class MicroBatcher:
+    """
+    动态微批处理：推理线程独占OCR服务，从队列中取出最早的图像后继续等待，
+    直到凑满 max_batch_size 张或最早的图像已等待 max_wait_ms，再把这些图像（可能来自多个请求）一次推理
+    """
+
+    def __init__(self, service: PaddleOCRService, metrics: ServerMetrics,
+                 max_batch_size: int = OCR_SERVER_MAX_BATCH_SIZE, max_wait_ms: float = OCR_SERVER_MAX_WAIT_MS):
+        self.service = service
+        self.metrics = metrics
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max(0.0, max_wait_ms) / 1000
+        self.queue: Deque[QueuedImage] = collections.deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='ocr-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, frame_batch: List[FrameData], images: List[Optional[np.ndarray]]) -> PendingRequest:
+        """把一个请求的图像加入队列，返回可等待的请求（空请求立即完成）"""
+        request = PendingRequest([None] * len(frame_batch), len(frame_batch))
+        if not frame_batch:
+            request.done.set()
+            return request
+
+        now = time.time()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("OCR服务已关闭")
+            self.queue.extend(QueuedImage(request, index, frame_data, image, now)
+                              for index, (frame_data, image) in enumerate(zip(frame_batch, images)))
+            self.metrics.record_enqueue(len(frame_batch))
+            self.condition.notify()
+        return request
+
+    def _next_batch(self) -> List[QueuedImage]:
+        """等待下一个微批次（服务关闭且队列为空时返回空列表）"""
+        with self.condition:
+            while not self.queue and not self.closed:
+                self.condition.wait()
+            if self.queue:
+                deadline = self.queue[0].enqueued + self.max_wait_seconds
+                while len(self.queue) < self.max_batch_size and not self.closed:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+            count = min(len(self.queue), self.max_batch_size)
+            return [self.queue.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            started = time.time()
+            try:
+                results = self.service.recognize_images([item.frame_data for item in batch],
+                                                        [item.image for item in batch], self.max_batch_size)
+            except Exception as e:
+                print(f"OCR服务推理错误: {e}")
+                results = [None] * len(batch)
+            elapsed = time.time() - started
+            self.metrics.record_batch(batch, started, elapsed)
+
+            for item, result in zip(batch, results):
+                request = item.request
+                request.results[item.index] = result
+                request.ocr_seconds += elapsed / len(batch)
+                request.remaining -= 1
+                if request.remaining == 0:
+                    request.done.set()
+
+    def close(self):
+        """处理完队列中已有的图像后停止推理线程"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+
+class OCRRequestHandler(BaseHTTPRequestHandler):
+    """OCR服务的HTTP接口：POST /ocr，GET /metrics、/health"""
+
+    def do_POST(self):
+        if self.path != '/ocr':
+            self._reply(404, {'error': f"未知接口: {self.path}"})
+            return
+
+        server = self.server.ocr_server
+        start_time = time.time()
+        try:
+            frame_batch, ring_spec = decode_request(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except (ValueError, KeyError, TypeError, struct.error) as e:
+            server.metrics.record_request(time.time() - start_time, failed=True)
+            self._reply(400, {'error': f"请求格式错误: {e}"})
+            return
+
+        try:
+            # 在请求线程中重建图像（拷贝出共享内存），推理线程只做推理
+            images = server.load_images(frame_batch, ring_spec)
+            request = server.batcher.submit(frame_batch, images)
+            request.done.wait()
+        except Exception as e:
+            server.metrics.record_request(time.time() - start_time, failed=True)
+            self._reply(500, {'error': str(e)})
+            return
+
+        server.metrics.record_request(time.time() - start_time)
+        self._reply(200, {
+            'results': [result.to_dict() if result else None for result in request.results],
+            'stats': dict(server.init_stats, pid=os.getpid(), tasks=len(frame_batch), ocr_seconds=request.ocr_seconds,
+                          cache=server.service.get_cache_stats())
+        })
+
+    def do_GET(self):
+        server = self.server.ocr_server
+        if self.path == '/metrics':
+            self._reply(200, dict(server.metrics.snapshot(), cache=server.service.get_cache_stats()))
+        elif self.path == '/health':
+            self._reply(200, {'ok': True, 'pid': os.getpid(), 'ocr_mode': server.service.ocr_mode,
+                              'use_cache': server.service.cache is not None,
+                              'max_batch_size': server.batcher.max_batch_size,
+                              'max_wait_ms': server.batcher.max_wait_seconds * 1000})
+        else:
+            self._reply(404, {'error': f"未知接口: {self.path}"})
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """不逐个打印请求"""
+
+
+class OCRServer:
+    """常驻OCR服务：加载一份模型，经HTTP接收各工具的ROI图像并动态合批推理"""
+
+    def __init__(self, host: str = OCR_SERVER_HOST, port: int = OCR_SERVER_PORT,
+                 max_batch_size: int = OCR_SERVER_MAX_BATCH_SIZE, max_wait_ms: float = OCR_SERVER_MAX_WAIT_MS,
+                 ocr_mode: str = OCR_MODE, use_cache: bool = OCR_CACHE_ENABLED, warmup: bool = OCR_WARMUP):
+        """加载模型（可选预热）并启动推理线程；调用 serve_forever 后开始接收请求"""
+        init_start = time.time()
+        self.service = PaddleOCRService(ocr_mode, use_cache)
+        self.init_stats = {'init_seconds': time.time() - init_start, 'warmup_seconds': 0.0}
+        if warmup:
+            warmup_start = time.time()
+            self.service.warmup()
+            self.init_stats['warmup_seconds'] = time.time() - warmup_start
+
+        self.metrics = ServerMetrics()
+        self.batcher = MicroBatcher(self.service, self.metrics, max_batch_size, max_wait_ms)
+        # 附加到客户端的共享内存环形缓冲区（多个请求线程共用，附加结果按名称缓存）
+        self.server = ThreadingHTTPServer((host, port), OCRRequestHandler)
+        self.server.daemon_threads = True
+        self.server.ocr_server = self
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def load_images(self, frame_batch: List[FrameData],
+                    ring_spec: Optional[Tuple[str, int, int]]) -> List[Optional[np.ndarray]]:
+        """
+        重建一个请求的OCR图像（解码失败的为 None）
+
+        共享内存块由客户端创建和删除；服务不是客户端的子进程，附加时不登记到本进程的资源跟踪，
+        避免服务退出时删除（仍在使用的）共享内存块。图像在 detach 之前全部转换为新数组，
+        共享内存块之后被其它请求的附加淘汰也不影响本请求
+        """
+        ring = SharedFrameRing.attach(ring_spec, track=False) if ring_spec else None
+        try:
+            images = []
+            for frame_data in frame_batch:
+                try:
+                    images.append(self.service.load_ocr_image(frame_data, ring))
+                except Exception as e:
+                    print(f"OCR错误 在帧 {frame_data.frame_number}: {str(e)}")
+                    images.append(None)
+            return images
+        finally:
+            if ring is not None:
+                ring.detach()
+
+    def serve_forever(self):
+        """处理请求直到 shutdown（或 Ctrl+C）"""
+        print(f"OCR服务已启动: {self.url}，模式 {self.service.ocr_mode}，"
+              f"微批次最多 {self.batcher.max_batch_size} 张、最长等待 {self.batcher.max_wait_seconds * 1000:.1f} 毫秒")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.server_close()
+            self.batcher.close()
+            self.print_metrics()
+
+    def shutdown(self):
+        """停止接收请求（serve_forever 随之返回）"""
+        self.server.shutdown()
+
+    def print_metrics(self):
+        """打印服务统计"""
+        metrics = self.metrics.snapshot()
+        latency, wait, inference = metrics['request_latency'], metrics['queue_wait'], metrics['batch_inference']
+        print(f"OCR服务: {metrics['requests']} 个请求（失败 {metrics['failed_requests']}），"
+              f"{metrics['images']} 张图像，{metrics['batches']} 个批次，平均批大小 {metrics['avg_batch_size']:.1f}，"
+              f"最大队列深度 {metrics['max_queue_depth']}")
+        print(f"请求延迟: 平均 {latency['avg_ms']:.1f} / P50 {latency['p50_ms']:.1f} / P95 {latency['p95_ms']:.1f} 毫秒；"
+              f"排队 P95 {wait['p95_ms']:.1f} 毫秒；批次推理平均 {inference['avg_ms']:.1f} 毫秒")
+
+
+class OCRServerClient:
+    """OCR服务的客户端（质检脚本等工具可直接使用）"""
+
+    def __init__(self, url: str = f"http://{OCR_SERVER_HOST}:{OCR_SERVER_PORT}", timeout: float = 300.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _get(self, path: str) -> dict:
+        with urllib.request.urlopen(self.url + path, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def health(self) -> dict:
+        """服务状态和OCR配置"""
+        return self._get('/health')
+
+    def metrics(self) -> dict:
+        """服务统计"""
+        return self._get('/metrics')
+
+    def ocr(self, frame_batch: List[FrameData],
+            ring_spec: Optional[Tuple[str, int, int]] = None) -> Tuple[List[Optional[OCRResult]], dict]:
+        """识别一批任务，返回 (与任务一一对应的结果（失败为 None）, 服务端统计)"""
+        request = urllib.request.Request(self.url + '/ocr', data=encode_request(frame_batch, ring_spec),
+                                         headers={'Content-Type': 'application/octet-stream'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            reply = json.loads(response.read())
+        results = [OCRResult.from_dict(values) if values else None for values in reply['results']]
+        return results, reply['stats']
+
+    def recognize(self, images: List[np.ndarray]) -> List[Optional[OCRResult]]:
+        """识别一组BGR图像（帧号为图像序号）"""
+        frame_batch = [FrameData(frame_number=index, timecode='', image_bytes=np.ascontiguousarray(image).tobytes(),
+                                 pixel_count=0, text_type='', image_shape=image.shape, image_format='raw',
+                                 image_dtype=str(image.dtype))
+                       for index, image in enumerate(images)]
+        return self.ocr(frame_batch)[0]
+
+
+class RemoteOCRPool:
+    """
+    把OCR服务作为流水线的OCR后端（与 OCRWorkerPool 接口相同，作为 ocr_pool 传给 MainCoordinator）
+
+    每个批次由一个线程发送请求；服务在本机时共享内存槽位中的图像由服务直接读取，
+    否则在发送前拷贝到任务中。请求失败时按 retries 重试，仍失败则批次的 future 抛出异常，
+    由流水线标记批次失败（不会把失败当作没有识别结果）。
+    """
+
+    def __init__(self, url: str = f"http://{OCR_SERVER_HOST}:{OCR_SERVER_PORT}",
+                 connections: int = OCR_SERVER_CLIENT_CONNECTIONS, retries: int = OCR_SERVER_CLIENT_RETRIES,
+                 retry_seconds: float = OCR_SERVER_CLIENT_RETRY_SECONDS):
+        """连接服务（连接不上时抛出异常），OCR模式和缓存设置以服务为准"""
+        self.client = OCRServerClient(url)
+        self.retries = max(0, retries)
+        self.retry_seconds = retry_seconds
+        info = self.client.health()
+        self.ocr_mode = info['ocr_mode']
+        self.use_cache = info['use_cache']
+        self.max_workers = connections
+        self.share_memory = urlparse(self.client.url).hostname in ('127.0.0.1', 'localhost', '::1')
+        self.executor = ThreadPoolExecutor(max_workers=connections, thread_name_prefix='ocr-client')
+        self.server_init_stats: Dict[int, dict] = {}
+        self.total_tasks = 0
+        self.total_ocr_seconds = 0.0
+        self.request_seconds: List[float] = []
+        self.server_cache_stats: Optional[dict] = None
+        self.stats_lock = threading.Lock()
+        print(f"使用OCR服务: {self.client.url}（模式 {self.ocr_mode}，微批次最多 {info['max_batch_size']} 张）")
+
+    def submit(self, frame_data_batch: List[FrameData],
+               ring_spec: Optional[Tuple[str, int, int]] = None) -> Future:
+        """提交一个OCR批次，future 的结果为 (OCR结果列表, 批次统计)"""
+        return self.executor.submit(self._process_batch, frame_data_batch, ring_spec)
+
+    def _process_batch(self, frame_data_batch: List[FrameData],
+                       ring_spec: Optional[Tuple[str, int, int]]) -> Tuple[List[OCRResult], dict]:
+        if ring_spec and not self.share_memory:
+            frame_data_batch = self._copy_from_ring(frame_data_batch, ring_spec)
+            ring_spec = None
+
+        start_time = time.time()
+        for attempt in range(self.retries + 1):
+            try:
+                results, stats = self.client.ocr(frame_data_batch, ring_spec)
+                break
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                # 请求本身有误（4xx）时重试也不会成功
+                client_error = isinstance(e, urllib.error.HTTPError) and e.code < 500
+                if attempt == self.retries or client_error:
+                    raise RuntimeError(f"OCR服务请求失败（共 {attempt + 1} 次）: {e}") from e
+                delay = self.retry_seconds * 2 ** attempt
+                print(f"\nOCR服务请求错误: {e}，{delay:.1f} 秒后重试 ({attempt + 1}/{self.retries})")
+                time.sleep(delay)
+        with self.stats_lock:
+            self.request_seconds.append(time.time() - start_time)
+        return [result for result in results if result], stats
+
+    @staticmethod
+    def _copy_from_ring(frame_data_batch: List[FrameData], ring_spec: Tuple[str, int, int]) -> List[FrameData]:
+        """把共享内存槽位中的图像拷贝回任务（服务不在本机时）"""
+        ring = SharedFrameRing.attach(ring_spec)
+        try:
+            return [dataclasses.replace(frame_data, shm_slot=-1, image_bytes=ring.view(
+                        frame_data.shm_slot, frame_data.image_shape, frame_data.image_dtype).tobytes())
+                    if frame_data.shm_slot >= 0 else frame_data
+                    for frame_data in frame_data_batch]
+        finally:
+            ring.detach()
+
+    def record(self, stats: dict):
+        """汇总一个已完成批次的统计"""
+        self.total_tasks += stats['tasks']
+        self.total_ocr_seconds += stats['ocr_seconds']
+        if 'pid' in stats:
+            self.server_init_stats[stats['pid']] = {'init_seconds': stats['init_seconds'],
+                                                    'warmup_seconds': stats['warmup_seconds']}
+        # 服务上报的是累计值，保留最新（最大）的一次
+        cache_stats = stats.get('cache')
+        previous = self.server_cache_stats
+        if cache_stats and (previous is None or cache_stats['lookups'] >= previous['lookups']):
+            self.server_cache_stats = cache_stats
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """服务的缓存命中次数与查询次数（服务启动以来累计，包括其他客户端的请求）"""
+        return {key: self.server_cache_stats[key] if self.server_cache_stats else 0 for key in ('hits', 'lookups')}
+
+    def print_stats(self):
+        """打印客户端统计"""
+        latency = summarize_latencies(self.request_seconds)
+        avg_task_ms = self.total_ocr_seconds / self.total_tasks * 1000 if self.total_tasks else 0.0
+        print(f"OCR服务后端: 共 {self.total_tasks} 个任务，单任务分摊推理 {avg_task_ms:.1f} 毫秒；"
+              f"{len(self.request_seconds)} 个请求，延迟平均 {latency['avg_ms']:.1f} / P95 {latency['p95_ms']:.1f} 毫秒")
+
+    def shutdown(self):
+        """等待未完成的请求（服务继续运行）"""
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='OCR服务：常驻进程加载一份模型，把并发请求的图像合并为微批次推理')
+    parser.add_argument('--host', type=str, default=OCR_SERVER_HOST, help='监听地址')
+    parser.add_argument('--port', type=int, default=OCR_SERVER_PORT, help='监听端口')
+    parser.add_argument('--max_batch_size', type=int, default=OCR_SERVER_MAX_BATCH_SIZE, help='每个微批次的最大图像数')
+    parser.add_argument('--max_wait_ms', type=float, default=OCR_SERVER_MAX_WAIT_MS,
+                        help='微批次凑批的最长等待时间(毫秒)，0 表示不等待')
+    parser.add_argument('--ocr_mode', type=str, choices=['full', 'rec_only'], default=OCR_MODE,
+                        help='OCR模式: full 检测+识别，rec_only 单行字幕跳过文本检测（低置信度或多行时回退）')
+    parser.add_argument('--no_ocr_cache', action='store_true', help='不使用OCR结果缓存（每帧都重新识别）')
+
+    args = parser.parse_args()
+
+    try:
+        OCRServer(args.host, args.port, args.max_batch_size, args.max_wait_ms, args.ocr_mode,
+                  OCR_CACHE_ENABLED and not args.no_ocr_cache).serve_forever()
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,154 @@
+"""
+OCR进程池
+每个子进程只加载一次PaddleOCR模型（进程池初始化函数），所有批次以及多个视频复用同一组进程
+"""
+
+import os
+import time
+import multiprocessing
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, Future
+from video_preprocessor import FrameData
+from paddle_ocr_service import PaddleOCRService, OCRResult
+from shared_frame_ring import SharedFrameRing
+from config import MAX_WORKERS, OCR_WARMUP, OCR_MODE, OCR_CACHE_ENABLED, WORKER_START_METHOD
+
+# 子进程中常驻的OCR服务及其初始化耗时（由 init_ocr_worker 设置）
+_WORKER_OCR_SERVICE: Optional[PaddleOCRService] = None
+_WORKER_INIT_STATS = {'init_seconds': 0.0, 'warmup_seconds': 0.0}
+
+
+def worker_mp_context(start_method: str = WORKER_START_METHOD):
+    """
+    子进程的启动上下文
+
+    进程池在首次提交时才启动子进程，此时主进程中往往已有解码、调度等线程；
+    直接 fork 会把其他线程持有的锁原样复制到子进程中，子进程可能永久阻塞，因此用 forkserver 或 spawn 启动
+    """
+    if start_method not in multiprocessing.get_all_start_methods():
+        start_method = 'spawn'
+    return multiprocessing.get_context(start_method)
+
+
+def init_ocr_worker(warmup: bool = OCR_WARMUP, ocr_mode: str = OCR_MODE, use_cache: bool = OCR_CACHE_ENABLED):
+    """进程池初始化函数：加载OCR模型并（可选）预热一次推理"""
+    global _WORKER_OCR_SERVICE
+
+    init_start = time.time()
+    _WORKER_OCR_SERVICE = PaddleOCRService(ocr_mode, use_cache)
+    _WORKER_INIT_STATS['init_seconds'] = time.time() - init_start
+
+    if warmup:
+        warmup_start = time.time()
+        _WORKER_OCR_SERVICE.warmup()
+        _WORKER_INIT_STATS['warmup_seconds'] = time.time() - warmup_start
+
+
+def process_ocr_batch_parallel(frame_data_batch: List[FrameData],
+                               ring_spec: Optional[Tuple[str, int, int]] = None) -> Tuple[List[OCRResult], dict]:
+    """
+    在子进程中处理单个OCR批次（模块级函数，避免序列化问题）
+
+    返回: (OCR结果列表, 批次统计)，统计包含子进程的初始化耗时和本批次的OCR耗时
+    """
+    # 未经初始化函数启动的进程（如直接调用）在首次使用时加载模型
+    if _WORKER_OCR_SERVICE is None:
+        init_ocr_worker(warmup=False)
+
+    stats = dict(_WORKER_INIT_STATS, pid=os.getpid(), tasks=len(frame_data_batch), ocr_seconds=0.0)
+    try:
+        # 图像在共享内存中时附加到主进程的环形缓冲区
+        ring = SharedFrameRing.attach(ring_spec) if ring_spec else None
+
+        # OCR处理
+        ocr_results = []
+        try:
+            if frame_data_batch:
+                ocr_start = time.time()
+                ocr_results = _WORKER_OCR_SERVICE.process_batch(frame_data_batch, ring)
+                stats['ocr_seconds'] = time.time() - ocr_start
+        finally:
+            if ring is not None:
+                ring.detach()
+
+        # 子进程累计的缓存统计
+        stats['cache'] = _WORKER_OCR_SERVICE.get_cache_stats()
+        return ocr_results, stats
+
+    except Exception as e:
+        print(f"OCR子进程处理错误: {e}")
+        return [], stats
+
+
+class OCRWorkerPool:
+    """常驻OCR进程池：模型每个进程加载一次，可在多个视频之间复用"""
+
+    def __init__(self, max_workers: int = MAX_WORKERS, warmup: bool = OCR_WARMUP, ocr_mode: str = OCR_MODE,
+                 use_cache: bool = OCR_CACHE_ENABLED):
+        """启动进程池（模型在每个子进程首次接到任务前加载）"""
+        self.max_workers = max_workers
+        self.ocr_mode = ocr_mode
+        self.use_cache = use_cache
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=worker_mp_context(),
+                                            initializer=init_ocr_worker, initargs=(warmup, ocr_mode, use_cache))
+        # 按子进程记录的初始化耗时，以及全部批次的任务数和OCR耗时
+        self.worker_init_stats: Dict[int, dict] = {}
+        self.total_tasks = 0
+        self.total_ocr_seconds = 0.0
+        # 按子进程记录的累计缓存统计
+        self.worker_cache_stats: Dict[int, dict] = {}
+
+    def submit(self, frame_data_batch: List[FrameData],
+               ring_spec: Optional[Tuple[str, int, int]] = None) -> Future:
+        """提交一个OCR批次，future 的结果为 (OCR结果列表, 批次统计)"""
+        return self.executor.submit(process_ocr_batch_parallel, frame_data_batch, ring_spec)
+
+    def record(self, stats: dict):
+        """汇总一个已完成批次的统计"""
+        self.worker_init_stats[stats['pid']] = {
+            'init_seconds': stats['init_seconds'],
+            'warmup_seconds': stats['warmup_seconds']
+        }
+        self.total_tasks += stats['tasks']
+        self.total_ocr_seconds += stats['ocr_seconds']
+        # 子进程上报的是累计值，批次按完成顺序到达，保留最新（最大）的一次
+        cache_stats = stats.get('cache')
+        previous = self.worker_cache_stats.get(stats['pid'])
+        if cache_stats and (previous is None or cache_stats['lookups'] >= previous['lookups']):
+            self.worker_cache_stats[stats['pid']] = cache_stats
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """全部子进程的缓存命中次数与查询次数"""
+        return {
+            key: sum(cache_stats[key] for cache_stats in self.worker_cache_stats.values())
+            for key in ('hits', 'lookups')
+        }
+
+    def get_stats(self) -> dict:
+        """进程初始化耗时与单任务OCR耗时（分开统计）"""
+        init_times = [s['init_seconds'] for s in self.worker_init_stats.values()]
+        warmup_times = [s['warmup_seconds'] for s in self.worker_init_stats.values()]
+        return {
+            'workers_started': len(self.worker_init_stats),
+            'avg_init_seconds': sum(init_times) / len(init_times) if init_times else 0.0,
+            'avg_warmup_seconds': sum(warmup_times) / len(warmup_times) if warmup_times else 0.0,
+            'total_tasks': self.total_tasks,
+            'avg_task_ms': self.total_ocr_seconds / self.total_tasks * 1000 if self.total_tasks else 0.0
+        }
+
+    def print_stats(self):
+        """打印进程池统计"""
+        stats = self.get_stats()
+        print(f"OCR进程池: {stats['workers_started']} 个进程，"
+              f"模型加载平均 {stats['avg_init_seconds']:.2f} 秒，预热平均 {stats['avg_warmup_seconds']:.2f} 秒；"
+              f"共 {stats['total_tasks']} 个任务，单任务平均 {stats['avg_task_ms']:.1f} 毫秒")
+
+    def shutdown(self):
+        """关闭进程池"""
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
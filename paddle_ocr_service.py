@@ -6,9 +6,12 @@ PaddleOCR服务
 import cv2
 import numpy as np
 import os
+import time
 from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from video_preprocessor import FrameData
+from shared_frame_ring import SharedFrameRing
+from ocr_cache import OCRCache
 from config import *
 
 # 延迟导入PaddleOCR，避免在没有安装时导入失败
@@ -19,6 +22,13 @@ except ImportError:
     PADDLEOCR_AVAILABLE = False
     print("警告: PaddleOCR未安装，将使用模拟模式")
 
+# 仅识别模式使用的独立识别模型（较早的PaddleOCR版本没有该接口）
+try:
+    from paddleocr import TextRecognition
+    TEXT_RECOGNITION_AVAILABLE = True
+except ImportError:
+    TEXT_RECOGNITION_AVAILABLE = False
+
 @dataclass
 class OCRResult:
     """OCR结果数据结构"""
@@ -32,166 +42,406 @@ class OCRResult:
     roi_png_path: str
     raw_ocr_data: Dict[str, Any]  # 保存原始OCR数据用于调试
 
+    def to_dict(self) -> Dict[str, Any]:
+        """可JSON序列化的字段（raw_ocr_data 是调试信息，不包含）"""
+        return {field.name: getattr(self, field.name) for field in fields(self) if field.name != 'raw_ocr_data'}
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> 'OCRResult':
+        """由 to_dict 的字段（经JSON往返）恢复结果"""
+        values = dict(values)
+        # JSON 中的元组变为列表：矩形框恢复为元组，PaddleOCR 四点坐标保持列表
+        if values['bbox'] and not isinstance(values['bbox'][0], list):
+            values['bbox'] = tuple(values['bbox'])
+        return cls(raw_ocr_data={}, **values)
+
 class PaddleOCRService:
     """PaddleOCR服务类"""
 
-    def __init__(self):
-        """初始化PaddleOCR服务"""
+    def __init__(self, ocr_mode: str = OCR_MODE, use_cache: bool = OCR_CACHE_ENABLED):
+        """初始化PaddleOCR服务（ocr_mode 为 'rec_only' 时额外加载独立的识别模型）"""
+        if ocr_mode not in ('full', 'rec_only'):
+            raise ValueError(f"不支持的OCR模式: {ocr_mode}")
+
         # 初始化PaddleOCR
         if PADDLEOCR_AVAILABLE:
             self.ocr = PaddleOCR(
                 use_textline_orientation=OCR_USE_TEXTLINE_ORIENTATION,
                 use_doc_unwarping=OCR_USE_DOC_UNWARPER,
-                lang=OCR_LANG
+                lang=OCR_LANG,
+                text_recognition_batch_size=OCR_REC_BATCH_SIZE
             )
         else:
             self.ocr = None
             print("⚠️ PaddleOCR不可用，使用模拟模式")
 
+        # 仅识别模式：单行字幕跳过文本检测，直接送识别模型
+        self.recognizer = None
+        if ocr_mode == 'rec_only':
+            if PADDLEOCR_AVAILABLE and TEXT_RECOGNITION_AVAILABLE:
+                rec_options = {'model_name': OCR_REC_MODEL_NAME} if OCR_REC_MODEL_NAME else {}
+                self.recognizer = TextRecognition(**rec_options)
+            else:
+                print("⚠️ 警告: 识别模型不可用，仅识别模式回退到检测+识别")
+        self.ocr_mode = 'rec_only' if self.recognizer else 'full'
+        self.rec_only_frames = 0
+
+        # OCR结果缓存：命名空间包含所有影响识别结果的配置
+        self.cache = None
+        if use_cache:
+            engine = 'paddleocr' if PADDLEOCR_AVAILABLE else 'mock'
+            self.cache = OCRCache(f"{engine}|{self.ocr_mode}|{OCR_LANG}|{OCR_REC_MODEL_NAME}|"
+                                  f"{OCR_REC_MIN_CONFIDENCE}|{OCR_USE_TEXTLINE_ORIENTATION}|{OCR_USE_DOC_UNWARPER}")
+
         # 创建临时目录
         self.tmp_dir = TMP_DIR
         os.makedirs(self.tmp_dir, exist_ok=True)
 
         print("PaddleOCR服务初始化完成")
 
-    def process_single_frame(self, frame_data: FrameData) -> Optional[OCRResult]:
-        """处理单个帧的OCR"""
-        try:
-            # 从字节流重建图像
+    def warmup(self):
+        """用一张空白文本行图像执行一次推理，让推理引擎的首次初始化不计入第一个任务"""
+        blank_line = np.full((48, 320, 3), 255, dtype=np.uint8)
+        if PADDLEOCR_AVAILABLE and self.ocr:
+            self.ocr.predict(blank_line)
+        if self.recognizer:
+            self.recognizer.predict([blank_line])
+
+    @staticmethod
+    def to_roi_bbox(frame_data: FrameData, x1: float, y1: float, x2: float, y2: float) -> Tuple[int, int, int, int]:
+        """把OCR图像中的坐标映射回ROI坐标（撤销行高缩放和文本区域裁剪）"""
+        offset_x, offset_y = frame_data.crop_offset
+        scale = frame_data.crop_scale
+        return (int(x1 / scale) + offset_x, int(y1 / scale) + offset_y,
+                int(x2 / scale) + offset_x, int(y2 / scale) + offset_y)
+
+    @staticmethod
+    def decode_image(frame_data: FrameData, ring: Optional[SharedFrameRing] = None) -> Optional[np.ndarray]:
+        """从共享内存槽位、原始像素或PNG字节流重建BGR图像"""
+        if frame_data.shm_slot >= 0:
+            image = ring.view(frame_data.shm_slot, frame_data.image_shape, frame_data.image_dtype)
+        elif frame_data.image_format == 'raw':
+            image = np.frombuffer(frame_data.image_bytes, dtype=frame_data.image_dtype).reshape(frame_data.image_shape)
+        else:
             image_array = np.frombuffer(frame_data.image_bytes, dtype=np.uint8)
-            roi_image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+            return cv2.imdecode(image_array, cv2.IMREAD_COLOR)
 
-            if roi_image is None:
-                print(f"图像解码失败: 帧{frame_data.frame_number}")
-                return None
+        # 与 IMREAD_COLOR 一致：单通道（二值化）图像扩展为三通道
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        return image
 
-            # 转换为RGB格式（PaddleOCR期望的格式）
-            roi_image = cv2.cvtColor(roi_image, cv2.COLOR_BGR2RGB)
+    def load_ocr_image(self, frame_data: FrameData, ring: Optional[SharedFrameRing] = None) -> Optional[np.ndarray]:
+        """重建OCR图像并转换为RGB格式（PaddleOCR期望的格式）"""
+        roi_image = self.decode_image(frame_data, ring)
 
-            # 调用PaddleOCR（直接用numpy数组）
-            if PADDLEOCR_AVAILABLE and self.ocr:
-                ocr_result = self.ocr.predict(roi_image)
-            else:
-                # 模拟OCR结果
-                ocr_result = [{
-                    'rec_texts': [f"模拟OCR结果_{frame_data.frame_number}"],
-                    'rec_scores': [0.85]
-                }]
-
-            if not ocr_result:
-                print(f"跳过帧 {frame_data.frame_number}: OCR返回空")
-                return None
+        if roi_image is None:
+            print(f"图像解码失败: 帧{frame_data.frame_number}")
+            return None
 
-            # 解析OCR结果
-            text_parts = []
-            confidences = []
-            bboxes = []
-            raw_data = []
-
-            for item in ocr_result:
-                texts = item.get('rec_texts', [])
-                scores = item.get('rec_scores', [])
-
-                # 使用正确的bbox字段名
-                boxes = item.get('rec_polys', [])
-
-            for i, (t, s) in enumerate(zip(texts, scores)):
-                if t:
-                    text_parts.append(t.strip())
-                    confidences.append(float(s))
-
-                    # 提取bbox坐标
-                    if i < len(boxes) and boxes[i] is not None:
-                        box = boxes[i]
-                        # PaddleOCR返回的bbox通常是4个点的坐标 [(x1,y1), (x2,y2), (x3,y3), (x4,y4)]
-                        # 或者numpy数组格式
-                        try:
-                            if isinstance(box, np.ndarray):
-                                if box.shape == (4, 2):  # 4个点的坐标
-                                    points = box
-                                elif box.shape == (8,):  # 展平的8个坐标
-                                    points = box.reshape(4, 2)
-                                else:
-                                    raise ValueError(f"Unexpected box shape: {box.shape}")
-                            elif isinstance(box, list) and len(box) == 4:
-                                # 列表格式 [(x1,y1), (x2,y2), (x3,y3), (x4,y4)]
-                                points = np.array(box)
-                            elif isinstance(box, list) and len(box) == 8:
-                                # 展平的坐标 [x1,y1,x2,y2,x3,y3,x4,y4]
-                                points = np.array(box).reshape(4, 2)
-                            else:
-                                raise ValueError(f"Unexpected box format: {box}")
-
-                            # 计算边界框
-                            x_coords = points[:, 0]
-                            y_coords = points[:, 1]
-                            x1, y1 = int(x_coords.min()), int(y_coords.min())
-                            x2, y2 = int(x_coords.max()), int(y_coords.max())
-                            bbox = (x1, y1, x2, y2)
-                        except Exception as e:
-                            bbox = (0, 0, 0, 0)
-                    else:
-                        bbox = (0, 0, 0, 0)  # 默认bbox
-                        print(f"DEBUG: bbox不存在，使用默认值")
-
-                    bboxes.append(bbox)
-                    raw_data.append({
-                        'text': t.strip(),
-                        'score': float(s),
-                        'bbox': bbox
-                    })
-
-            if not text_parts:
-                print(f"跳过帧 {frame_data.frame_number}: 未识别到文本")
-                return None
+        return cv2.cvtColor(roi_image, cv2.COLOR_BGR2RGB)
 
-            # 合并文本，计算平均bbox（取最大的bbox作为代表）
-            full_text = ''.join(filter(None, text_parts))
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
-
-            # 选择最大的bbox作为代表（适用于多行文本的情况）
-            if bboxes:
-                max_area = 0
-                selected_bbox = bboxes[0]
-                for bbox in bboxes:
-                    area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
-                    if area > max_area:
-                        max_area = area
-                        selected_bbox = bbox
-                representative_bbox = selected_bbox
-            else:
-                representative_bbox = (0, 0, 0, 0)
-
-            # 创建OCR结果
-            result = OCRResult(
-                frame_number=frame_data.frame_number,
-                timecode=frame_data.timecode,
-                text=full_text,
-                pixel_count=frame_data.pixel_count,
-                confidence=avg_confidence,
-                text_type=frame_data.text_type,
-                bbox=representative_bbox,
-                roi_png_path="",  # 字节流传递，无临时文件
-                raw_ocr_data={'items': raw_data, 'avg_confidence': avg_confidence}
-            )
+    def predict_images(self, images: List[np.ndarray], frame_batch: List[FrameData]) -> List[List[Dict[str, Any]]]:
+        """一次调用对多张图像执行检测+识别，按输入顺序返回每张图像的OCR结果"""
+        if PADDLEOCR_AVAILABLE and self.ocr:
+            # 调用PaddleOCR（直接用numpy数组列表，流水线内部按批推理）
+            return [[item] for item in self.ocr.predict(images)]
+
+        # 模拟OCR结果
+        return [[{
+            'rec_texts': [f"模拟OCR结果_{frame_data.frame_number}"],
+            'rec_scores': [0.85]
+        }] for frame_data in frame_batch]
+
+    def use_recognition_only(self, frame_data: FrameData) -> bool:
+        """是否对该帧只运行识别模型（仅识别模式下的单行字幕）"""
+        return self.recognizer is not None and frame_data.text_lines == 1
+
+    @staticmethod
+    def compact_ocr_output(ocr_result: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """只保留解析需要的字段（文本、置信度、文本框），转换为可JSON序列化的结构"""
+        compact = []
+        for item in ocr_result:
+            compact.append({
+                'rec_texts': [str(t) for t in item.get('rec_texts', [])],
+                'rec_scores': [float(score) for score in item.get('rec_scores', [])],
+                'rec_polys': [np.asarray(box).tolist() if box is not None else None
+                              for box in item.get('rec_polys', [])]
+            })
+        return compact
+
+    def recognize_lines(self, frame_batch: List[FrameData], images: List[np.ndarray]) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        仅识别：把颜色掩码裁剪出的单行图像直接送识别模型，文本框取掩码外接矩形
+
+        返回每帧的OCR输出；识别为空或置信度低于 OCR_REC_MIN_CONFIDENCE 的帧返回 None，
+        由调用方回退到检测+识别。
+        """
+        try:
+            outputs = list(self.recognizer.predict(images, batch_size=OCR_REC_BATCH_SIZE))
+        except Exception as e:
+            print(f"仅识别推理失败，回退到检测+识别: {e}")
+            return [None] * len(frame_batch)
+
+        results: List[Optional[List[Dict[str, Any]]]] = []
+        for frame_data, output in zip(frame_batch, outputs):
+            text, score = output['rec_text'], float(output['rec_score'])
+            if not text.strip() or score < OCR_REC_MIN_CONFIDENCE:
+                results.append(None)
+                continue
+
+            x1, y1, x2, y2 = frame_data.text_bbox
+            results.append([{
+                'rec_texts': [text],
+                'rec_scores': [score],
+                'rec_polys': [np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]])]
+            }])
+        return results
+
+    def ocr_images(self, frame_batch: List[FrameData], images: List[Optional[np.ndarray]],
+                   predict_batch_size: int = OCR_PREDICT_BATCH_SIZE) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        对一组OCR图像执行识别，返回每帧的OCR输出（图像为 None 或推理失败时为 None）
+
+        依次为: 缓存命中 → 仅识别（单行字幕） → 按尺寸分桶的检测+识别；新结果写入缓存。
+        """
+        outputs: List[Optional[List[Dict[str, Any]]]] = [None] * len(frame_batch)
+        keys = [self.cache.make_key(image) if self.cache and image is not None else None for image in images]
+        for i, key in enumerate(keys):
+            if key:
+                outputs[i] = self.cache.get(key)
+        cached = [output is not None for output in outputs]
+
+        # 仅识别模式：单行字幕先整批送识别模型，未通过的帧继续走检测+识别
+        rec_indices = [i for i, image in enumerate(images)
+                       if image is not None and outputs[i] is None and self.use_recognition_only(frame_batch[i])]
+        if rec_indices:
+            rec_outputs = self.recognize_lines([frame_batch[i] for i in rec_indices], [images[i] for i in rec_indices])
+            for i, output in zip(rec_indices, rec_outputs):
+                outputs[i] = output
+            self.rec_only_frames += sum(1 for output in rec_outputs if output)
 
-            print(f"OCR成功 帧:{frame_data.frame_number} 类型:{frame_data.text_type} "
-                  f"像素:{frame_data.pixel_count} 置信度:{avg_confidence:.2f} 文本:{full_text}")
+        full_images = [image if outputs[i] is None else None for i, image in enumerate(images)]
+        for bucket in self.bucket_by_size(full_images, predict_batch_size):
+            try:
+                bucket_outputs = self.predict_images([images[i] for i in bucket], [frame_batch[i] for i in bucket])
+            except Exception as e:
+                print(f"批量OCR失败，逐帧处理 {len(bucket)} 帧: {e}")
+                bucket_outputs = []
+                for i in bucket:
+                    try:
+                        bucket_outputs.extend(self.predict_images([images[i]], [frame_batch[i]]))
+                    except Exception as frame_error:
+                        print(f"OCR错误 在帧 {frame_batch[i].frame_number}: {str(frame_error)}")
+                        bucket_outputs.append(None)
 
-            return result
+            for i, output in zip(bucket, bucket_outputs):
+                outputs[i] = output
+
+        for i, output in enumerate(outputs):
+            if output is not None and not cached[i]:
+                outputs[i] = self.compact_ocr_output(output)
+                if keys[i]:
+                    self.cache.put(keys[i], outputs[i])
+
+        return outputs
+
+    def get_cache_stats(self) -> Optional[dict]:
+        """OCR缓存命中统计（未启用缓存时为 None）"""
+        return self.cache.get_stats() if self.cache else None
+
+    def process_single_frame(self, frame_data: FrameData, ring: Optional[SharedFrameRing] = None) -> Optional[OCRResult]:
+        """处理单个帧的OCR（图像在共享内存中时需要传入已附加的环形缓冲区）"""
+        try:
+            roi_image = self.load_ocr_image(frame_data, ring)
+            if roi_image is None:
+                return None
+
+            ocr_result = self.ocr_images([frame_data], [roi_image], predict_batch_size=1)[0]
+            if ocr_result is None:
+                return None
+            return self.parse_ocr_result(frame_data, ocr_result)
 
         except Exception as e:
             print(f"OCR错误 在帧 {frame_data.frame_number}: {str(e)}")
             return None
 
-    def process_batch(self, frame_batch: List[FrameData]) -> List[OCRResult]:
-        """批量处理OCR"""
-        results = []
+    def parse_ocr_result(self, frame_data: FrameData, ocr_result: List[Dict[str, Any]]) -> Optional[OCRResult]:
+        """解析单张图像的OCR输出，生成OCR结果（bbox映射回ROI坐标）"""
+        if not ocr_result:
+            print(f"跳过帧 {frame_data.frame_number}: OCR返回空")
+            return None
+
+        # 解析OCR结果
+        text_parts = []
+        confidences = []
+        bboxes = []
+        raw_data = []
+
+        for item in ocr_result:
+            texts = item.get('rec_texts', [])
+            scores = item.get('rec_scores', [])
+
+            # 使用正确的bbox字段名
+            boxes = item.get('rec_polys', [])
+
+        for i, (t, s) in enumerate(zip(texts, scores)):
+            if t:
+                text_parts.append(t.strip())
+                confidences.append(float(s))
+
+                # 提取bbox坐标
+                if i < len(boxes) and boxes[i] is not None:
+                    box = boxes[i]
+                    # PaddleOCR返回的bbox通常是4个点的坐标 [(x1,y1), (x2,y2), (x3,y3), (x4,y4)]
+                    # 或者numpy数组格式
+                    try:
+                        if isinstance(box, np.ndarray):
+                            if box.shape == (4, 2):  # 4个点的坐标
+                                points = box
+                            elif box.shape == (8,):  # 展平的8个坐标
+                                points = box.reshape(4, 2)
+                            else:
+                                raise ValueError(f"Unexpected box shape: {box.shape}")
+                        elif isinstance(box, list) and len(box) == 4:
+                            # 列表格式 [(x1,y1), (x2,y2), (x3,y3), (x4,y4)]
+                            points = np.array(box)
+                        elif isinstance(box, list) and len(box) == 8:
+                            # 展平的坐标 [x1,y1,x2,y2,x3,y3,x4,y4]
+                            points = np.array(box).reshape(4, 2)
+                        else:
+                            raise ValueError(f"Unexpected box format: {box}")
+
+                        # 计算边界框
+                        x_coords = points[:, 0]
+                        y_coords = points[:, 1]
+                        bbox = self.to_roi_bbox(frame_data, x_coords.min(), y_coords.min(),
+                                                x_coords.max(), y_coords.max())
+                    except Exception as e:
+                        bbox = (0, 0, 0, 0)
+                else:
+                    bbox = (0, 0, 0, 0)  # 默认bbox
+                    print(f"DEBUG: bbox不存在，使用默认值")
+
+                bboxes.append(bbox)
+                raw_data.append({
+                    'text': t.strip(),
+                    'score': float(s),
+                    'bbox': bbox
+                })
 
+        if not text_parts:
+            print(f"跳过帧 {frame_data.frame_number}: 未识别到文本")
+            return None
+
+        # 合并文本，计算平均bbox（取最大的bbox作为代表）
+        full_text = ''.join(filter(None, text_parts))
+        avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+
+        # 选择最大的bbox作为代表（适用于多行文本的情况）
+        if bboxes:
+            max_area = 0
+            selected_bbox = bboxes[0]
+            for bbox in bboxes:
+                area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+                if area > max_area:
+                    max_area = area
+                    selected_bbox = bbox
+            representative_bbox = selected_bbox
+        else:
+            representative_bbox = (0, 0, 0, 0)
+
+        # 创建OCR结果
+        result = OCRResult(
+            frame_number=frame_data.frame_number,
+            timecode=frame_data.timecode,
+            text=full_text,
+            pixel_count=frame_data.pixel_count,
+            confidence=avg_confidence,
+            text_type=frame_data.text_type,
+            bbox=representative_bbox,
+            roi_png_path="",  # 字节流传递，无临时文件
+            raw_ocr_data={'items': raw_data, 'avg_confidence': avg_confidence}
+        )
+
+        print(f"OCR成功 帧:{frame_data.frame_number} 类型:{frame_data.text_type} "
+              f"像素:{frame_data.pixel_count} 置信度:{avg_confidence:.2f} 文本:{full_text}")
+
+        return result
+
+    def process_batch(self, frame_batch: List[FrameData], ring: Optional[SharedFrameRing] = None,
+                      predict_batch_size: int = OCR_PREDICT_BATCH_SIZE) -> List[OCRResult]:
+        """
+        批量处理OCR：按图像尺寸分桶，每桶一次 predict 调用
+
+        尺寸相近的图像放在同一次调用中，减少批内填充；结果按 FrameData 顺序返回。
+        某一桶推理失败时，该桶退回逐帧处理。缓存命中的帧不再推理，
+        按当前帧的帧号、时间码和裁剪位置解析缓存的OCR输出。
+        """
+        images: List[Optional[np.ndarray]] = []
         for frame_data in frame_batch:
-            result = self.process_single_frame(frame_data)
-            if result:
-                results.append(result)
+            try:
+                images.append(self.load_ocr_image(frame_data, ring))
+            except Exception as e:
+                print(f"OCR错误 在帧 {frame_data.frame_number}: {str(e)}")
+                images.append(None)
 
-        print(f"批处理完成: 处理 {len(frame_batch)} 帧，成功识别 {len(results)} 帧")
+        rec_only_before = self.rec_only_frames
+        batch_results = self.recognize_images(frame_batch, images, predict_batch_size)
+        rec_only_count = self.rec_only_frames - rec_only_before
+
+        results = [result for result in batch_results if result]
+        rec_only_info = f"（仅识别 {rec_only_count} 帧）" if self.recognizer else ""
+        print(f"批处理完成: 处理 {len(frame_batch)} 帧，成功识别 {len(results)} 帧{rec_only_info}")
         return results
+
+    def recognize_images(self, frame_batch: List[FrameData], images: List[Optional[np.ndarray]],
+                         predict_batch_size: int = OCR_PREDICT_BATCH_SIZE) -> List[Optional[OCRResult]]:
+        """对已重建的OCR图像识别并解析，结果与 frame_batch 一一对应（识别失败的位置为 None）"""
+        ocr_outputs = self.ocr_images(frame_batch, images, predict_batch_size)
+
+        batch_results: List[Optional[OCRResult]] = []
+        for frame_data, ocr_result in zip(frame_batch, ocr_outputs):
+            try:
+                batch_results.append(self.parse_ocr_result(frame_data, ocr_result) if ocr_result is not None else None)
+            except Exception as e:
+                print(f"OCR错误 在帧 {frame_data.frame_number}: {str(e)}")
+                batch_results.append(None)
+        return batch_results
+
+    @staticmethod
+    def bucket_by_size(images: List[Optional[np.ndarray]], bucket_size: int) -> List[List[int]]:
+        """按图像 (高, 宽) 排序后每 bucket_size 张分为一桶，返回每桶的图像下标（跳过解码失败的图像）"""
+        valid = [i for i, image in enumerate(images) if image is not None]
+        valid.sort(key=lambda i: images[i].shape[:2])
+        bucket_size = max(1, bucket_size)
+        return [valid[start:start + bucket_size] for start in range(0, len(valid), bucket_size)]
+
+    def benchmark_batch_sizes(self, frame_batch: List[FrameData],
+                              batch_sizes: Tuple[int, ...] = (1, 2, 4, 8, 16, 32),
+                              repeats: int = 2) -> Dict[int, float]:
+        """
+        在本机上测量不同 predict 批大小的吞吐量（图像/秒），用于选择 OCR_PREDICT_BATCH_SIZE
+
+        每个批大小先预热一次，再取 repeats 次中最快的一次。
+        """
+        images = [image for image in (self.load_ocr_image(frame_data) for frame_data in frame_batch)
+                  if image is not None]
+        if not images:
+            return {}
+
+        throughput = {}
+        for batch_size in batch_sizes:
+            buckets = self.bucket_by_size(images, batch_size)
+            best_seconds = None
+            for repeat in range(repeats + 1):
+                start = time.time()
+                for bucket in buckets:
+                    self.predict_images([images[i] for i in bucket], [frame_batch[0]] * len(bucket))
+                elapsed = time.time() - start
+                if repeat > 0 and (best_seconds is None or elapsed < best_seconds):
+                    best_seconds = elapsed
+            throughput[batch_size] = len(images) / max(best_seconds, 1e-9)
+            print(f"批大小 {batch_size:>3}: {throughput[batch_size]:.1f} 图像/秒")
+
+        return throughput
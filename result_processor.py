@@ -6,9 +6,15 @@
 from ast import If
 import csv
 import os
-from typing import List, Dict, Any, Tuple
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional
+import numpy as np
 from paddle_ocr_service import OCRResult
-from config import OUTPUT_CSV_HEADERS
+from result_store import ColumnarResults
+from text_normalizer import get_text_normalizer
+from config import (OUTPUT_CSV_HEADERS, CAPTION_MIN_CONFIDENCE, CAPTION_MIN_FRAMES, CAPTION_MAX_FRAME_GAP,
+                    CAPTION_IOU_THRESHOLD, CAPTION_MERGE_WINDOW, CAPTION_TRACK_PER_TYPE)
 
 class ResultProcessor:
     """信息处理服务"""
@@ -17,91 +23,35 @@ class ResultProcessor:
         """初始化结果处理器"""
         self.video_path = video_path
         self.video_name = os.path.splitext(os.path.basename(video_path))[0]
+        self.text_normalizer = get_text_normalizer('refactored')
 
         print("结果处理器初始化完成")
 
     def process_text(self, text: str, text_type: str) -> str:
-        """规范化处理识别结果"""
-        if not text:
-            return ""
-
-        if text_type == "VFX":
-            # 替换各种变体
-            text = text.replace('VEX:', 'VFX:')
-            text = text.replace('VFX;', 'VFX:')
-            text = text.replace('VEX;', 'VFX:')
-            text = text.replace('VFX.', 'VFX:')  # 处理点号
-            text = text.replace('VEX.', 'VFX:')
-            text = text.replace('FX:', 'VFX:')
-            text = text.replace('VVFX:', 'VFX:')
-
-            # 如果不以"VFX:"开头，但以"VFX"开头，添加冒号
-            if not text.startswith('VFX:') and text.startswith('VFX'):
-                text = 'VFX:' + text[3:]
-            elif not text.startswith('VFX:'):
-                if text[:4].lower().replace(' ', '') in ['vfx', 'vex', 'vpx', 'vix']:
-                    colon_pos = text.find(':')
-                    semicolon_pos = text.find(';')
-                    if colon_pos != -1:
-                        text = 'VFX:' + text[colon_pos + 1:]
-                    elif semicolon_pos != -1:
-                        text = 'VFX:' + text[semicolon_pos + 1:]
-                    else:
-                        text = 'VFX:' + text[4:]
-                else:
-                    text = 'VFX:' + text
-        else:  # DI
-            text = text.replace('D1:', 'DI:')
-            text = text.replace('D1;', 'DI:')
-            text = text.replace('Di', 'DI:')
-            text = text.replace('Di;', 'DI:')
-            text = text.replace('Di:', 'DI:')
-            text = text.replace('Dl:', 'DI:')
-            text = text.replace('D|:', 'DI:')
-            text = text.replace('DL:', 'DI:')
-            text = text.replace('01:', 'DI:')
-            text = text.replace('DI;', 'DI:')
-            text = text.replace('D1;', 'DI:')
-            text = text.replace('Dl;', 'DI:')
-            text = text.replace('D|;', 'DI:')
-            text = text.replace('DL;', 'DI:')
-            text = text.replace('01;', 'DI:')
-            if not text.startswith('DI:') and text.startswith('DI'):
-                text = 'DI:' + text[3:]
-            elif not text.startswith('DI:'):
-                if text[:3].lower().replace(' ', '') in ['di', 'd1', 'dl', 'ol', 'oi', '01']:
-                    colon_pos = text.find(':')
-                    semicolon_pos = text.find(';')
-                    if colon_pos != -1:
-                        text = 'DI:' + text[colon_pos + 1:]
-                    elif semicolon_pos != -1:
-                        text = 'DI:' + text[semicolon_pos + 1:]
-                    else:
-                        text = 'DI:' + text[3:]
-                else:
-                    text = 'DI:' + text
-
-        return text
+        """规范化处理识别结果（规则见 config.TEXT_NORMALIZATION_RULES，相同文本只处理一次）"""
+        return self.text_normalizer.normalize(text, text_type)
 
     def filter_results(self, ocr_results: List[OCRResult], min_confidence: float = 0.0) -> List[OCRResult]:
         """过滤OCR结果"""
-        filtered_results = []
+        filtered_results = [result for result in ocr_results if self.accept_result(result, min_confidence)]
 
-        for result in ocr_results:
-            # 置信度过滤
-            if result.confidence < min_confidence:
-                continue
+        print(f"结果过滤完成: 原始 {len(ocr_results)} 个结果，过滤后 {len(filtered_results)} 个结果")
+        return filtered_results
 
-            # 文本规范化
-            processed_text = self.process_text(result.text, result.text_type)
+    def accept_result(self, result: OCRResult, min_confidence: float = 0.0) -> bool:
+        """单个结果的过滤：置信度达标且规范化后文本非空时保留（规范化文本写回结果）"""
+        # 置信度过滤
+        if result.confidence < min_confidence:
+            return False
 
-            # 只保留有意义的文本
-            if processed_text.strip():
-                result.text = processed_text
-                filtered_results.append(result)
+        # 文本规范化
+        processed_text = self.process_text(result.text, result.text_type)
 
-        print(f"结果过滤完成: 原始 {len(ocr_results)} 个结果，过滤后 {len(filtered_results)} 个结果")
-        return filtered_results
+        # 只保留有意义的文本
+        if not processed_text.strip():
+            return False
+        result.text = processed_text
+        return True
 
     def deduplicate_results(self, ocr_results: List[OCRResult], time_threshold: float = 1.0) -> List[OCRResult]:
         """去重处理：合并时间相近的相似结果"""
@@ -138,7 +88,8 @@ class ResultProcessor:
         print(f"去重完成: 原始 {len(ocr_results)} 个结果，去重后 {len(deduplicated)} 个结果")
         return deduplicated
 
-    def deduplicate_by_continuous_frames_iou(self, ocr_results: List[OCRResult], max_frame_gap: int = 3, iou_threshold: float = 0.8) -> List[OCRResult]:
+    def deduplicate_by_continuous_frames_iou(self, ocr_results: List[OCRResult], max_frame_gap: int = 3, iou_threshold: float = 0.8,
+                                             min_group_size: int = CAPTION_MIN_FRAMES) -> List[OCRResult]:
         """基于连续帧和IoU的去重处理"""
         if not ocr_results:
             return ocr_results
@@ -208,7 +159,7 @@ class ResultProcessor:
             # print(f"DEBUG: 组内文本: {group_texts}")
             # print(f"DEBUG: 文本类型: {continuous_group[0].text_type}")
 
-            if len(continuous_group) >= 10:  # 只有长度>=10的组才认为是真正的字幕
+            if len(continuous_group) >= min_group_size:  # 只有足够长的组才认为是真正的字幕
                 # 从连续组中选择最佳结果，但保持第一帧的时间
                 best_result = self._select_best_from_continuous_group(continuous_group)
                 # 保持第一帧的帧号和时间码
@@ -218,7 +169,7 @@ class ResultProcessor:
                 print(f"连续帧组去重: {len(continuous_group)} 帧 -> 1 帧 (帧 {continuous_group[0].frame_number})")
                 # print(f"DEBUG: 保留结果: '{best_result.text}' (置信度: {best_result.confidence:.3f})")
             elif len(continuous_group) > 1:
-                print(f"跳过短连续组: {len(continuous_group)} 帧 (帧 {continuous_group[0].frame_number}) - 长度不足10帧")
+                print(f"跳过短连续组: {len(continuous_group)} 帧 (帧 {continuous_group[0].frame_number}) - 长度不足{min_group_size}帧")
                 # print(f"DEBUG: 跳过文本: {group_texts}")
             else:
                 # 单个结果直接删除
@@ -230,6 +181,79 @@ class ResultProcessor:
         print(f"连续帧IoU去重完成: 原始 {len(ocr_results)} 个结果，去重后 {len(deduplicated)} 个结果")
         return deduplicated
 
+    def deduplicate_columnar(self, store: ColumnarResults, max_frame_gap: int = 3, iou_threshold: float = 0.8,
+                             min_group_size: int = CAPTION_MIN_FRAMES) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        列式存储上的连续帧IoU去重（规则与 deduplicate_by_continuous_frames_iou 相同）
+
+        相邻结果帧间距超过 max_frame_gap 或类型不同处必然断开；文本与前一结果相似处必然相连；
+        其余位置与组首结果的文本框IoU达到阈值才相连，按帧顺序一次遍历求出。
+        返回: (每组保留结果的行号, 对应组首的行号)，按帧号顺序
+        """
+        count = len(store)
+        empty = np.zeros(0, dtype=np.int64)
+        if count == 0:
+            return empty, empty
+
+        columns = store.columns()
+        order = np.argsort(columns['frame_number'], kind='stable')
+        frames = columns['frame_number'][order].astype(np.int64)
+        type_ids = columns['type_id'][order]
+        text_ids = columns['text_id'][order].astype(np.int64)
+        bboxes = columns['bbox'][order]
+
+        # 相邻结果之间的关系（位置 k 表示第 k-1 与第 k 个结果）
+        linkable = np.zeros(count, dtype=bool)
+        linkable[1:] = (np.diff(frames) <= max_frame_gap) & (type_ids[1:] == type_ids[:-1])
+        similar = np.zeros(count, dtype=bool)
+        similar[1:] = self._similar_text_pairs(store, text_ids[:-1], text_ids[1:])
+
+        # 不相似的位置按帧顺序一次遍历，与所在组的组首比较IoU，不达阈值处成为新组首。
+        # 组首是之前最近的必然断点或新组首，因此每个位置只比较一次（线性）
+        is_start = ~linkable
+        pending = np.flatnonzero(linkable & ~similar)
+        if pending.size:
+            hard_starts = np.flatnonzero(is_start)
+            pending_hard_starts = hard_starts[np.searchsorted(hard_starts, pending, side='right') - 1]
+            bbox_rows = bboxes.tolist()
+            last_new_start = -1
+            for position, hard_start in zip(pending.tolist(), pending_hard_starts.tolist()):
+                group_start = max(hard_start, last_new_start)
+                if self._calculate_iou(bbox_rows[group_start], bbox_rows[position]) < iou_threshold:
+                    is_start[position] = True
+                    last_new_start = position
+
+        starts = np.flatnonzero(is_start)
+        sizes = np.diff(np.append(starts, count))
+        group_of = np.repeat(np.arange(starts.size), sizes)
+
+        # 每组最佳结果：置信度与组内最高相差不到0.01的结果中，去除首尾空白后文本最长的第一个
+        confidences = columns['confidence'][order]
+        max_confidence = np.maximum.reduceat(confidences, starts)
+        candidate = np.abs(confidences - max_confidence[group_of]) < 0.01
+        text_lengths = np.array([len(text.strip()) for text in store.texts.strings], dtype=np.int64)[text_ids]
+        candidate_lengths = np.where(candidate, text_lengths, -1)
+        max_length = np.maximum.reduceat(candidate_lengths, starts)
+        winner = candidate & (text_lengths == max_length[group_of])
+        best = np.minimum.reduceat(np.where(winner, np.arange(count), count), starts)
+
+        kept = sizes >= min_group_size
+        print(f"连续帧IoU去重完成: 原始 {count} 个结果，{starts.size} 个连续组，"
+              f"保留 {int(kept.sum())} 个（不足{min_group_size}帧的组已删除）")
+        return order[best[kept]], order[starts[kept]]
+
+    def _similar_text_pairs(self, store: ColumnarResults, text_ids1: np.ndarray, text_ids2: np.ndarray,
+                            threshold: float = 0.8) -> np.ndarray:
+        """逐对判断文本相似度是否达到阈值（每种文本对只计算一次）"""
+        text_count = max(len(store.texts), 1)
+        pair_keys, inverse = np.unique(text_ids1 * text_count + text_ids2, return_inverse=True)
+        texts = store.texts.strings
+        pair_similar = np.array([
+            self._text_similarity(texts[key // text_count], texts[key % text_count]) >= threshold
+            for key in pair_keys.tolist()
+        ], dtype=bool)
+        return pair_similar[inverse].reshape(-1)
+
     def _select_best_from_continuous_group(self, group: List[OCRResult]) -> OCRResult:
         """从连续帧组中选择最佳结果（基于置信度和文本清晰度）"""
         if len(group) == 1:
@@ -260,51 +284,50 @@ class ResultProcessor:
 
         return best_result
 
-    def merge_similar_texts(self, ocr_results: List[OCRResult]) -> List[OCRResult]:
-        """合并相似的文本结果"""
+    def merge_similar_texts(self, ocr_results: List[OCRResult], max_frame_diff: int = CAPTION_MERGE_WINDOW) -> List[OCRResult]:
+        """
+        合并相似的文本结果
+
+        每个未被合并的结果依次作为锚点，收集其后（输入顺序）同类型、帧号相差不超过 max_frame_diff
+        且文本相似的结果。按类型分区、按帧号排序建立索引，锚点只与时间窗口内的邻居比较，
+        邻居按输入顺序处理，因此分组和最佳结果与逐对比较完全相同。
+        """
         if not ocr_results:
             return ocr_results
 
+        # 按类型分区、按帧号排序的结果序号，以及对应的帧号（用于二分查找时间窗口）
+        type_indices: Dict[str, List[int]] = {}
+        for index, result in enumerate(ocr_results):
+            type_indices.setdefault(result.text_type, []).append(index)
+        type_frames: Dict[str, List[int]] = {}
+        for text_type, indices in type_indices.items():
+            indices.sort(key=lambda index: ocr_results[index].frame_number)
+            type_frames[text_type] = [ocr_results[index].frame_number for index in indices]
+
         merged = []
-        used_indices = set()
+        used = [False] * len(ocr_results)
 
         for i, result in enumerate(ocr_results):
-            if i in used_indices:
+            if used[i]:
                 continue
 
-            similar_group = [result]
-            # print(f"DEBUG: 处理结果 {i}: '{result.text}' (帧 {result.frame_number}, 类型 {result.text_type})")
+            # 时间窗口内、输入顺序在锚点之后且尚未合并的同类型结果（1秒内）
+            indices = type_indices[result.text_type]
+            frames = type_frames[result.text_type]
+            window_start = bisect_left(frames, result.frame_number - max_frame_diff)
+            window_end = bisect_right(frames, result.frame_number + max_frame_diff)
+            neighbors = sorted(j for j in indices[window_start:window_end] if j > i and not used[j])
 
             # 查找相似的文本
-            for j in range(i + 1, len(ocr_results)):
-                if j in used_indices:
-                    continue
-
+            similar_group = [result]
+            for j in neighbors:
                 other = ocr_results[j]
-                similarity = self._text_similarity(result.text, other.text)
-                time_diff = abs(result.frame_number - other.frame_number)
-
-                # DEBUG: 显示相似性检查详情
-                # print(f"DEBUG: 比较结果 {i} vs {j}: 相似度 {similarity:.3f}, 时间差 {time_diff}帧")
-                # print(f"DEBUG: 文本比较: '{result.text}' vs '{other.text}'")
-
-                # 相似性判断：相同类型、文本相似度高、时间相近
-                if (result.text_type == other.text_type and
-                    similarity > 0.8 and
-                    time_diff <= 25):  # 1秒内
-
+                if self._text_similarity(result.text, other.text) > 0.8:
                     similar_group.append(other)
-                    used_indices.add(j)
-                    # print(f"DEBUG: 找到相似文本，将结果 {j} 加入组")
+                    used[j] = True
 
             # 从相似组中选择最好的
-            best_result = self._select_best_from_group(similar_group)
-            merged.append(best_result)
-
-            if len(similar_group) > 1:
-                # print(f"DEBUG: 相似组合并: {len(similar_group)} 个结果 -> 1 个")
-                # print(f"DEBUG: 合并后保留: '{best_result.text}' (帧 {best_result.frame_number})")
-                pass
+            merged.append(self._select_best_from_group(similar_group))
 
         print(f"文本合并完成: 原始 {len(ocr_results)} 个结果，合并后 {len(merged)} 个结果")
         return merged
@@ -373,17 +396,32 @@ class ResultProcessor:
 
         return len(intersection) / len(union)
 
-    def process_results(self, ocr_results: List[OCRResult]) -> List[OCRResult]:
-        """完整的后处理流程"""
+    def process_results(self, ocr_results: List[OCRResult], continuous_dedup: bool = True) -> List[OCRResult]:
+        """完整的后处理流程（continuous_dedup=False 用于入点模式：每条字幕只有入点帧一个结果）"""
         print(f"开始后处理 {len(ocr_results)} 个OCR结果")
 
         # 1. 过滤低质量结果
-        filtered = self.filter_results(ocr_results, min_confidence=0.1)
+        filtered = self.filter_results(ocr_results, min_confidence=CAPTION_MIN_CONFIDENCE)
         print(f"过滤后: {len(filtered)} 个结果")
 
-        # 2. 基于连续帧和IoU的去重 (支持最大12帧断裂)
-        continuous_deduplicated = self.deduplicate_by_continuous_frames_iou(filtered, max_frame_gap=12, iou_threshold=0.8)
-        print(f"连续帧去重后: {len(continuous_deduplicated)} 个结果")
+        # 2. 基于连续帧和IoU的去重 (允许 CAPTION_MAX_FRAME_GAP 帧断裂)，在列式存储上向量化计算
+        if continuous_dedup:
+            store = ColumnarResults.from_results(filtered)
+            best_rows, start_rows = self.deduplicate_columnar(
+                store, max_frame_gap=CAPTION_MAX_FRAME_GAP, iou_threshold=CAPTION_IOU_THRESHOLD,
+                min_group_size=CAPTION_MIN_FRAMES
+            )
+            # 输出时回到原结果对象：保留组内最佳结果，帧号和时间码取组首
+            continuous_deduplicated = []
+            for best_row, start_row in zip(best_rows.tolist(), start_rows.tolist()):
+                best_result = filtered[store.sources[best_row]]
+                start_result = filtered[store.sources[start_row]]
+                best_result.frame_number = start_result.frame_number
+                best_result.timecode = start_result.timecode
+                continuous_deduplicated.append(best_result)
+            print(f"连续帧去重后: {len(continuous_deduplicated)} 个结果")
+        else:
+            continuous_deduplicated = sorted(filtered, key=lambda x: x.frame_number)
 
         # 3. 合并相似的文本（即使不连续）
         final_results = self.merge_similar_texts(continuous_deduplicated)
@@ -393,26 +431,57 @@ class ResultProcessor:
 
     def save_to_csv(self, results: List[OCRResult], output_file: str = None) -> str:
         """保存结果为CSV文件"""
-        if not output_file:
-            output_file = f"{self.video_name}_detected_frames_paddle_refactored.csv"
+        output_file = output_file or self.default_output_file()
 
         with open(output_file, 'w', encoding='utf-8-sig', newline='') as f:
             writer = csv.writer(f)
             writer.writerow(OUTPUT_CSV_HEADERS)
 
             for result in results:
-                writer.writerow([
-                    result.frame_number,
-                    result.timecode,
-                    result.text,
-                    result.pixel_count,
-                    f"{result.confidence:.3f}",
-                    result.text_type
-                ])
+                writer.writerow(self._csv_row(result))
 
         print(f"结果已保存到: {output_file}")
         return output_file
 
+    def stream_to_csv(self, results: Iterable[OCRResult], output_file: str = None) -> Tuple[str, int]:
+        """
+        边产出边保存结果：每个结果到达即追加一行并刷新到文件，处理中途即可查看，中断时已写入的行不丢失
+
+        results 通常是 CaptionTracker 产出的字幕，文件内容与对同样结果调用 save_to_csv 完全相同。
+        返回: (结果文件, 写入的结果数)
+        """
+        output_file = output_file or self.default_output_file()
+        count = 0
+
+        with open(output_file, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(OUTPUT_CSV_HEADERS)
+            f.flush()
+
+            for result in results:
+                writer.writerow(self._csv_row(result))
+                f.flush()  # 字幕行很稀疏，逐行刷新的开销可以忽略
+                count += 1
+
+        print(f"结果已保存到: {output_file}")
+        return output_file, count
+
+    def default_output_file(self) -> str:
+        """默认的结果文件名"""
+        return f"{self.video_name}_detected_frames_paddle_refactored.csv"
+
+    @staticmethod
+    def _csv_row(result: OCRResult) -> list:
+        """结果对应的CSV行"""
+        return [
+            result.frame_number,
+            result.timecode,
+            result.text,
+            result.pixel_count,
+            f"{result.confidence:.3f}",
+            result.text_type
+        ]
+
     def get_statistics(self, results: List[OCRResult]) -> Dict[str, Any]:
         """获取处理统计信息"""
         if not results:
@@ -433,3 +502,235 @@ class ResultProcessor:
         }
 
         return stats
+
+
+@dataclass
+class CaptionEvent:
+    """在线跟踪器产出的一条已结束字幕"""
+    text_type: str
+    in_frame: int
+    in_timecode: str
+    out_frame: int  # 字幕最后一个OCR结果的帧
+    out_timecode: str
+    text: str
+    confidence: float
+    result: OCRResult  # 代表结果（与批量后处理输出的结果相同）
+    result_count: int  # 组成该字幕的OCR结果数
+
+
+class _OpenTrack:
+    """
+    未结束的字幕：只保留判定和选择最佳结果需要的结果，内存与字幕长度无关
+
+    保持判定只用首个和最后一个结果；_select_best_from_continuous_group 只在置信度与最高相差
+    不到0.01的结果中选择，最高置信度只升不降，因此其余结果可以随时丢弃，选择结果不变。
+    """
+
+    def __init__(self, result: OCRResult):
+        self.first = result
+        self.last = result
+        self.count = 1
+        self.max_confidence = result.confidence
+        self.candidates = [result]  # 按帧顺序，置信度与当前最高相差不到0.01的结果
+
+    def append(self, result: OCRResult):
+        """加入一个保持当前字幕的结果"""
+        self.last = result
+        self.count += 1
+        if result.confidence > self.max_confidence:
+            self.max_confidence = result.confidence
+            self.candidates = [candidate for candidate in self.candidates
+                               if abs(candidate.confidence - self.max_confidence) < 0.01]
+        if abs(result.confidence - self.max_confidence) < 0.01:
+            self.candidates.append(result)
+
+
+class CaptionTracker:
+    """
+    在线字幕跟踪器：按帧顺序逐个接收OCR结果，字幕一结束就产出 CaptionEvent
+
+    字幕的状态依次为 出现(appear) → 保持(hold) → 变化(change) 或 消失(disappear)：
+    新结果与当前字幕最后一个结果的帧间距不超过 max_frame_gap，且与字幕首个结果的文本框IoU达到阈值
+    或与最后一个结果的文本相似时保持；文本框和文本都不同时为变化，当前字幕结束并由新结果开始新字幕；
+    超过 max_frame_gap 帧没有新结果时消失。结果数不足 min_frames 的字幕丢弃，
+    入点相差不超过 merge_window 帧的相似字幕合并后再产出。
+    判定规则与 ResultProcessor.process_results 相同，产出的结果与其一致；
+    只有未结束的字幕和尚在合并窗口内的字幕驻留内存，未结束的字幕只保留首尾和置信度接近最高的结果（见 _OpenTrack）。
+
+    per_type=False 时与批量去重一致，其他类型的结果也会结束当前字幕；
+    per_type=True 时各类型独立跟踪，重叠显示的不同类型字幕互不打断。
+    """
+
+    def __init__(self, processor: ResultProcessor, min_confidence: float = CAPTION_MIN_CONFIDENCE,
+                 min_frames: int = CAPTION_MIN_FRAMES, max_frame_gap: int = CAPTION_MAX_FRAME_GAP,
+                 iou_threshold: float = CAPTION_IOU_THRESHOLD, merge_window: int = CAPTION_MERGE_WINDOW,
+                 per_type: bool = CAPTION_TRACK_PER_TYPE):
+        """初始化跟踪器（文本规范化、IoU和相似度计算复用 processor）"""
+        self.processor = processor
+        self.min_confidence = min_confidence
+        self.min_frames = min_frames
+        self.max_frame_gap = max_frame_gap
+        self.iou_threshold = iou_threshold
+        self.merge_window = merge_window
+        self.per_type = per_type
+
+        self.open_tracks: Dict[Optional[str], _OpenTrack] = {}  # 未结束的字幕（per_type=False 时只有一条）
+        self.pending: List[CaptionEvent] = []  # 已结束、等待合并窗口关闭的字幕（按入点排序）
+        self.last_frame = -1
+        self.transitions = {'appear': 0, 'hold': 0, 'change': 0, 'disappear': 0}
+        self.raw_stats = {'total_results': 0, 'vfx_count': 0, 'di_count': 0,
+                          'confidence_sum': 0.0, 'min_frame': None, 'max_frame': None}
+
+    def update(self, result: OCRResult) -> List[CaptionEvent]:
+        """送入一个OCR结果（须按帧顺序），返回因此可以产出的字幕"""
+        if result.frame_number < self.last_frame:
+            raise ValueError(f"OCR结果必须按帧顺序送入: 帧 {result.frame_number} 晚于帧 {self.last_frame} 到达")
+        self._count_raw(result)
+
+        self.last_frame = result.frame_number
+        self._close_stale_tracks(result.frame_number)
+        if self.processor.accept_result(result, self.min_confidence):
+            self._add_to_track(result)
+        return self._finalize_ready()
+
+    def advance(self, frame_number: int) -> List[CaptionEvent]:
+        """告知跟踪器已处理到 frame_number（之前不会再有结果），返回因此可以产出的字幕"""
+        self.last_frame = max(self.last_frame, frame_number)
+        self._close_stale_tracks(self.last_frame)
+        return self._finalize_ready()
+
+    def flush(self) -> List[CaptionEvent]:
+        """输入结束：结束所有字幕并产出剩余结果"""
+        for key in sorted(self.open_tracks, key=lambda k: self.open_tracks[k].first.frame_number):
+            self._close_track(key, 'disappear')
+        return self._finalize_ready(end_of_stream=True)
+
+    def track(self, results: Iterable[OCRResult]) -> Iterator[CaptionEvent]:
+        """逐个送入结果，按产出顺序返回字幕（包括输入结束时的剩余字幕）"""
+        for result in results:
+            yield from self.update(result)
+        yield from self.flush()
+
+    def _add_to_track(self, result: OCRResult):
+        """把结果加入对应的字幕：保持当前字幕，或结束它并开始新字幕"""
+        key = result.text_type if self.per_type else None
+        track = self.open_tracks.get(key)
+        if track is not None:
+            if track.first.text_type != result.text_type:
+                self._close_track(key, 'disappear')
+            elif self._continues(track, result):
+                track.append(result)
+                self.transitions['hold'] += 1
+                return
+            else:
+                self._close_track(key, 'change')
+
+        self.open_tracks[key] = _OpenTrack(result)
+        self.transitions['appear'] += 1
+
+    def _continues(self, track: _OpenTrack, result: OCRResult) -> bool:
+        """与 deduplicate_by_continuous_frames_iou 相同的合并条件（帧间距已由 _close_stale_tracks 保证）"""
+        first_bbox = track.first.bbox
+        first_bbox = self.processor._bbox_from_paddle_points(first_bbox) if isinstance(first_bbox, list) else first_bbox
+        bbox = self.processor._bbox_from_paddle_points(result.bbox) if isinstance(result.bbox, list) else result.bbox
+
+        iou = self.processor._calculate_iou(first_bbox, bbox)
+        text_similarity = self.processor._text_similarity(track.last.text, result.text)
+        return iou >= self.iou_threshold or text_similarity >= 0.8
+
+    def _close_stale_tracks(self, frame_number: int):
+        """超过 max_frame_gap 帧没有新结果的字幕视为消失"""
+        stale_keys = [key for key, track in self.open_tracks.items()
+                      if frame_number - track.last.frame_number > self.max_frame_gap]
+        for key in sorted(stale_keys, key=lambda k: self.open_tracks[k].first.frame_number):
+            self._close_track(key, 'disappear')
+
+    def _close_track(self, key: Optional[str], transition: str):
+        """结束一条字幕：足够长的选出最佳结果（保持入点帧号和时间码）进入合并等待队列"""
+        track = self.open_tracks.pop(key)
+        self.transitions[transition] += 1
+        if track.count < self.min_frames:
+            return
+
+        out_frame, out_timecode = track.last.frame_number, track.last.timecode
+        best_result = self.processor._select_best_from_continuous_group(track.candidates)
+        best_result.frame_number = track.first.frame_number
+        best_result.timecode = track.first.timecode
+        event = self._make_event(best_result, out_frame, out_timecode, track.count)
+
+        # 按入点插入（per_type=False 时字幕按入点顺序结束，总是追加到末尾）
+        index = len(self.pending)
+        while index > 0 and self.pending[index - 1].in_frame > event.in_frame:
+            index -= 1
+        self.pending.insert(index, event)
+
+    def _finalize_ready(self, end_of_stream: bool = False) -> List[CaptionEvent]:
+        """
+        合并窗口已关闭的字幕与 merge_similar_texts 相同地合并后产出
+
+        入点为 f 的字幕只能与入点不晚于 f + merge_window 的字幕合并，
+        已处理帧超过该位置且未结束的字幕都在其后开始时，参与合并的字幕已全部确定。
+        """
+        events = []
+        while self.pending:
+            anchor = self.pending[0]
+            window_end = anchor.in_frame + self.merge_window
+            if not end_of_stream and (self.last_frame <= window_end or any(
+                    track.first.frame_number <= window_end for track in self.open_tracks.values())):
+                break
+
+            self.pending.pop(0)
+            group, remaining = [anchor], []
+            for event in self.pending:
+                if (event.text_type == anchor.text_type and
+                        self.processor._text_similarity(anchor.text, event.text) > 0.8 and
+                        abs(anchor.in_frame - event.in_frame) <= self.merge_window):
+                    group.append(event)
+                else:
+                    remaining.append(event)
+            self.pending = remaining
+
+            best_result = self.processor._select_best_from_group([event.result for event in group])
+            last_event = max(group, key=lambda event: event.out_frame)
+            events.append(self._make_event(best_result, last_event.out_frame, last_event.out_timecode,
+                                           sum(event.result_count for event in group)))
+        return events
+
+    @staticmethod
+    def _make_event(result: OCRResult, out_frame: int, out_timecode: str, result_count: int) -> CaptionEvent:
+        """以代表结果的帧号为入点构造字幕事件"""
+        return CaptionEvent(
+            text_type=result.text_type,
+            in_frame=result.frame_number,
+            in_timecode=result.timecode,
+            out_frame=out_frame,
+            out_timecode=out_timecode,
+            text=result.text,
+            confidence=result.confidence,
+            result=result,
+            result_count=result_count
+        )
+
+    def _count_raw(self, result: OCRResult):
+        """累计原始结果统计（与 ResultProcessor.get_statistics 对全部原始结果的统计相同）"""
+        stats = self.raw_stats
+        stats['total_results'] += 1
+        stats['vfx_count'] += result.text_type == "VFX"
+        stats['di_count'] += result.text_type == "DI"
+        stats['confidence_sum'] += result.confidence
+        if stats['min_frame'] is None:
+            stats['min_frame'] = result.frame_number
+        stats['max_frame'] = result.frame_number
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """已送入的原始结果的统计信息"""
+        stats = self.raw_stats
+        if not stats['total_results']:
+            return {"total_results": 0, "vfx_count": 0, "di_count": 0, "avg_confidence": 0.0, "frame_range": "N/A"}
+        return {
+            "total_results": stats['total_results'],
+            "vfx_count": stats['vfx_count'],
+            "di_count": stats['di_count'],
+            "avg_confidence": stats['confidence_sum'] / stats['total_results'],
+            "frame_range": f"{stats['min_frame']} - {stats['max_frame']}"
+        }
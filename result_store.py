@@ -0,0 +1,131 @@
+"""
+列式OCR结果存储
+帧号、类型、置信度、像素数、文本框各存为一列紧凑数组，文本、时间码等字符串驻留为编号，
+去重等批量计算直接在 numpy 视图上进行，只在输出时转换回 OCRResult
+"""
+
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from paddle_ocr_service import OCRResult
+
+
+class StringTable:
+    """字符串驻留表：相同字符串只保存一份，列中存编号"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        """返回字符串的编号（首次出现时加入表）"""
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[value] = string_id
+            self.strings.append(value)
+        return string_id
+
+    def __getitem__(self, string_id: int) -> str:
+        return self.strings[string_id]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class ColumnarResults:
+    """
+    列式OCR结果存储（只追加）
+
+    每个结果占 49 字节的列数据（不含驻留的字符串）；PaddleOCR 的四点文本框转换为 (x1, y1, x2, y2)，
+    调试用的 raw_ocr_data 不保存，需要时按 source 列回到原始结果。
+    """
+
+    def __init__(self):
+        """创建空存储"""
+        self.frame_numbers = array('i')
+        self.type_ids = array('b')
+        self.confidences = array('d')
+        self.pixel_counts = array('i')
+        self.bboxes = array('i')  # 每个结果4个坐标
+        self.text_ids = array('i')
+        self.timecode_ids = array('i')
+        self.sources = array('i')  # 在原始结果列表中的序号（-1 表示无）
+
+        self.types = StringTable()
+        self.texts = StringTable()
+        self.timecodes = StringTable()
+        self.roi_png_paths = StringTable()
+        self.roi_png_path_ids = array('i')
+
+    def __len__(self) -> int:
+        return len(self.frame_numbers)
+
+    def append(self, result: OCRResult, source: int = -1):
+        """追加一个结果"""
+        bbox = result.bbox
+        if isinstance(bbox, list):
+            bbox = bbox_from_points(bbox)
+
+        self.frame_numbers.append(result.frame_number)
+        self.type_ids.append(self.types.intern(result.text_type))
+        self.confidences.append(result.confidence)
+        self.pixel_counts.append(result.pixel_count)
+        self.bboxes.extend(int(value) for value in bbox)
+        self.text_ids.append(self.texts.intern(result.text))
+        self.timecode_ids.append(self.timecodes.intern(result.timecode))
+        self.sources.append(source)
+        self.roi_png_path_ids.append(self.roi_png_paths.intern(result.roi_png_path))
+
+    @classmethod
+    def from_results(cls, results: Sequence[OCRResult]) -> 'ColumnarResults':
+        """由结果列表构造（source 列为列表中的序号）"""
+        store = cls()
+        for index, result in enumerate(results):
+            store.append(result, source=index)
+        return store
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """各列的 numpy 视图（不拷贝；继续追加后须重新获取）"""
+        return {
+            'frame_number': np.frombuffer(self.frame_numbers, dtype=np.int32),
+            'type_id': np.frombuffer(self.type_ids, dtype=np.int8),
+            'confidence': np.frombuffer(self.confidences, dtype=np.float64),
+            'pixel_count': np.frombuffer(self.pixel_counts, dtype=np.int32),
+            'bbox': np.frombuffer(self.bboxes, dtype=np.int32).reshape(-1, 4),
+            'text_id': np.frombuffer(self.text_ids, dtype=np.int32),
+            'timecode_id': np.frombuffer(self.timecode_ids, dtype=np.int32),
+            'source': np.frombuffer(self.sources, dtype=np.int32),
+        }
+
+    @property
+    def column_bytes(self) -> int:
+        """列数据占用的字节数（不含驻留表）"""
+        arrays = (self.frame_numbers, self.type_ids, self.confidences, self.pixel_counts, self.bboxes,
+                  self.text_ids, self.timecode_ids, self.sources, self.roi_png_path_ids)
+        return sum(len(column) * column.itemsize for column in arrays)
+
+    def to_ocr_result(self, row: int, start_row: Optional[int] = None) -> OCRResult:
+        """把一行转换回 OCRResult（start_row 给出时使用该行的帧号和时间码作为入点）"""
+        start_row = row if start_row is None else start_row
+        return OCRResult(
+            frame_number=self.frame_numbers[start_row],
+            timecode=self.timecodes[self.timecode_ids[start_row]],
+            text=self.texts[self.text_ids[row]],
+            pixel_count=self.pixel_counts[row],
+            confidence=self.confidences[row],
+            text_type=self.types[self.type_ids[row]],
+            bbox=tuple(self.bboxes[row * 4:row * 4 + 4]),
+            roi_png_path=self.roi_png_paths[self.roi_png_path_ids[row]],
+            raw_ocr_data={}
+        )
+
+
+def bbox_from_points(points: List[List[int]]) -> Tuple[int, int, int, int]:
+    """PaddleOCR 四点坐标 → (x1, y1, x2, y2)，与 ResultProcessor._bbox_from_paddle_points 相同"""
+    if not points or len(points) < 4:
+        return (0, 0, 0, 0)
+    x_coords = [point[0] for point in points]
+    y_coords = [point[1] for point in points]
+    return (min(x_coords), min(y_coords), max(x_coords), max(y_coords))
+
@@ -0,0 +1,142 @@
+"""
+断点续跑日志
+处理过程中把已完成的OCR结果和检查点（最后一个完整处理的帧、采样调度状态）追加写入 JSONL 文件，
+进程崩溃后用 --resume 从最后一个检查点之后继续，已有结果与新结果合并后再做后处理
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import time
+from typing import List, Optional
+import config
+from paddle_ocr_service import OCRResult
+from config import TMP_DIR, JOURNAL_CHECKPOINT_SECONDS
+
+# 影响原始OCR结果的配置项（后处理参数不在其中：日志保存的是后处理之前的结果）
+RESULT_CONFIG_KEYS = [
+    'DECODE_BACKEND', 'ROI_TOP_RATIO', 'ROI_RIGHT_RATIO', 'CAPTION_COLOR_CLASSES', 'COLOR_CLASSIFIER',
+    'PIXEL_THRESHOLD', 'STATIC_ROI_SKIP', 'STATIC_ROI_DOWNSCALE', 'STATIC_ROI_MAX_DIFF', 'PROBE_GUARD_FRAMES',
+    'LUT_TABLE_BITS', 'OCR_LANG', 'OCR_USE_TEXTLINE_ORIENTATION', 'OCR_USE_DOC_UNWARPER', 'OCR_REC_MODEL_NAME',
+    'OCR_REC_MIN_CONFIDENCE', 'OCR_CROP_TO_TEXT', 'OCR_CROP_MARGIN', 'OCR_LINE_HEIGHT', 'OCR_BINARIZE',
+    'OCR_LINE_MIN_GAP', 'OCR_LINE_MIN_HEIGHT', 'MIN_DETECTION_INTERVAL', 'MAX_DETECTION_INTERVAL',
+    'ADAPTIVE_ONSET_SAMPLES', 'ADAPTIVE_ONSET_STEP', 'ADAPTIVE_CHANGE_RATIO', 'ADAPTIVE_ONSET_GAP',
+]
+
+
+@dataclasses.dataclass
+class ResumePoint:
+    """日志中最后一个检查点：该帧及之前的帧都已处理完，results 为这些帧的全部OCR结果"""
+    frame_number: int
+    sampler_state: dict
+    results: List[OCRResult]
+
+
+def result_config(video_path: str, run_options: dict) -> dict:
+    """一次处理的配置标识：视频文件（路径、大小、修改时间）、运行参数和影响OCR结果的配置项"""
+    stat = os.stat(video_path)
+    identity = {
+        'video': os.path.abspath(video_path),
+        'video_size': stat.st_size,
+        'video_mtime': int(stat.st_mtime),
+        'options': run_options,
+    }
+    identity['config'] = {key: repr(getattr(config, key)) for key in RESULT_CONFIG_KEYS}
+    return identity
+
+
+class RunJournal:
+    """
+    只追加写入的续跑日志（每个 视频+配置 一个文件）
+
+    每行一条记录：header（配置标识）、result（一个OCR结果）、checkpoint（此前的结果覆盖到的帧及采样状态）、
+    resume（续跑起点）。结果写入缓冲区，检查点按 checkpoint_seconds 间隔落盘，
+    因此最后一个检查点之后的结果在崩溃时可能丢失，续跑时会重新处理。
+    """
+
+    def __init__(self, video_path: str, run_options: dict, checkpoint_seconds: float = JOURNAL_CHECKPOINT_SECONDS):
+        """按配置标识确定日志文件（尚不打开）"""
+        self.identity = result_config(video_path, run_options)
+        digest = hashlib.sha1(json.dumps(self.identity, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
+        self.path = os.path.join(TMP_DIR, f"{video_name}.{digest}.journal.jsonl")
+        self.checkpoint_seconds = checkpoint_seconds
+        self.file = None
+        self.last_checkpoint_time = 0.0
+        self.checkpoint_count = 0
+
+    def load(self) -> Optional[ResumePoint]:
+        """读取日志中最后一个检查点（日志不存在或没有检查点时返回 None）"""
+        if not os.path.exists(self.path):
+            return None
+
+        resume_point = None
+        committed: List[OCRResult] = []
+        uncommitted: List[OCRResult] = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 崩溃时写了一半的行
+                kind = record.get('kind')
+                if kind == 'header' and record['identity'] != self.identity:
+                    print(f"⚠️ 警告: 续跑日志 {self.path} 的配置不一致，忽略")
+                    return None
+                if kind == 'result':
+                    uncommitted.append(OCRResult.from_dict(record['result']))
+                elif kind == 'checkpoint':
+                    committed.extend(uncommitted)
+                    uncommitted = []
+                    resume_point = ResumePoint(record['frame'], record['sampler'], committed)
+                elif kind == 'resume':
+                    uncommitted = []  # 上次崩溃前最后一个检查点之后的结果已被重新处理
+
+        if resume_point:
+            resume_point.results = list(committed)
+        return resume_point
+
+    def open(self, resume_point: Optional[ResumePoint] = None):
+        """开始写日志：续跑时追加续跑起点记录，否则重新创建日志"""
+        os.makedirs(TMP_DIR, exist_ok=True)
+        if resume_point:
+            self.file = open(self.path, 'a', encoding='utf-8')
+            # 崩溃时最后一行可能没写完，另起一行
+            self.file.write('\n')
+            self._write({'kind': 'resume', 'frame': resume_point.frame_number})
+        else:
+            self.file = open(self.path, 'w', encoding='utf-8')
+            self._write({'kind': 'header', 'identity': self.identity, 'created': time.time()})
+        self.file.flush()
+        self.last_checkpoint_time = time.time()
+
+    def record(self, results: List[OCRResult], frame_number: int, sampler_state: dict, force: bool = False):
+        """
+        记录已完成的OCR结果；frame_number 及之前的帧已全部处理完时，
+        距上次检查点超过间隔（或 force）则写检查点并落盘
+        """
+        for result in results:
+            self._write({'kind': 'result', 'result': result.to_dict()})
+
+        now = time.time()
+        if force or now - self.last_checkpoint_time >= self.checkpoint_seconds:
+            self._write({'kind': 'checkpoint', 'frame': frame_number, 'sampler': sampler_state})
+            self.file.flush()
+            self.last_checkpoint_time = now
+            self.checkpoint_count += 1
+
+    def _write(self, record: dict):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self):
+        """关闭日志（未落盘的结果随之写入，但不写检查点）"""
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def remove(self):
+        """关闭并删除日志（处理成功、结果文件写完之后调用）"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,160 @@
+"""
+OCR采样调度器
+按字幕类型决定超过像素阈值的帧中哪些需要送OCR，可通过配置替换调度策略
+"""
+
+import base64
+from typing import Callable, Dict, Optional
+import numpy as np
+from config import (PIXEL_THRESHOLD, DEFAULT_FPS, MIN_DETECTION_INTERVAL, MAX_DETECTION_INTERVAL,
+                    ADAPTIVE_ONSET_SAMPLES, ADAPTIVE_ONSET_STEP, ADAPTIVE_CHANGE_RATIO, ADAPTIVE_ONSET_GAP)
+
+
+def encode_signature(signature: Optional[np.ndarray]) -> Optional[dict]:
+    """掩码签名转换为可JSON序列化的形式（断点续跑日志、分布式扫描结果）"""
+    if signature is None:
+        return None
+    return {'shape': list(signature.shape), 'data': base64.b64encode(signature.tobytes()).decode('ascii')}
+
+
+def decode_signature(encoded: Optional[dict]) -> Optional[np.ndarray]:
+    """encode_signature 的逆运算"""
+    if encoded is None:
+        return None
+    return np.frombuffer(base64.b64decode(encoded['data']), dtype=np.uint8).reshape(encoded['shape'])
+
+
+class AlternateSampler:
+    """交替采样：每种类型超过像素阈值的帧中每隔一帧检测一次（原有策略）"""
+
+    # 是否需要调用方提供颜色掩码签名
+    uses_signature = False
+
+    def __init__(self, fps: float = DEFAULT_FPS, same_signature: Optional[Callable] = None):
+        """初始化采样计数器"""
+        self.counters: Dict[str, int] = {}
+
+    def should_sample(self, text_type: str, pixel_count: int, frame_number: Optional[int] = None,
+                      signature: Optional[np.ndarray] = None) -> bool:
+        """判断是否应该进行OCR检测 - 只要超过像素阈值就按2帧检测1帧采样"""
+        if pixel_count <= PIXEL_THRESHOLD:
+            return False
+
+        counter = self.counters.get(text_type, 0)
+        self.counters[text_type] = (counter + 1) % 2
+        return counter == 0
+
+    def get_state(self) -> dict:
+        """可JSON序列化的调度状态（用于断点续跑）"""
+        return {'counters': dict(self.counters)}
+
+    def set_state(self, state: dict):
+        """恢复 get_state 保存的调度状态"""
+        self.counters = dict(state['counters'])
+
+
+class _TypeState:
+    """自适应采样中单个字幕类型的状态"""
+
+    def __init__(self):
+        self.last_seen = None  # 最近一次超过阈值的帧
+        self.last_sampled = None  # 最近一次采样的帧
+        self.reference_count = 0  # 最近一次采样时的像素数
+        self.reference_signature = None  # 最近一次采样时的颜色掩码签名
+        self.onset_remaining = 0  # 出现阶段剩余的连续采样次数
+        self.interval = 0  # 稳定阶段的当前采样间隔（帧）
+
+    def to_dict(self) -> dict:
+        return dict(vars(self), reference_signature=encode_signature(self.reference_signature))
+
+    @classmethod
+    def from_dict(cls, values: dict) -> '_TypeState':
+        state = cls()
+        vars(state).update(values)
+        state.reference_signature = decode_signature(values.get('reference_signature'))
+        return state
+
+
+class AdaptiveSampler:
+    """
+    自适应采样：字幕出现或明显变化时立即连续采样，稳定后按指数退避拉长间隔
+
+    出现阶段每 ADAPTIVE_ONSET_STEP 帧采样一次，共 ADAPTIVE_ONSET_SAMPLES 次，
+    使去重得到与交替采样同样形状的连续帧组；之后间隔从 MIN_DETECTION_INTERVAL
+    开始每次翻倍，直到 MAX_DETECTION_INTERVAL。像素数相对上次采样变化超过
+    ADAPTIVE_CHANGE_RATIO，或颜色掩码签名与上次采样不一致（像素数相近的两条字幕无间隙切换），
+    视为字幕变化；超过 ADAPTIVE_ONSET_GAP 帧未出现视为字幕消失，
+    两者都会让下一帧重新进入出现阶段。间隔按 25fps 配置，按视频帧率换算。
+    """
+
+    uses_signature = True
+
+    def __init__(self, fps: float = DEFAULT_FPS, same_signature: Optional[Callable] = None):
+        """按视频帧率换算采样间隔；same_signature 判断两个掩码签名是否为同一条字幕"""
+        self.same_signature = same_signature
+        fps_scale = fps / DEFAULT_FPS
+        self.min_interval = max(1, round(MIN_DETECTION_INTERVAL * fps_scale))
+        self.max_interval = max(self.min_interval, round(MAX_DETECTION_INTERVAL * fps_scale))
+        self.states: Dict[str, _TypeState] = {}
+        self.call_count = 0
+
+    def should_sample(self, text_type: str, pixel_count: int, frame_number: Optional[int] = None,
+                      signature: Optional[np.ndarray] = None) -> bool:
+        """判断是否应该进行OCR检测（frame_number 缺省时按调用次数计帧；未提供签名时只按像素数判断变化）"""
+        self.call_count += 1
+        if pixel_count <= PIXEL_THRESHOLD:
+            return False
+        if frame_number is None:
+            frame_number = self.call_count
+
+        state = self.states.setdefault(text_type, _TypeState())
+        appeared = state.last_seen is None or frame_number - state.last_seen > ADAPTIVE_ONSET_GAP
+        changed = not appeared and (
+            (state.reference_count > 0 and
+             abs(pixel_count - state.reference_count) / state.reference_count > ADAPTIVE_CHANGE_RATIO) or
+            (signature is not None and state.reference_signature is not None and self.same_signature is not None and
+             not self.same_signature(signature, state.reference_signature)))
+        state.last_seen = frame_number
+
+        if appeared or changed:
+            # 字幕出现或变化：立即采样并进入出现阶段
+            state.onset_remaining = ADAPTIVE_ONSET_SAMPLES
+            state.interval = self.min_interval
+        elif state.onset_remaining > 0:
+            if frame_number - state.last_sampled < ADAPTIVE_ONSET_STEP:
+                return False
+        else:
+            if frame_number - state.last_sampled < state.interval:
+                return False
+            state.interval = min(state.interval * 2, self.max_interval)
+
+        if state.onset_remaining > 0:
+            state.onset_remaining -= 1
+        state.last_sampled = frame_number
+        state.reference_count = pixel_count
+        state.reference_signature = signature
+        return True
+
+    def get_state(self) -> dict:
+        """可JSON序列化的调度状态（用于断点续跑）"""
+        return {'call_count': self.call_count,
+                'states': {text_type: state.to_dict() for text_type, state in self.states.items()}}
+
+    def set_state(self, state: dict):
+        """恢复 get_state 保存的调度状态"""
+        self.call_count = state['call_count']
+        self.states = {text_type: _TypeState.from_dict(values) for text_type, values in state['states'].items()}
+
+
+# 可选的采样调度器
+SAMPLERS = {
+    'alternate': AlternateSampler,
+    'adaptive': AdaptiveSampler,
+}
+
+
+def create_sampler(name: str, fps: float = DEFAULT_FPS, same_signature: Optional[Callable] = None):
+    """按名称创建采样调度器"""
+    if name not in SAMPLERS:
+        raise ValueError(f"不支持的采样调度器: {name}")
+    return SAMPLERS[name](fps, same_signature)
@@ -0,0 +1,139 @@
+"""
+共享内存帧环形缓冲区
+主进程把ROI原始像素写入固定大小的槽位，OCR子进程按槽位号直接读取numpy视图，
+避免PNG编解码和跨进程序列化的拷贝
+"""
+
+import os
+import sys
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+    SHARED_MEMORY_AVAILABLE = True
+except ImportError:
+    SHARED_MEMORY_AVAILABLE = False
+
+# 子进程中已附加的环形缓冲区（每个进程、每个共享内存块只附加一次）
+_ATTACHED_RINGS: 'OrderedDict[str, SharedFrameRing]' = OrderedDict()
+_ATTACHED_RINGS_LOCK = threading.Lock()
+
+# 常驻进程在多个视频之间复用时，最多保留的已附加共享内存块数（更早的解除映射）
+MAX_ATTACHED_RINGS = 4
+
+
+class SharedFrameRing:
+    """固定槽位的共享内存环形缓冲区：槽位由主进程分配和回收，子进程只读"""
+
+    def __init__(self, num_slots: int, slot_bytes: int, name: Optional[str] = None, track: bool = True):
+        """
+        创建共享内存块（name 为空时），或附加到已有的共享内存块
+
+        track=False 时附加的共享内存块不登记到本进程的资源跟踪器：不是创建者子进程的附加方
+        （如OCR服务）退出时，资源跟踪器不会删除创建者仍在使用的共享内存块
+        """
+        if not SHARED_MEMORY_AVAILABLE:
+            raise RuntimeError("当前Python不支持 multiprocessing.shared_memory")
+        if num_slots < 1 or slot_bytes < 1:
+            raise ValueError(f"无效的环形缓冲区参数: {num_slots} 个槽位 × {slot_bytes} 字节")
+
+        self.num_slots = num_slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=num_slots * slot_bytes)
+        elif track or sys.version_info < (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name)
+            if not track and os.name == 'posix':
+                # Python 3.13 之前附加时总会登记（POSIX共享内存以 "/名称" 登记）
+                resource_tracker.unregister('/' + self.shm.name, 'shared_memory')
+        else:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        self.buffer = np.ndarray((num_slots * slot_bytes,), dtype=np.uint8, buffer=self.shm.buf)
+
+        # 空闲槽位（只在主进程中使用）
+        self.free_list: List[int] = list(range(num_slots)) if self.owner else []
+        # 附加方正在读取的调用数（attach 与 detach 配对），大于0时不会被淘汰
+        self.users = 0
+
+    @property
+    def name(self) -> str:
+        """共享内存块名称"""
+        return self.shm.name
+
+    @property
+    def spec(self) -> Tuple[str, int, int]:
+        """子进程附加所需的描述 (名称, 槽位数, 槽位字节数)，可序列化"""
+        return self.name, self.num_slots, self.slot_bytes
+
+    @property
+    def free_slots(self) -> int:
+        """当前空闲槽位数"""
+        return len(self.free_list)
+
+    @classmethod
+    def attach(cls, spec: Tuple[str, int, int], track: bool = True) -> 'SharedFrameRing':
+        """
+        在子进程中附加到主进程创建的环形缓冲区（结果按名称缓存）
+
+        每次 attach 都要在读完槽位后调用 detach：超过 MAX_ATTACHED_RINGS 时只淘汰没有调用在读取的
+        共享内存块，多个线程各自附加不同的共享内存块时，正在读取的不会被其它线程的附加解除映射
+        """
+        name, num_slots, slot_bytes = spec
+        with _ATTACHED_RINGS_LOCK:
+            ring = _ATTACHED_RINGS.get(name)
+            if ring is None:
+                ring = _ATTACHED_RINGS[name] = cls(num_slots, slot_bytes, name=name, track=track)
+            _ATTACHED_RINGS.move_to_end(name)
+            ring.users += 1
+            _evict_idle_rings()
+            return ring
+
+    def detach(self):
+        """结束一次 attach 的读取；之后可能被淘汰，槽位视图不再有效"""
+        with _ATTACHED_RINGS_LOCK:
+            self.users -= 1
+            _evict_idle_rings()
+
+    def put(self, image: np.ndarray) -> Optional[int]:
+        """把图像拷贝到一个空闲槽位，返回槽位号；无空闲槽位或图像超过槽位大小时返回 None"""
+        if not self.free_list or image.nbytes > self.slot_bytes:
+            return None
+
+        slot = self.free_list.pop()
+        start = slot * self.slot_bytes
+        self.buffer[start:start + image.nbytes] = np.ascontiguousarray(image).reshape(-1).view(np.uint8)
+        return slot
+
+    def view(self, slot: int, shape: tuple, dtype: str = 'uint8') -> np.ndarray:
+        """槽位内容的只读numpy视图（不拷贝），在槽位回收前有效"""
+        dtype = np.dtype(dtype)
+        start = slot * self.slot_bytes
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        image = self.buffer[start:start + nbytes].view(dtype).reshape(shape)
+        image.flags.writeable = False
+        return image
+
+    def release(self, slots: List[int]):
+        """回收槽位（对应的OCR批次完成后由主进程调用）"""
+        self.free_list.extend(slots)
+
+    def close(self):
+        """释放本进程对共享内存的映射；创建者同时删除共享内存块"""
+        self.buffer = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _evict_idle_rings():
+    """已附加的共享内存块超过 MAX_ATTACHED_RINGS 时，从最早的开始解除没有调用在读取的（调用方持有锁）"""
+    excess = len(_ATTACHED_RINGS) - MAX_ATTACHED_RINGS
+    for name in [name for name, ring in _ATTACHED_RINGS.items() if ring.users == 0][:max(excess, 0)]:
+        _ATTACHED_RINGS.pop(name).close()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试在线字幕跟踪 CaptionTracker 与批量后处理 ResultProcessor.process_results 的结果及结果文件一致
+"""
+
+import os
+import random
+import tempfile
+from typing import Callable, List
+from paddle_ocr_service import OCRResult
+from result_processor import ResultProcessor, CaptionTracker
+from config import CAPTION_MIN_FRAMES, CAPTION_MAX_FRAME_GAP, CAPTION_MERGE_WINDOW
+
+BBOX = (100, 20, 300, 50)
+MOVED_BBOX = (400, 20, 600, 50)
+
+
+def make_result(frame_number: int, text: str, text_type: str = 'VFX', confidence: float = 0.9,
+                bbox: tuple = BBOX, pixel_count: int = 1000) -> OCRResult:
+    """构造一个OCR结果（时间码按25fps）"""
+    seconds, frames = divmod(frame_number, 25)
+    timecode = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}:{frames:02d}"
+    return OCRResult(frame_number=frame_number, timecode=timecode, text=text, pixel_count=pixel_count,
+                     confidence=confidence, text_type=text_type, bbox=bbox, roi_png_path="", raw_ocr_data={})
+
+
+def caption(start: int, count: int, text: str, step: int = 2, **kwargs) -> List[OCRResult]:
+    """从 start 开始每 step 帧一个结果、共 count 个结果的字幕"""
+    return [make_result(start + index * step, text, **kwargs) for index in range(count)]
+
+
+def steady_stream() -> List[OCRResult]:
+    """持续显示的字幕：首尾相接的变化、间隔消失、结尾时仍未消失"""
+    return (caption(0, 30, "VFX:shot_001") +
+            caption(60, 30, "VFX:shot_002_final", bbox=MOVED_BBOX) +
+            caption(300, 20, "DI:grade_010", text_type='DI') +
+            caption(500, 15, "VFX:shot_003"))
+
+
+def flicker_stream() -> List[OCRResult]:
+    """闪烁的字幕：缺帧（不超过允许的帧间距）、低置信度和规范化后为空的结果穿插其中"""
+    results = []
+    for index in range(60):
+        frame = index * 3
+        if index % 7 in (2, 3):  # 连续缺两个结果：帧间距 9
+            continue
+        if index % 11 == 5:
+            results.append(make_result(frame, "VFX:shot_100", confidence=0.05))
+        elif index % 13 == 6:
+            results.append(make_result(frame, "", confidence=0.9))
+        else:
+            # 识别抖动：个别帧文本和置信度不同
+            text = "VFX:shot_1OO" if index % 5 == 0 else "VFX:shot_100"
+            results.append(make_result(frame, text, confidence=0.8 + (index % 4) * 0.05))
+    return results
+
+
+def gap_stream() -> List[OCRResult]:
+    """帧间距恰为 CAPTION_MAX_FRAME_GAP（保持）和超过一帧（断开）的字幕"""
+    gap = CAPTION_MAX_FRAME_GAP
+    kept = caption(0, 12, "VFX:shot_200") + caption(22 + gap, 12, "VFX:shot_200")
+    broken = caption(400, 12, "VFX:shot_201") + caption(422 + gap + 1, 12, "VFX:shot_201")
+    return kept + broken
+
+
+def edge_stream() -> List[OCRResult]:
+    """边界：结果数恰为/少于 CAPTION_MIN_FRAMES、类型切换打断、文本框移动但文本相似、合并窗口内外的重现"""
+    window = CAPTION_MERGE_WINDOW
+    results = []
+    results += caption(0, CAPTION_MIN_FRAMES, "VFX:shot_300")
+    results += caption(100, CAPTION_MIN_FRAMES - 1, "VFX:shot_301")
+    # VFX 字幕中间插入一个 DI 结果
+    results += caption(200, 8, "VFX:shot_302") + [make_result(215, "DI:grade_302", text_type='DI')]
+    results += caption(216, 12, "VFX:shot_302")
+    # 文本框移动但文本不变
+    results += caption(300, 6, "VFX:shot_303") + caption(312, 6, "VFX:shot_303", bbox=MOVED_BBOX)
+    # 同一文本被其他类型的结果打断后，在合并窗口内（入点相差 window 帧）和窗口外（多一帧）重现
+    results += caption(400, 10, "VFX:shot_304", confidence=0.8)
+    results += [make_result(419, "DI:grade_304", text_type='DI')]
+    results += caption(400 + window, 10, "VFX:shot_304", confidence=0.95, bbox=MOVED_BBOX)
+    results += caption(600, 10, "VFX:shot_306")
+    results += [make_result(619, "DI:grade_306", text_type='DI')]
+    results += caption(600 + window + 1, 10, "VFX:shot_306", step=1)
+    # 置信度相同时取文本最长的结果
+    results += [make_result(800 + index, "VFX:shot_307" + ("_v2" if index == 5 else ""))
+                for index in range(12)]
+    # 置信度只相差不到0.01
+    results += [make_result(900 + index, "VFX:shot_308", confidence=0.9 + index * 0.0005, pixel_count=900 + index)
+                for index in range(12)]
+    return sorted(results, key=lambda result: result.frame_number)
+
+
+def random_stream(seed: int) -> List[OCRResult]:
+    """随机字幕序列：时长、缺帧、抖动、类型和文本框都随机"""
+    rng = random.Random(seed)
+    texts = ["shot_001", "shot_002", "comp_alpha", "grade_bravo", "roto_kilo", "matte_yw"]
+    results, frame = [], 0
+    while frame < 3000:
+        text_type = rng.choice(['VFX', 'DI'])
+        text = f"{text_type}:{rng.choice(texts)}"
+        bbox = rng.choice([BBOX, MOVED_BBOX, (110, 22, 310, 52)])
+        for _ in range(rng.randint(1, 40)):
+            if rng.random() < 0.85:
+                jitter = text.replace('0', 'O', 1) if rng.random() < 0.1 else text
+                results.append(make_result(frame, jitter, text_type=text_type, bbox=bbox,
+                                           confidence=rng.choice([0.05, 0.7, 0.85, 0.851, 0.9, 0.95]),
+                                           pixel_count=rng.randint(500, 1500)))
+            frame += rng.randint(1, 5)
+        frame += rng.choice([0, 1, CAPTION_MAX_FRAME_GAP, CAPTION_MAX_FRAME_GAP + 1, 30, 200])
+    return results
+
+
+def quoted_text_stream() -> List[OCRResult]:
+    """需要CSV转义的文本：逗号、引号、中文"""
+    return (caption(0, 12, 'VFX:shot_400,"v2"') +
+            caption(100, 12, "DI:调色_第3场", text_type='DI', confidence=0.876543))
+
+
+def result_fields(results: List[OCRResult]) -> list:
+    """比较用的结果字段"""
+    return [(result.frame_number, result.timecode, result.text, result.pixel_count, result.confidence,
+             result.text_type, result.bbox) for result in results]
+
+
+def test_tracker_matches_batch():
+    """同一OCR结果序列，在线跟踪产出的字幕与批量后处理的结果逐条一致"""
+    try:
+        processor = ResultProcessor("equivalence.avi")
+        streams = {
+            '持续显示': steady_stream,
+            '闪烁': flicker_stream,
+            '帧间距': gap_stream,
+            '边界': edge_stream,
+            '空输入': lambda: [],
+            '单个结果': lambda: [make_result(0, "VFX:shot_000")],
+        }
+        for seed in range(20):
+            streams[f'随机 {seed}'] = lambda seed=seed: random_stream(seed)
+
+        for name, make_stream in streams.items():
+            make_stream: Callable[[], List[OCRResult]]
+            # 两条路径都会改写结果对象（规范化文本、入点帧号），各用一份
+            expected = processor.process_results(make_stream())
+            tracker = CaptionTracker(processor, per_type=False)
+            events = list(tracker.track(make_stream()))
+
+            assert result_fields([event.result for event in events]) == result_fields(expected), \
+                f"{name}: 在线跟踪 {len(events)} 条字幕，批量后处理 {len(expected)} 条，结果不一致"
+            for event in events:
+                assert event.in_frame == event.result.frame_number and event.out_frame >= event.in_frame, \
+                    f"{name}: 字幕入出点无效: {event.in_frame} - {event.out_frame}"
+            print(f"✓ {name}: {len(events)} 条字幕一致")
+
+        # 持续显示和闪烁的字幕都应保留下来、窗口内的重现应合并，否则上面的比较没有意义
+        assert len(processor.process_results(steady_stream())) == 4
+        assert len(processor.process_results(flicker_stream())) == 1
+        edge_texts = [result.text for result in processor.process_results(edge_stream())]
+        assert edge_texts.count("VFX:shot_304") == 1 and edge_texts.count("VFX:shot_306") == 2, edge_texts
+
+        print("\n🎉 所有测试完成！")
+
+    except Exception as e:
+        print(f"✗ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise
+
+
+def test_stream_csv_matches_batch():
+    """在线跟踪 + stream_to_csv 写出的结果文件与批量后处理 + save_to_csv 逐字节相同"""
+    try:
+        processor = ResultProcessor("equivalence.avi")
+        streams = [steady_stream, flicker_stream, gap_stream, edge_stream, quoted_text_stream,
+                   lambda: [], lambda: random_stream(7)]
+        with tempfile.TemporaryDirectory() as work_dir:
+            batch_csv = os.path.join(work_dir, 'batch.csv')
+            streamed_csv = os.path.join(work_dir, 'streamed.csv')
+            for index, make_stream in enumerate(streams):
+                processor.save_to_csv(processor.process_results(make_stream()), batch_csv)
+                tracker = CaptionTracker(processor, per_type=False)
+                _, count = processor.stream_to_csv((event.result for event in tracker.track(make_stream())),
+                                                   streamed_csv)
+
+                with open(batch_csv, 'rb') as f:
+                    expected = f.read()
+                with open(streamed_csv, 'rb') as f:
+                    actual = f.read()
+                assert actual == expected, f"第 {index} 组输入: 结果文件不一致"
+                assert count == expected.count(b'\n') - 1, f"第 {index} 组输入: 写入 {count} 行"
+                print(f"✓ 第 {index} 组输入: {count} 条字幕，结果文件逐字节相同")
+
+        print("\n🎉 所有测试完成！")
+
+    except Exception as e:
+        print(f"✗ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise
+
+
+if __name__ == "__main__":
+    test_tracker_matches_batch()
+    test_stream_csv_matches_batch()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试 ColorClassifier 查找表与逐帧HLS路径的一致性
+"""
+
+import numpy as np
+from color_classifier import ColorClassifier
+
+
+def test_color_table_exact():
+    """全部 2^24 种BGR颜色上，查找表分类与 classify_hls 逐像素一致"""
+    try:
+        print("正在编译颜色查找表...")
+        classifier = ColorClassifier(method='table')
+        print("✓ 查找表编译完成")
+
+        # 4096x4096 的图像恰好覆盖全部BGR颜色
+        codes = np.arange(1 << 24, dtype=np.uint32).reshape(4096, 4096)
+        all_colors = np.empty((4096, 4096, 3), dtype=np.uint8)
+        all_colors[..., 0] = codes & 0xFF
+        all_colors[..., 1] = (codes >> 8) & 0xFF
+        all_colors[..., 2] = (codes >> 16) & 0xFF
+
+        print("\n测试: 全部颜色逐像素比较")
+        table_masks = classifier.classify(all_colors)
+        hls_masks = classifier.classify_hls(all_colors)
+        for (name, table_mask), (_, hls_mask) in zip(table_masks, hls_masks):
+            mismatches = int(np.count_nonzero(table_mask != hls_mask))
+            assert mismatches == 0, f"{name}: {mismatches} 种颜色分类不一致"
+            print(f"✓ {name}: {int(np.count_nonzero(hls_mask))} 种颜色命中，全部一致")
+
+        print("\n🎉 所有测试完成！")
+
+    except Exception as e:
+        print(f"✗ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise
+
+
+if __name__ == "__main__":
+    test_color_table_exact()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试分段并行预处理（-p > 1）中断后续跑的结果与不中断的处理一致
+"""
+
+import os
+import tempfile
+import cv2
+import numpy as np
+import main_coordinator
+from main_coordinator import MainCoordinator
+from config import ROI_TOP_RATIO, ROI_RIGHT_RATIO
+
+VIDEO_FRAMES = 1200
+VIDEO_SIZE = (1280, 720)
+
+
+def make_caption_video(path: str):
+    """合成测试视频：右上角的VFX（绿色）/DI（橙色）字幕每段持续数十帧，段间有空白，也有无间隙切换"""
+    width, height = VIDEO_SIZE
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (width, height))
+    left, baseline = int(width * ROI_RIGHT_RATIO) + 10, int(height * ROI_TOP_RATIO * 0.6)
+    colors = {'VFX': (60, 220, 60), 'DI': (40, 140, 230)}
+    for frame_number in range(VIDEO_FRAMES):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        segment, offset = divmod(frame_number, 90)
+        if offset < 70 or segment % 3 == 0:
+            text_type = 'VFX' if segment % 2 == 0 else 'DI'
+            cv2.putText(frame, f"{text_type}:shot_{segment:03d}", (left + (segment % 4) * 60, baseline),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.0, colors[text_type], 3)
+        writer.write(frame)
+    writer.release()
+
+
+def run_chunked(video_path: str, output_file: str, sampler: str, resume: bool = False) -> MainCoordinator:
+    """分段并行预处理（2 个进程），每个OCR批次完成后都写检查点"""
+    coordinator = MainCoordinator(video_path, preprocess_workers=2, use_ocr_cache=False, sampler=sampler,
+                                  resume=resume)
+    coordinator.journal.checkpoint_seconds = 0.0
+    coordinator.run(parallel=True, output_file=output_file)
+    return coordinator
+
+
+def truncate_journal(journal_path: str, checkpoint: int):
+    """模拟崩溃：日志只保留到第 checkpoint 个检查点，并留下写了一半的一行"""
+    with open(journal_path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    checkpoint_lines = [index for index, line in enumerate(lines) if '"kind": "checkpoint"' in line]
+    assert len(checkpoint_lines) > checkpoint, f"检查点不足: {len(checkpoint_lines)}"
+    with open(journal_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines[:checkpoint_lines[checkpoint] + 3]) + '\n{"kind": "res')
+
+
+def ocr_frames(results) -> list:
+    """OCR结果的 (帧号, 类型, 文本) 列表（按帧顺序）"""
+    return [(result.frame_number, result.text_type, result.text) for result in results]
+
+
+def test_resume_chunked_run():
+    """分段回放采样领先于任务产出：从中途检查点续跑的结果文件与不中断的处理逐字节相同"""
+    original_cwd = os.getcwd()
+    original_keep = main_coordinator.JOURNAL_KEEP_ON_SUCCESS
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            os.chdir(work_dir)  # 续跑日志写入当前目录下的 TMP_DIR
+            video_path = os.path.join(work_dir, 'captions.avi')
+            make_caption_video(video_path)
+
+            for sampler in ('alternate', 'adaptive'):
+                full_csv = os.path.join(work_dir, f'full_{sampler}.csv')
+                resumed_csv = os.path.join(work_dir, f'resumed_{sampler}.csv')
+
+                # 保留日志：日志中是后处理之前的全部OCR结果，比结果文件更能反映采样是否一致
+                main_coordinator.JOURNAL_KEEP_ON_SUCCESS = True
+                coordinator = run_chunked(video_path, full_csv, sampler)
+                expected_results = ocr_frames(coordinator.journal.load().results)
+                # 第一个分段的任务尚未全部产出时的检查点：此时整个分段已经回放完采样
+                truncate_journal(coordinator.journal.path, 1)
+
+                resumed = run_chunked(video_path, resumed_csv, sampler, resume=True)
+                assert resumed.resume_frame is not None, "没有从续跑日志恢复"
+                actual_results = ocr_frames(resumed.journal.load().results)
+                os.remove(resumed.journal.path)
+
+                assert len(expected_results) > 20, "测试视频没有识别到足够的字幕"
+                assert actual_results == expected_results, \
+                    f"{sampler}: 续跑的OCR帧与不中断的处理不一致: " \
+                    f"缺少 {sorted(set(expected_results) - set(actual_results))[:10]}，" \
+                    f"多出 {sorted(set(actual_results) - set(expected_results))[:10]}"
+                with open(full_csv, 'rb') as f:
+                    expected = f.read()
+                with open(resumed_csv, 'rb') as f:
+                    actual = f.read()
+                assert actual == expected, f"{sampler}: 续跑结果文件与不中断的处理不一致"
+                print(f"✓ {sampler}: 从帧 {resumed.resume_frame} 续跑，结果与不中断的处理一致")
+
+        print("\n🎉 所有测试完成！")
+
+    except Exception as e:
+        print(f"✗ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise
+
+    finally:
+        os.chdir(original_cwd)
+        main_coordinator.JOURNAL_KEEP_ON_SUCCESS = original_keep
+
+
+if __name__ == "__main__":
+    test_resume_chunked_run()
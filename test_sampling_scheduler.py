@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试 AdaptiveSampler 对无间隙字幕切换的检测
+"""
+
+import numpy as np
+from sampling_scheduler import AdaptiveSampler
+from video_preprocessor import VideoPreprocessor
+from config import ADAPTIVE_ONSET_SAMPLES, ADAPTIVE_ONSET_STEP
+
+
+def make_caption_roi(left: int, width: int) -> np.ndarray:
+    """过滤后的字幕ROI：20行高的色块，像素数为 20 × width"""
+    roi = np.zeros((43, 768, 3), dtype=np.uint8)
+    roi[10:30, left:left + width] = (60, 220, 60)
+    return roi
+
+
+def test_gapless_caption_change():
+    """像素数相近（1000 / 1080）的两条字幕在第300帧无间隙切换，切换后立即重新进入出现阶段"""
+    try:
+        caption1 = make_caption_roi(100, 50)
+        caption2 = make_caption_roi(400, 54)
+        signatures = [VideoPreprocessor.mask_signature(caption1), VideoPreprocessor.mask_signature(caption2)]
+        pixel_counts = [1000, 1080]
+        change_frame = 300
+
+        for use_signature in (False, True):
+            sampler = AdaptiveSampler(same_signature=VideoPreprocessor.same_signature)
+            sampled = []
+            for frame_number in range(600):
+                caption = 0 if frame_number < change_frame else 1
+                signature = signatures[caption] if use_signature else None
+                if sampler.should_sample('VFX', pixel_counts[caption], frame_number, signature):
+                    sampled.append(frame_number)
+
+            onset_end = change_frame + ADAPTIVE_ONSET_SAMPLES * ADAPTIVE_ONSET_STEP
+            onset_samples = [frame_number for frame_number in sampled if change_frame <= frame_number < onset_end]
+            label = "掩码签名" if use_signature else "仅像素数"
+            print(f"{label}: 共采样 {len(sampled)} 帧，切换后出现阶段采样 {len(onset_samples)} 帧")
+
+            if use_signature:
+                assert onset_samples[:1] == [change_frame], f"切换帧未采样: {onset_samples}"
+                assert len(onset_samples) == ADAPTIVE_ONSET_SAMPLES, f"切换后采样不足: {onset_samples}"
+                print("✓ 掩码签名: 字幕切换后立即连续采样")
+            else:
+                # 像素数变化不到 ADAPTIVE_CHANGE_RATIO，只看像素数时检测不到切换（签名要解决的问题）
+                assert not onset_samples, f"像素数相近的切换不应被检测到: {onset_samples}"
+                print("✓ 仅像素数: 像素数相近的无间隙切换未被检测（需要掩码签名）")
+
+        # 同一条字幕的签名在续跑日志中往返后仍判断为未变化
+        state = sampler.get_state()
+        restored = AdaptiveSampler(same_signature=VideoPreprocessor.same_signature)
+        restored.set_state(state)
+        assert restored.should_sample('VFX', pixel_counts[1], 600, signatures[1]) == \
+            sampler.should_sample('VFX', pixel_counts[1], 600, signatures[1])
+        print("✓ 调度状态（含签名）保存后恢复一致")
+
+        print("\n🎉 所有测试完成！")
+
+    except Exception as e:
+        print(f"✗ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise
+
+
+if __name__ == "__main__":
+    test_gapless_caption_change()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试文本规范化规则引擎与原有逐条 str.replace 实现的一致性
+"""
+
+import itertools
+import random
+from text_normalizer import TextNormalizer
+from benchmark_result_processor import process_text_reference, legacy_process_text_reference
+from config import TEXT_NORMALIZATION_RULES
+
+
+def make_texts(max_length: int = 4, random_count: int = 200000, seed: int = 0) -> list:
+    """识别混淆字符上的全部短字符串 + 随机长字符串"""
+    alphabet = 'VEFXPIDl1|L0iov: ;.'
+    rng = random.Random(seed)
+    texts = [''.join(chars) for length in range(max_length + 1) for chars in itertools.product(alphabet, repeat=length)]
+    texts += [''.join(rng.choice(alphabet + 'ab_中文') for _ in range(rng.randint(5, 24))) for _ in range(random_count)]
+    return texts
+
+
+def test_text_normalization_exact():
+    """重构版和单体版规则集在每种类型上都与各自的原有实现逐字符串一致"""
+    try:
+        texts = make_texts()
+        print(f"核对 {len(texts)} 个字符串")
+
+        for rule_set, reference in (('refactored', process_text_reference), ('legacy', legacy_process_text_reference)):
+            normalizer = TextNormalizer(TEXT_NORMALIZATION_RULES[rule_set])
+            for text_type in ('VFX', 'DI', 'OTHER'):
+                mismatches = [text for text in texts if normalizer.normalize(text, text_type) != reference(text, text_type)]
+                assert not mismatches, \
+                    f"{rule_set}/{text_type}: {len(mismatches)} 个字符串不一致，例如 {mismatches[:5]}"
+                print(f"✓ {rule_set}/{text_type}: 全部一致")
+
+        print("\n🎉 所有测试完成！")
+
+    except Exception as e:
+        print(f"✗ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise
+
+
+if __name__ == "__main__":
+    test_text_normalization_exact()
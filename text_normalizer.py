@@ -0,0 +1,87 @@
+"""
+文本规范化规则引擎
+把 config.TEXT_NORMALIZATION_RULES 中的声明式规则编译为每种类型一个正则（一次扫描完成全部替换）
+和前缀规范化，相同文本的结果被记住，重构版与单体版共用
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from config import TEXT_NORMALIZATION_RULES, TEXT_NORMALIZATION_CACHE_SIZE
+
+# 已编译的规则集（每个进程、每个规则集只编译一次）
+_NORMALIZER_CACHE: Dict[str, 'TextNormalizer'] = {}
+
+
+def get_text_normalizer(rule_set: str = 'refactored') -> 'TextNormalizer':
+    """获取（必要时编译并缓存）指定规则集的规范化引擎"""
+    if rule_set not in _NORMALIZER_CACHE:
+        if rule_set not in TEXT_NORMALIZATION_RULES:
+            raise ValueError(f"不支持的文本规范化规则集: {rule_set}")
+        _NORMALIZER_CACHE[rule_set] = TextNormalizer(TEXT_NORMALIZATION_RULES[rule_set])
+    return _NORMALIZER_CACHE[rule_set]
+
+
+class TypeRules:
+    """单个字幕类型编译后的规则"""
+
+    def __init__(self, rules: dict):
+        """编译替换正则：各条规则合并为一个带命名组的正则"""
+        replacements = rules.get('replace', [])
+        self.replacements = [replacement for _, replacement in replacements]
+        self.pattern = None
+        if replacements:
+            self.pattern = re.compile('|'.join(
+                f"(?P<r{index}>{pattern})" for index, (pattern, _) in enumerate(replacements)))
+        # 只有一种替换文本时直接用字符串替换，免去回调
+        self.single_replacement = self.replacements[0] if len(set(self.replacements)) == 1 else None
+
+        self.prefix: str = rules['prefix']
+        bare_prefix: Optional[Tuple[str, int]] = rules.get('bare_prefix')
+        self.bare_prefix, self.bare_skip = bare_prefix if bare_prefix else (None, 0)
+        self.alias_width: int = rules.get('alias_width', 0)
+        self.aliases = frozenset(rules.get('aliases', []))
+        self.separators = rules.get('separators', [])
+
+    def replace(self, text: str) -> str:
+        """一次扫描完成全部替换"""
+        if self.pattern is None:
+            return text
+        if self.single_replacement is not None:
+            return self.pattern.sub(self.single_replacement, text)
+        return self.pattern.sub(lambda match: self.replacements[int(match.lastgroup[1:])], text)
+
+    def canonicalize_prefix(self, text: str) -> str:
+        """前缀规范化"""
+        if text.startswith(self.prefix):
+            return text
+        if self.bare_prefix and text.startswith(self.bare_prefix):
+            return self.prefix + text[self.bare_skip:]
+        if text[:self.alias_width].lower().replace(' ', '') in self.aliases:
+            for separator in self.separators:
+                separator_pos = text.find(separator)
+                if separator_pos != -1:
+                    return self.prefix + text[separator_pos + 1:]
+            return self.prefix + text[self.alias_width:]
+        return self.prefix + text
+
+
+class TextNormalizer:
+    """文本规范化引擎：按类型一次扫描替换 + 前缀规范化，记住最近 cache_size 个文本的结果"""
+
+    def __init__(self, rule_set: dict, cache_size: int = TEXT_NORMALIZATION_CACHE_SIZE):
+        """编译规则集"""
+        self.type_rules = {text_type: TypeRules(rules) for text_type, rules in rule_set['types'].items()}
+        self.fallback_rules = self.type_rules[rule_set['fallback']]
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def _normalize(self, text: str, text_type: str) -> str:
+        """规范化处理识别结果"""
+        if not text:
+            return ""
+        rules = self.type_rules.get(text_type, self.fallback_rules)
+        return rules.canonicalize_prefix(rules.replace(text))
+
+    def cache_info(self):
+        """记忆缓存的命中统计"""
+        return self.normalize.cache_info()
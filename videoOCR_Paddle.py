@@ -6,7 +6,8 @@ import os
 from datetime import timedelta
 import argparse
 from paddleocr import PaddleOCR
-import colour
+from lut_engine import get_lut_engine
+from text_normalizer import get_text_normalizer
 
 class VideoOCRPaddle:
     def __init__(self, video_path, lut_path=None, use_gpu=False, start_time=None, end_time=None):
@@ -128,50 +129,8 @@ class VideoOCRPaddle:
         return results
 
     def process_text(self, text, text_type):
-        """和原脚本一致的文本规范化处理"""
-        if not text:
-            return ""
-        if text_type == "VFX":
-            text = text.replace('VEX:', 'VFX:')
-            text = text.replace('VFX;', 'VFX:')
-            text = text.replace('VEX;', 'VFX:')
-            if not text.startswith('VFX:'):
-                if text[:4].lower().replace(' ', '') in ['vfx', 'vex', 'vpx', 'vix']:
-                    colon_pos = text.find(':')
-                    semicolon_pos = text.find(';')
-                    if colon_pos != -1:
-                        text = 'VFX:' + text[colon_pos + 1:]
-                    elif semicolon_pos != -1:
-                        text = 'VFX:' + text[semicolon_pos + 1:]
-                    else:
-                        text = 'VFX:' + text[4:]
-                else:
-                    text = 'VFX:' + text
-        else:
-            text = text.replace('D1:', 'DI:')
-            text = text.replace('Dl:', 'DI:')
-            text = text.replace('D|:', 'DI:')
-            text = text.replace('DL:', 'DI:')
-            text = text.replace('01:', 'DI:')
-            text = text.replace('DI;', 'DI:')
-            text = text.replace('D1;', 'DI:')
-            text = text.replace('Dl;', 'DI:')
-            text = text.replace('D|;', 'DI:')
-            text = text.replace('DL;', 'DI:')
-            text = text.replace('01;', 'DI:')
-            if not text.startswith('DI:'):
-                if text[:3].lower().replace(' ', '') in ['di', 'd1', 'dl', 'ol', 'oi', '01']:
-                    colon_pos = text.find(':')
-                    semicolon_pos = text.find(';')
-                    if colon_pos != -1:
-                        text = 'DI:' + text[colon_pos + 1:]
-                    elif semicolon_pos != -1:
-                        text = 'DI:' + text[semicolon_pos + 1:]
-                    else:
-                        text = 'DI:' + text[3:]
-                else:
-                    text = 'DI:' + text
-        return text
+        """和原脚本一致的文本规范化处理（与重构版共用规则引擎，规则集 'legacy'）"""
+        return get_text_normalizer('legacy').normalize(text, text_type)
 
     def apply_lut_processing(self, image_bgr, lut_path):
         """
@@ -180,34 +139,8 @@ class VideoOCRPaddle:
         输出: 处理后的BGR格式图像
         """
         try:
-            # 转换为RGB并标准化
-            image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
-            image_normalized = image_rgb.astype(np.float32) / 255.0
-
-            # 加载LUT
-            lut_3d = colour.io.read_LUT(lut_path)
-
-            # 应用LUT
-            try:
-                processed_image = lut_3d.apply(image_normalized)
-            except:
-                # 备用方法
-                height, width, channels = image_normalized.shape
-                image_reshaped = image_normalized.reshape(-1, channels)
-                processed_reshaped = colour.algebra.table_interpolation_trilinear(
-                    image_reshaped, lut_3d.table
-                )
-                processed_image = processed_reshaped.reshape(height, width, channels)
-
-            # 裁剪到有效范围
-            processed_image = np.clip(processed_image, 0.0, 1.0)
-
-            # 转换回uint8格式并转为BGR
-            processed_uint8 = (processed_image * 255).astype(np.uint8)
-            processed_bgr = cv2.cvtColor(processed_uint8, cv2.COLOR_RGB2BGR)
-
-            return processed_bgr
-
+            # 使用进程内缓存的预编译LUT引擎（.cube 只解析一次，只处理掩码内像素）
+            return get_lut_engine(lut_path).apply(image_bgr)
         except Exception as e:
             raise Exception(f"LUT处理失败: {str(e)}")
 
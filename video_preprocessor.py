@@ -6,20 +6,45 @@
 import cv2
 import numpy as np
 import os
+import shutil
+import subprocess
 from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional, Iterator
 from config import *
-import colour
+from frame_index import FrameIndex
+from color_classifier import ColorClassifier
+from lut_engine import get_lut_engine
+from sampling_scheduler import create_sampler
 
 @dataclass
 class FrameData:
     """帧数据结构"""
     frame_number: int
     timecode: str
-    image_bytes: bytes  # 已编码的图像字节流（可序列化）
+    image_bytes: bytes  # 图像字节流（PNG编码或原始像素，可序列化；共享内存传输时为空）
     pixel_count: int
     text_type: str  # 'VFX' or 'DI'
     image_shape: tuple  # 图像形状信息 (height, width, channels)
+    crop_offset: Tuple[int, int] = (0, 0)  # 裁剪区域左上角在ROI中的坐标 (x, y)
+    crop_scale: float = 1.0  # 裁剪图像缩放到固定行高的比例（OCR图像坐标 = ROI坐标 × 比例）
+    image_format: str = 'png'  # 'png' PNG编码 / 'raw' 原始像素（形状见 image_shape）
+    image_dtype: str = 'uint8'  # 原始像素的数据类型
+    shm_slot: int = -1  # 共享内存环形缓冲区槽位号（-1 表示图像在 image_bytes 中）
+    text_bbox: Tuple[int, int, int, int] = (0, 0, 0, 0)  # 颜色掩码外接矩形在OCR图像中的坐标 (x1, y1, x2, y2)
+    text_lines: int = 1  # 颜色掩码的文本行数
+
+@dataclass
+class OCRCandidate:
+    """超过像素阈值的候选帧：已裁剪到文本区域、尚未应用LUT和编码（经采样选中后再生成OCR任务）"""
+    frame_number: int
+    text_type: str
+    pixel_count: int
+    image: np.ndarray  # 裁剪后的过滤ROI（独立拷贝，不引用整条ROI）
+    crop_offset: Tuple[int, int]  # 裁剪区域左上角在ROI中的坐标 (x, y)
+    text_rect: Tuple[int, int, int, int]  # 颜色掩码外接矩形在ROI中的坐标 (x, y, 宽, 高)
+    text_lines: int
+    signature: Optional[np.ndarray] = None  # 颜色掩码签名（采样调度器需要时才计算）
+
 
 @dataclass
 class VideoInfo:
@@ -30,26 +55,160 @@ class VideoInfo:
     height: int
     duration_seconds: float
 
+class FFmpegRoiReader:
+    """ffmpeg ROI解码器：用crop滤镜只输出字幕条带，通过管道读取原始BGR字节"""
+
+    def __init__(self, video_path: str, fps: float, roi_x: int, roi_y: int,
+                 roi_width: int, roi_height: int, ffmpeg_binary: str = FFMPEG_BINARY,
+                 num_buffers: int = 2, frame_index: Optional[FrameIndex] = None):
+        """初始化ROI解码器"""
+        self.video_path = video_path
+        self.fps = fps
+        self.frame_index = frame_index
+        self.roi_x = roi_x
+        self.roi_y = roi_y
+        self.roi_width = roi_width
+        self.roi_height = roi_height
+        self.ffmpeg_binary = ffmpeg_binary
+        self.frame_size = roi_width * roi_height * 3
+
+        # 预分配的轮转缓冲区：上一帧的ROI在下一次读取前始终有效
+        self.buffers = [np.empty((roi_height, roi_width, 3), dtype=np.uint8) for _ in range(num_buffers)]
+
+    @staticmethod
+    def is_available(ffmpeg_binary: str = FFMPEG_BINARY) -> bool:
+        """检查ffmpeg可执行文件是否可用"""
+        return shutil.which(ffmpeg_binary) is not None
+
+    def _build_crop_filter(self) -> str:
+        """
+        构建裁剪滤镜：先在YUV域裁剪一个按色度对齐并留有余量的区域，
+        转换为BGR后再精确裁剪到ROI，使色度插值与OpenCV整帧解码逐像素一致
+        """
+        pad = FFMPEG_CROP_PADDING
+        outer_x = max(0, (self.roi_x - pad) // 2 * 2)
+        outer_y = max(0, (self.roi_y - pad) // 2 * 2)
+        outer_right = self.roi_x + self.roi_width + pad
+        outer_bottom = self.roi_y + self.roi_height + pad
+        return (
+            f"crop=min(iw-{outer_x}\\,{outer_right - outer_x}):min(ih-{outer_y}\\,{outer_bottom - outer_y}):"
+            f"{outer_x}:{outer_y},"
+            f"format=bgr24,"
+            f"crop={self.roi_width}:{self.roi_height}:{self.roi_x - outer_x}:{self.roi_y - outer_y}"
+        )
+
+    def _build_command(self, start_frame: int, num_frames: int, keyframes_only: bool = False) -> List[str]:
+        """构建ffmpeg命令：先seek，再裁剪ROI并输出bgr24原始帧"""
+        crop_filter = self._build_crop_filter()
+        # 有帧索引时按实际PTS定位（VFR也准确）；提前半帧避免时间取整跳过目标帧
+        start_seconds = self.frame_index.frame_time(start_frame) if self.frame_index else start_frame / self.fps
+        start_seconds = max(0.0, start_seconds - 0.5 / self.fps)
+        decoder_options = ['-skip_frame', 'nokey'] if keyframes_only else []
+        return [
+            self.ffmpeg_binary, '-nostdin', '-loglevel', 'error',
+            *decoder_options,
+            '-ss', f"{start_seconds:.6f}",
+            '-i', self.video_path,
+            '-an', '-sn',
+            '-frames:v', str(num_frames),
+            '-vf', crop_filter,
+            '-vsync', 'passthrough',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            'pipe:1'
+        ]
+
+    def read_keyframes(self, start_frame: int, num_keyframes: int) -> Iterator[np.ndarray]:
+        """从关键帧 start_frame 起只解码关键帧，顺序读取 num_keyframes 个关键帧的ROI"""
+        return self.read_frames(start_frame, num_keyframes, keyframes_only=True)
+
+    def read_frames(self, start_frame: int, num_frames: int, keyframes_only: bool = False) -> Iterator[np.ndarray]:
+        """从 start_frame 起顺序读取 num_frames 帧ROI（返回的数组在两次迭代后被复用）"""
+        process = subprocess.Popen(
+            self._build_command(start_frame, num_frames, keyframes_only),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=self.frame_size
+        )
+
+        try:
+            for i in range(num_frames):
+                buffer = self.buffers[i % len(self.buffers)]
+                if not self._read_into(process.stdout, memoryview(buffer).cast('B')):
+                    break
+                yield buffer
+        finally:
+            if process.poll() is None:
+                process.kill()
+            _, stderr = process.communicate()
+            if process.returncode > 0 and stderr:
+                print(f"\n⚠️ ffmpeg解码错误: {stderr.decode(errors='ignore').strip()}")
+
+    @staticmethod
+    def _read_into(stream, view: memoryview) -> bool:
+        """把管道数据直接读入预分配缓冲区，读满返回True"""
+        filled = 0
+        total = len(view)
+        while filled < total:
+            count = stream.readinto(view[filled:])
+            if not count:
+                return False
+            filled += count
+        return True
+
+
+class RoiChangeDetector:
+    """字幕条带变化检测：下采样后与上一次完整分析的ROI做absdiff"""
+
+    def __init__(self, downscale: int = STATIC_ROI_DOWNSCALE, max_diff: int = STATIC_ROI_MAX_DIFF):
+        """初始化变化检测器"""
+        self.downscale = downscale
+        self.max_diff = max_diff
+        self.reference = None
+
+    def signature(self, roi: np.ndarray) -> np.ndarray:
+        """计算ROI的下采样签名"""
+        height, width = roi.shape[:2]
+        size = (max(1, width // self.downscale), max(1, height // self.downscale))
+        return cv2.resize(roi, size, interpolation=cv2.INTER_AREA)
+
+    def is_unchanged(self, signature: np.ndarray) -> bool:
+        """签名与上一次分析的参考签名逐像素差值都不超过阈值时视为未变化"""
+        if self.reference is None or self.reference.shape != signature.shape:
+            return False
+        return int(cv2.absdiff(signature, self.reference).max()) <= self.max_diff
+
+    def update(self, signature: np.ndarray):
+        """记录最近一次完整分析的签名"""
+        self.reference = signature
+
+
 class VideoPreprocessor:
     """视频预处理服务"""
 
-    def __init__(self, video_path: str, start_time: Optional[str] = None, end_time: Optional[str] = None, lut_path: Optional[str] = None):
+    def __init__(self, video_path: str, start_time: Optional[str] = None, end_time: Optional[str] = None,
+                 lut_path: Optional[str] = None, decode_backend: str = DECODE_BACKEND,
+                 static_skip: bool = STATIC_ROI_SKIP, use_frame_index: bool = USE_FRAME_INDEX,
+                 ocr_transport: str = OCR_TRANSPORT, sampler: str = SAMPLING_SCHEDULER):
         """初始化视频预处理器"""
+        if ocr_transport not in ('png', 'shm'):
+            raise ValueError(f"不支持的OCR图像传输方式: {ocr_transport}")
+
         self.video_path = video_path
+        self.ocr_transport = ocr_transport
         self.cap = cv2.VideoCapture(video_path)
 
         if not self.cap.isOpened():
             raise ValueError(f"无法打开视频文件: {video_path}")
 
-        # 获取视频信息
-        self.video_info = self._get_video_info()
+        # 帧索引（首次运行时扫描并写入索引文件，之后直接读取）
+        self.frame_index = FrameIndex.load_or_build(video_path) if use_frame_index else None
 
-        # 处理时间范围
-        self.start_frame = self.time_to_frame(start_time) if start_time else 0
-        self.end_frame = self.time_to_frame(end_time) if end_time else self.video_info.frame_count
+        # 获取视频信息
+        self.video_info = self._read_video_info(self.cap, self.frame_index)
 
-        # 验证时间范围
-        self._validate_time_range(start_time, end_time)
+        # 处理时间范围（超出视频时长时修正）
+        self.start_frame, self.end_frame = self._resolve_frame_range(self.video_info, start_time, end_time,
+                                                                     self.frame_index)
 
         # 计算处理范围
         self.total_frames_to_process = self.end_frame - self.start_frame
@@ -65,19 +224,70 @@ class VideoPreprocessor:
         self.roi_top = int(self.video_info.height * ROI_TOP_RATIO)
         self.roi_right = int(self.video_info.width * ROI_RIGHT_RATIO)
 
+        # 解码后端（ffmpeg不可用时回退到OpenCV）
+        self.roi_reader = None
+        if decode_backend == 'ffmpeg':
+            if FFmpegRoiReader.is_available():
+                self.roi_reader = FFmpegRoiReader(
+                    video_path, self.video_info.fps,
+                    roi_x=self.roi_right, roi_y=0,
+                    roi_width=self.video_info.width - self.roi_right, roi_height=self.roi_top,
+                    frame_index=self.frame_index
+                )
+            else:
+                print(f"⚠️ 警告: 未找到ffmpeg ({FFMPEG_BINARY})，回退到OpenCV解码")
+        elif decode_backend != 'opencv':
+            raise ValueError(f"不支持的解码后端: {decode_backend}")
+        self.decode_backend = 'ffmpeg' if self.roi_reader else 'opencv'
+
+        # OCR采样调度器（按视频帧率换算采样间隔）
+        self.sampler = create_sampler(sampler, self.video_info.fps, self.same_signature)
+        self.inpoint_frames: Dict[Tuple[int, str], int] = {}  # 入点模式: (备用帧, 类型) → 入点帧
+
+        # 颜色分类器（HLS范围预编译为查找表）
+        self.color_classifier = ColorClassifier()
+
+        # 静态ROI跳过：条带未变化时复用上一次的颜色检测结果
+        self.change_detector = RoiChangeDetector() if static_skip else None
+        self._last_color_results: List[Tuple[str, int, np.ndarray]] = []
+        self.detection_stats = {'analyzed_frames': 0, 'static_skipped_frames': 0}
 
         print(f"视频预处理器初始化完成: {video_path}")
         print(f"视频信息: {self.video_info.fps}fps, {self.video_info.width}x{self.video_info.height}")
+        print(f"解码后端: {self.decode_backend}")
         if self.lut_available:
             print(f"LUT增强已启用: {self.lut_path}")
         print(f"处理范围: 帧 {self.start_frame} - {self.end_frame} (共 {self.total_frames_to_process} 帧)")
 
-    def _get_video_info(self) -> VideoInfo:
+    @staticmethod
+    def probe_frame_range(video_path: str, start_time: Optional[str] = None, end_time: Optional[str] = None,
+                          use_frame_index: bool = USE_FRAME_INDEX) -> Tuple[VideoInfo, int, int]:
+        """
+        只读取视频信息并确定处理范围，返回 (视频信息, 起始帧, 结束帧)
+
+        不创建解码后端、颜色分类器和采样调度器，供只需切分帧区间的分布式协调器使用
+        """
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"无法打开视频文件: {video_path}")
+        try:
+            frame_index = FrameIndex.load_or_build(video_path) if use_frame_index else None
+            video_info = VideoPreprocessor._read_video_info(cap, frame_index)
+        finally:
+            cap.release()
+        start_frame, end_frame = VideoPreprocessor._resolve_frame_range(video_info, start_time, end_time, frame_index)
+        return video_info, start_frame, end_frame
+
+    @staticmethod
+    def _read_video_info(cap: cv2.VideoCapture, frame_index: Optional[FrameIndex] = None) -> VideoInfo:
         """获取视频基本信息"""
-        fps = self.cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
-        frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_index:
+            # VFR代理文件的 CAP_PROP_FRAME_COUNT 不可靠，以索引为准
+            frame_count = frame_index.frame_count
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         duration_seconds = frame_count / fps
 
         return VideoInfo(
@@ -88,44 +298,67 @@ class VideoPreprocessor:
             duration_seconds=duration_seconds
         )
 
-    def _validate_time_range(self, start_time: Optional[str], end_time: Optional[str]):
-        """验证时间范围的有效性"""
-        if self.start_frame >= self.video_info.frame_count:
-            print(f"⚠️ 警告: 起始时间 {start_time} 超出视频时长 (视频总帧数: {self.video_info.frame_count})")
-            self.start_frame = 0
-        if self.end_frame > self.video_info.frame_count:
-            print(f"⚠️ 警告: 结束时间 {end_time} 超出视频时长 (视频总帧数: {self.video_info.frame_count})")
-            self.end_frame = self.video_info.frame_count
-        if self.start_frame >= self.end_frame:
+    @staticmethod
+    def _resolve_frame_range(video_info: VideoInfo, start_time: Optional[str], end_time: Optional[str],
+                             frame_index: Optional[FrameIndex] = None) -> Tuple[int, int]:
+        """把时间范围换算为帧区间 [起始帧, 结束帧)，并验证其有效性"""
+        start_frame = VideoPreprocessor._time_to_frame(start_time, video_info.fps, frame_index) if start_time else 0
+        end_frame = (VideoPreprocessor._time_to_frame(end_time, video_info.fps, frame_index)
+                     if end_time else video_info.frame_count)
+
+        if start_frame >= video_info.frame_count:
+            print(f"⚠️ 警告: 起始时间 {start_time} 超出视频时长 (视频总帧数: {video_info.frame_count})")
+            start_frame = 0
+        if end_frame > video_info.frame_count:
+            print(f"⚠️ 警告: 结束时间 {end_time} 超出视频时长 (视频总帧数: {video_info.frame_count})")
+            end_frame = video_info.frame_count
+        if start_frame >= end_frame:
             raise ValueError(f"起始时间不能晚于或等于结束时间")
+        return start_frame, end_frame
 
     def time_to_frame(self, time_str: Optional[str]) -> int:
         """将时间字符串转换为帧号"""
+        return self._time_to_frame(time_str, self.video_info.fps, self.frame_index)
+
+    @staticmethod
+    def _time_to_frame(time_str: Optional[str], fps: float, frame_index: Optional[FrameIndex] = None) -> int:
+        """将时间字符串转换为帧号（有帧索引时按实际PTS换算）"""
         if not time_str:
             return 0
 
         # 支持多种时间格式：HH:MM:SS、MM:SS、SS、HH:MM:SS:FF
         parts = time_str.split(':')
+        frames = 0
         if len(parts) == 4:  # HH:MM:SS:FF
             hours, minutes, seconds, frames = map(int, parts)
             total_seconds = hours * 3600 + minutes * 60 + seconds
-            return int(total_seconds * self.video_info.fps) + frames
         elif len(parts) == 3:  # HH:MM:SS
             hours, minutes, seconds = map(int, parts)
             total_seconds = hours * 3600 + minutes * 60 + seconds
-            return int(total_seconds * self.video_info.fps)
         elif len(parts) == 2:  # MM:SS
             minutes, seconds = map(int, parts)
             total_seconds = minutes * 60 + seconds
-            return int(total_seconds * self.video_info.fps)
         elif len(parts) == 1:  # SS
-            seconds = int(parts[0])
-            return int(seconds * self.video_info.fps)
+            total_seconds = int(parts[0])
         else:
             raise ValueError(f"不支持的时间格式: {time_str}")
 
+        # 有帧索引时按实际PTS换算（VFR文件也准确）
+        if frame_index:
+            return frame_index.time_to_frame(total_seconds) + frames
+        return int(total_seconds * fps) + frames
+
     def frame_to_smpte(self, frame_number: int) -> str:
         """将帧号转换为SMPTE时间码"""
+        # 有帧索引时按实际PTS换算，与 time_to_frame 互为逆运算（VFR文件也一致）：
+        # 秒数取该帧的显示时间，帧数为该秒内第一帧之后的帧数
+        if self.frame_index:
+            whole_seconds = int(self.frame_index.frame_time(frame_number) + 1e-6)
+            frames = frame_number - self.frame_index.time_to_frame(whole_seconds)
+            hours, remainder = divmod(whole_seconds, 3600)
+            minutes, seconds = divmod(remainder, 60)
+            return f"{hours:02d}:{minutes:02d}:{seconds:02d}:{frames:02d}"
+
         total_seconds = frame_number / float(self.video_info.fps)
         hours = int(total_seconds // 3600)
         minutes = int((total_seconds % 3600) // 60)
@@ -175,132 +408,483 @@ class VideoPreprocessor:
         输出: 处理后的BGR格式图像
         """
         try:
-            # 转换为RGB并标准化
-            image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
-            image_normalized = image_rgb.astype(np.float32) / 255.0
+            # 使用进程内缓存的预编译LUT引擎（.cube 只解析一次，只处理掩码内像素）
+            return get_lut_engine(lut_path).apply(image_bgr)
+        except Exception as e:
+            raise Exception(f"LUT处理失败: {str(e)}")
 
-            # 加载LUT
-            lut_3d = colour.io.read_LUT(lut_path)
+    def extract_roi(self, frame: np.ndarray) -> np.ndarray:
+        """从整帧中截取字幕条带ROI"""
+        return frame[0:self.roi_top, self.roi_right:self.video_info.width]
 
-            # 应用LUT
-            try:
-                processed_image = lut_3d.apply(image_normalized)
-            except:
-                # 备用方法
-                height, width, channels = image_normalized.shape
-                image_reshaped = image_normalized.reshape(-1, channels)
-                processed_reshaped = colour.algebra.table_interpolation_trilinear(
-                    image_reshaped, lut_3d.table
-                )
-                processed_image = processed_reshaped.reshape(height, width, channels)
+    def get_colored_pixel_count(self, frame: np.ndarray) -> List[Tuple[str, int, np.ndarray]]:
+        """获取ROI区域中目标颜色像素并返回过滤后的ROI"""
+        return self.detect_colors_in_roi(self.extract_roi(frame))
+
+    def detect_colors_in_roi(self, roi: np.ndarray) -> List[Tuple[str, int, np.ndarray]]:
+        """对已截取的ROI做颜色检测（条带未变化时直接复用上一次的结果）"""
+        signature = None
+        if self.change_detector:
+            signature = self.change_detector.signature(roi)
+            if self.change_detector.is_unchanged(signature):
+                self.detection_stats['static_skipped_frames'] += 1
+                return list(self._last_color_results)
+
+        results = self._classify_roi_colors(roi)
+        self.detection_stats['analyzed_frames'] += 1
+
+        if self.change_detector:
+            self.change_detector.update(signature)
+            self._last_color_results = results
+        return results
 
-            # 裁剪到有效范围
-            processed_image = np.clip(processed_image, 0.0, 1.0)
+    def reset_detection_state(self):
+        """清除静态ROI跳过的参考帧：之后的第一帧完整分析（与新建预处理器时相同）"""
+        if self.change_detector:
+            self.change_detector.reference = None
+        self._last_color_results = []
 
-            # 转换回uint8格式并转为BGR
-            processed_uint8 = (processed_image * 255).astype(np.uint8)
-            processed_bgr = cv2.cvtColor(processed_uint8, cv2.COLOR_RGB2BGR)
+    def _classify_roi_colors(self, roi: np.ndarray) -> List[Tuple[str, int, np.ndarray]]:
+        """颜色分类：查表生成各类别掩码，形态学去噪后统计像素数"""
+        results = []
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
 
-            return processed_bgr
+        for text_type, mask in self.color_classifier.classify(roi):
+            # 形态学去噪
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+            pixel_count = cv2.countNonZero(mask)
+            if pixel_count > PIXEL_THRESHOLD:
+                results.append((text_type, pixel_count, cv2.bitwise_and(roi, roi, mask=mask)))
+        return results
 
-        except Exception as e:
-            raise Exception(f"LUT处理失败: {str(e)}")
+    def should_detect_ocr(self, text_type: str, pixel_count: int, frame_number: Optional[int] = None,
+                          signature: Optional[np.ndarray] = None) -> bool:
+        """判断是否应该进行OCR检测（由采样调度器决定，默认每隔一帧检测一次）"""
+        return self.sampler.should_sample(text_type, pixel_count, frame_number, signature)
 
-    def get_colored_pixel_count(self, frame: np.ndarray) -> List[Tuple[str, int, np.ndarray]]:
-        """获取ROI区域中目标颜色像素并返回过滤后的ROI"""
-        roi = frame[0:self.roi_top, self.roi_right:self.video_info.width]
-        # 使用HLS颜色空间
-        hls = cv2.cvtColor(roi, cv2.COLOR_BGR2HLS)
-        green_mask = cv2.inRange(hls, LOWER_GREEN_HLS, UPPER_GREEN_HLS)
-        orange_mask = cv2.inRange(hls, LOWER_ORANGE_HLS, UPPER_ORANGE_HLS)
+    def sampling_signature(self, filtered_roi: np.ndarray) -> Optional[np.ndarray]:
+        """采样调度器判断字幕变化所需的颜色掩码签名（调度器不需要时返回 None，不计算）"""
+        return self.mask_signature(filtered_roi) if self.sampler.uses_signature else None
 
-        # 形态学去噪
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        green_mask = cv2.morphologyEx(green_mask, cv2.MORPH_OPEN, kernel)
-        orange_mask = cv2.morphologyEx(orange_mask, cv2.MORPH_OPEN, kernel)
+    def measure_text_lines(self, filtered_roi: np.ndarray) -> Tuple[Tuple[int, int, int, int], int]:
+        """
+        测量颜色掩码的外接矩形和文本行数
 
-        green_only = cv2.bitwise_and(roi, roi, mask=green_mask)
-        orange_only = cv2.bitwise_and(roi, roi, mask=orange_mask)
+        掩码外的像素已被置零，而字幕颜色像素的亮度远大于零，因此灰度非零区域即掩码区域。
+        行数为按至少 OCR_LINE_MIN_GAP 个空行分隔、且高度不低于 OCR_LINE_MIN_HEIGHT 的行段数。
+        返回: ((x, y, 宽, 高), 行数)
+        """
+        gray = cv2.cvtColor(filtered_roi, cv2.COLOR_BGR2GRAY)
+        text_rect = cv2.boundingRect(gray)
+
+        # 有文字的行 → 行段起止位置
+        has_text = np.concatenate(([False], np.count_nonzero(gray, axis=1) > 0, [False]))
+        edges = np.flatnonzero(np.diff(has_text.astype(np.int8)))
+        starts, ends = edges[0::2], edges[1::2]
+
+        line_count = 0
+        line_start = line_end = None
+        for start, end in zip(starts, ends):
+            if line_end is not None and start - line_end < OCR_LINE_MIN_GAP:
+                line_end = end
+                continue
+            if line_end is not None and line_end - line_start >= OCR_LINE_MIN_HEIGHT:
+                line_count += 1
+            line_start, line_end = start, end
+        if line_end is not None and line_end - line_start >= OCR_LINE_MIN_HEIGHT:
+            line_count += 1
 
-        green_count = cv2.countNonZero(green_mask)
-        orange_count = cv2.countNonZero(orange_mask)
+        return text_rect, line_count
 
-        results = []
-        if green_count > PIXEL_THRESHOLD:
-            results.append(("VFX", green_count, green_only))
-        if orange_count > PIXEL_THRESHOLD:
-            results.append(("DI", orange_count, orange_only))
-        return results
+    def prepare_ocr_image(self, filtered_roi: np.ndarray,
+                          text_rect: Tuple[int, int, int, int]) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+        """
+        按颜色掩码的外接矩形（加边距）裁剪触发的ROI
+
+        返回: (裁剪后的图像, 裁剪区域左上角在ROI中的坐标)；掩码为空时返回 None
+        """
+        if not OCR_CROP_TO_TEXT:
+            return filtered_roi, (0, 0)
+
+        x, y, width, height = text_rect
+        if width == 0 or height == 0:
+            return None
+
+        roi_height, roi_width = filtered_roi.shape[:2]
+        x1, y1 = max(0, x - OCR_CROP_MARGIN), max(0, y - OCR_CROP_MARGIN)
+        x2 = min(roi_width, x + width + OCR_CROP_MARGIN)
+        y2 = min(roi_height, y + height + OCR_CROP_MARGIN)
+        return filtered_roi[y1:y2, x1:x2], (x1, y1)
+
+    def normalize_line_image(self, image: np.ndarray) -> Tuple[np.ndarray, float]:
+        """可选：缩放到固定行高、二值化为单通道（白底黑字），返回 (图像, 缩放比例)"""
+        scale = 1.0
+        if OCR_BINARIZE:
+            gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            _, image = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV)
+
+        if OCR_LINE_HEIGHT:
+            scale = OCR_LINE_HEIGHT / image.shape[0]
+            new_width = max(1, int(round(image.shape[1] * scale)))
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            image = cv2.resize(image, (new_width, OCR_LINE_HEIGHT), interpolation=interpolation)
+
+        return image, scale
+
+    def build_frame_data(self, frame_number: int, text_type: str, pixel_count: int,
+                         filtered_roi: np.ndarray) -> Optional[FrameData]:
+        """对触发的ROI裁剪到文本区域、应用LUT并编码，生成可序列化的OCR任务"""
+        candidate = self.prepare_candidate(frame_number, text_type, pixel_count, filtered_roi)
+        return self.build_task(candidate) if candidate else None
+
+    def prepare_candidate(self, frame_number: int, text_type: str, pixel_count: int,
+                          filtered_roi: np.ndarray) -> Optional[OCRCandidate]:
+        """测量文本行并裁剪到文本区域（开销很小）；掩码为空时返回 None"""
+        text_rect, text_lines = self.measure_text_lines(filtered_roi)
+        cropped = self.prepare_ocr_image(filtered_roi, text_rect)
+        if cropped is None:
+            return None
+        image, crop_offset = cropped
+        return OCRCandidate(frame_number, text_type, pixel_count, image.copy(), crop_offset, text_rect, text_lines)
+
+    def build_task(self, candidate: OCRCandidate) -> Optional[FrameData]:
+        """对候选帧应用LUT、缩放/二值化并编码，生成可序列化的OCR任务
+
+        共享内存传输时保存原始像素（由协调器写入环形缓冲区），否则编码为PNG
+        """
+        frame_number, text_type = candidate.frame_number, candidate.text_type
+        processed_roi, crop_offset = candidate.image, candidate.crop_offset
 
-    def should_detect_ocr(self, text_type: str, pixel_count: int) -> bool:
-        """判断是否应该进行OCR检测 - 简化版：只要超过像素阈值就检测"""
-        # 初始化采样计数器（如果不存在）
-        if not hasattr(self, '_sample_counters'):
-            self._sample_counters = {'VFX': 0, 'DI': 0}
+        # 应用LUT处理（如果可用；二值化输出与颜色无关，无需LUT）
+        if self.lut_available and self.lut_path and not OCR_BINARIZE:
+            try:
+                processed_roi = self.apply_lut_processing(processed_roi, self.lut_path)
+                print(f"\n已应用LUT处理: 帧 {frame_number} ({text_type})")
+            except Exception as e:
+                print(f"\nLUT处理失败，使用原图: {e}")
+
+        processed_roi, crop_scale = self.normalize_line_image(processed_roi)
 
-        # 只要超过像素阈值就检测（移除了历史记录判断）
-        if pixel_count > PIXEL_THRESHOLD:
-            # 实现2帧检测1帧的采样：每2帧中只检测第0帧和第2帧
-            counter = self._sample_counters[text_type]
-            self._sample_counters[text_type] = (counter + 1) % 2
-            return counter == 0  # 只有计数器为0时才检测（即每隔一帧检测一次）
+        # 掩码外接矩形在OCR图像中的坐标（仅识别模式直接作为文本框）
+        x, y, width, height = candidate.text_rect
+        text_bbox = (int((x - crop_offset[0]) * crop_scale), int((y - crop_offset[1]) * crop_scale),
+                     int((x + width - crop_offset[0]) * crop_scale), int((y + height - crop_offset[1]) * crop_scale))
 
-        return False
+        # 将处理后的图像转换为字节流（可序列化）
+        if self.ocr_transport == 'shm':
+            image_format, image_bytes = 'raw', np.ascontiguousarray(processed_roi).tobytes()
+        else:
+            success, encoded_img = cv2.imencode('.png', processed_roi)
+            if not success:
+                print(f"图像编码失败: 帧{frame_number}")
+                return None
+            image_format, image_bytes = 'png', encoded_img.tobytes()
+
+        return FrameData(
+            frame_number=frame_number,
+            timecode=self.frame_to_smpte(frame_number),
+            image_bytes=image_bytes,  # 字节流
+            pixel_count=candidate.pixel_count,
+            text_type=text_type,
+            image_shape=processed_roi.shape,  # 保存形状信息
+            crop_offset=crop_offset,
+            crop_scale=crop_scale,
+            image_format=image_format,
+            image_dtype=processed_roi.dtype.name,
+            text_bbox=text_bbox,
+            text_lines=candidate.text_lines
+        )
 
     def process_frames_batch(self, batch_frames: List[int]) -> List[FrameData]:
         """批量处理帧，返回需要OCR的帧数据"""
         ocr_frames = []
 
         for frame_number in batch_frames:
-            # 设置视频位置
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-            ret, frame = self.cap.read()
-
-            if not ret:
+            # 随机访问读取该帧的ROI
+            roi = self.read_roi_at(frame_number)
+            if roi is None:
                 continue
 
             # 颜色检测
-            color_results = self.get_colored_pixel_count(frame)
+            color_results = self.detect_colors_in_roi(roi)
 
             for text_type, pixel_count, filtered_roi in color_results:
                 # 判断是否需要OCR
-                if self.should_detect_ocr(text_type, pixel_count):
-                    # 应用LUT处理（如果可用）
-                    processed_roi = filtered_roi
-                    if self.lut_available and self.lut_path:
-                        try:
-                            processed_roi = self.apply_lut_processing(filtered_roi, self.lut_path)
-                            print(f"\n已应用LUT处理: 帧 {frame_number} ({text_type})")
-                        except Exception as e:
-                            print(f"\nLUT处理失败，使用原图: {e}")
-
-                    # 将处理后的图像编码为字节流（可序列化）
-                    success, encoded_img = cv2.imencode('.png', processed_roi)
-                    if success:
-                        image_bytes = encoded_img.tobytes()
-                        frame_data = FrameData(
-                            frame_number=frame_number,
-                            timecode=self.frame_to_smpte(frame_number),
-                            image_bytes=image_bytes,  # 字节流
-                            pixel_count=pixel_count,
-                            text_type=text_type,
-                            image_shape=processed_roi.shape  # 保存形状信息
-                        )
-                    else:
-                        print(f"图像编码失败: 帧{frame_number}")
-                        continue
-                    ocr_frames.append(frame_data)
+                if self.should_detect_ocr(text_type, pixel_count, frame_number,
+                                          self.sampling_signature(filtered_roi)):
+                    frame_data = self.build_frame_data(frame_number, text_type, pixel_count, filtered_roi)
+                    if frame_data:
+                        ocr_frames.append(frame_data)
 
         return ocr_frames
 
+    def read_roi_at(self, frame_number: int) -> Optional[np.ndarray]:
+        """随机访问读取指定帧的ROI"""
+        self._seek_to(frame_number)
+        ret, frame = self.cap.read()
+        if not ret:
+            return None
+        return self.extract_roi(frame)
+
+    def _seek_to(self, frame_number: int):
+        """
+        定位到指定帧，使下一次 read() 返回该帧
+
+        目标在当前位置之后不远，或（有帧索引时）两者之间没有关键帧，则顺序grab：
+        此时seek也只能从同一个关键帧重新解码，反而更慢。
+        有帧索引时seek到目标之前最近的关键帧再grab到目标帧；没有帧索引时按帧号seek。
+
+        OpenCV（FFmpeg后端）按平均帧率把 CAP_PROP_POS_FRAMES 换算为时间戳再seek，恒定帧率时准确；
+        VFR视频上换算出的位置可能偏离索引中的帧号，seek到关键帧也不能避免，read() 返回的帧
+        可能与目标帧相差若干帧。VFR视频需要准确的随机访问时使用ffmpeg解码后端（按索引中的实际PTS定位）。
+        """
+        position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        gap = frame_number - position
+
+        if self.frame_index:
+            keyframe = self.frame_index.keyframe_at_or_before(frame_number)
+            if gap < 0 or (gap > FORWARD_GRAB_LIMIT and keyframe > position):
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+                gap = frame_number - keyframe
+        elif gap < 0 or gap > FORWARD_GRAB_LIMIT:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            return
+
+        for _ in range(gap):
+            self.cap.grab()
+
+    def get_probe_frames(self, mode: str = PROBE_MODE, step: int = PROBE_STEP) -> List[int]:
+        """两遍扫描第一遍的探测帧：每隔 step 帧，或（有帧索引时）仅关键帧"""
+        if mode == 'keyframes':
+            if self.frame_index and not self.frame_index.is_intra_only:
+                return self.frame_index.keyframes_in_range(self.start_frame, self.end_frame)
+            print("⚠️ 警告: 无帧索引或视频为全关键帧编码，关键帧探测回退为固定间隔探测")
+        elif mode != 'step':
+            raise ValueError(f"不支持的探测模式: {mode}")
+        return list(range(self.start_frame, self.end_frame, step))
+
+    def probe_active_intervals(self, probe_frames: List[int], guard: int = PROBE_GUARD_FRAMES) -> List[Tuple[int, int]]:
+        """
+        两遍扫描的第一遍：在探测帧上统计颜色像素，返回需要全帧率解码的区间
+
+        持续时间不短于探测间隔的字幕必然覆盖至少一个探测点，其起止帧落在相邻探测点之间，
+        因此每个活跃探测点向两侧扩展到相邻探测点（再加 guard 帧保护带）即可完整覆盖。
+        """
+        intervals: List[Tuple[int, int]] = []
+
+        for i, (frame_number, roi) in enumerate(self._iter_probe_rois(probe_frames)):
+            if not self.detect_colors_in_roi(roi):
+                continue
+
+            previous_probe = probe_frames[i - 1] if i > 0 else self.start_frame - 1
+            next_probe = probe_frames[i + 1] if i + 1 < len(probe_frames) else self.end_frame
+            interval_start = max(self.start_frame, previous_probe + 1 - guard)
+            interval_end = min(self.end_frame, next_probe + guard)
+            if intervals and interval_start <= intervals[-1][1]:
+                intervals[-1] = (intervals[-1][0], interval_end)
+            else:
+                intervals.append((interval_start, interval_end))
+
+        return intervals
+
+    def _iter_probe_rois(self, probe_frames: List[int]) -> Iterator[Tuple[int, np.ndarray]]:
+        """逐个读取探测帧的ROI；探测帧全是关键帧且使用ffmpeg时只解码关键帧"""
+        if (self.roi_reader and self.frame_index and probe_frames and
+                probe_frames == self.frame_index.keyframes_in_range(probe_frames[0], probe_frames[-1] + 1)):
+            rois = self.roi_reader.read_keyframes(probe_frames[0], len(probe_frames))
+            yield from zip(probe_frames, rois)
+            return
+
+        for frame_number in probe_frames:
+            roi = self.read_roi_at(frame_number)
+            if roi is None:
+                return
+            yield frame_number, roi
+
+    def collect_ocr_candidates(self, frame_ranges: List[Tuple[int, int]],
+                               should_stop: Optional[Callable[[], bool]] = None) -> Tuple[List[OCRCandidate], dict]:
+        """
+        顺序解码各个 [start, end) 帧区间，对所有超过阈值的颜色类型生成候选帧（只裁剪，不应用LUT、不编码）
+
+        不应用采样逻辑：分段并行时采样计数器跨越分段边界，
+        必须由协调器按帧顺序统一回放 should_detect_ocr，才能与顺序模式结果一致；
+        LUT和编码只对选中的候选帧执行（build_task）。从独立的检测状态开始，同一进程可依次处理多个分段。
+        should_stop 每帧解码前调用，返回真时提前结束（结果不完整，由调用方丢弃）。
+        返回: (候选帧列表, 本次的统计信息)
+        """
+        self.reset_detection_state()
+        stats_before = dict(self.detection_stats)
+        candidates: List[OCRCandidate] = []
+        decoded_frames = 0
+
+        for start_frame, end_frame in frame_ranges:
+            if should_stop and should_stop():
+                break
+            for frame_number, roi in self.iter_roi_frames(start_frame, end_frame):
+                if should_stop and should_stop():
+                    break
+                for text_type, pixel_count, filtered_roi in self.detect_colors_in_roi(roi):
+                    candidate = self.prepare_candidate(frame_number, text_type, pixel_count, filtered_roi)
+                    if candidate:
+                        candidate.signature = self.sampling_signature(filtered_roi)
+                        candidates.append(candidate)
+
+                decoded_frames += 1
+
+        stats = {key: self.detection_stats[key] - stats_before[key] for key in self.detection_stats}
+        stats['decoded_frames'] = decoded_frames
+        return candidates, stats
+
+    @staticmethod
+    def mask_signature(filtered_roi: np.ndarray) -> np.ndarray:
+        """颜色掩码的下采样签名（每格为掩码覆盖率 × 255），用于判断是否仍是同一条字幕"""
+        mask = np.where(filtered_roi.any(axis=2), 255, 0).astype(np.uint8)
+        height, width = mask.shape
+        size = (max(1, width // BISECT_SIGNATURE_DOWNSCALE), max(1, height // BISECT_SIGNATURE_DOWNSCALE))
+        return cv2.resize(mask, size, interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def same_signature(signature1: np.ndarray, signature2: np.ndarray) -> bool:
+        """两个掩码签名逐像素差值都不超过阈值时视为同一条字幕"""
+        return (signature1.shape == signature2.shape and
+                int(cv2.absdiff(signature1, signature2).max()) <= BISECT_SIGNATURE_MAX_DIFF)
+
+    def read_caption_state(self, frame_number: int) -> Dict[str, Tuple[int, np.ndarray, np.ndarray]]:
+        """读取指定帧的字幕状态 {类型: (像素数, 过滤后的ROI, 掩码签名)}，读取失败视为无字幕"""
+        roi = self.read_roi_at(frame_number)
+        if roi is None:
+            return {}
+        return {
+            text_type: (pixel_count, filtered_roi, self.mask_signature(filtered_roi))
+            for text_type, pixel_count, filtered_roi in self.detect_colors_in_roi(roi)
+        }
+
+    def same_caption_state(self, state1: dict, state2: dict) -> bool:
+        """两帧出现的字幕类型相同且各类型的掩码签名一致"""
+        return state1.keys() == state2.keys() and all(
+            self.same_signature(state1[text_type][2], state2[text_type][2]) for text_type in state1
+        )
+
+    def iter_inpoint_tasks(self, step: int = BISECT_STEP,
+                           min_caption_frames: int = BISECT_MIN_CAPTION_FRAMES) -> Iterator[FrameData]:
+        """
+        稀疏采样 + 二分定位：只对每条字幕的入点帧生成OCR任务
+
+        每隔 step 帧读取一次字幕状态，相邻采样点状态不同时二分查找状态变化的确切帧，
+        因此入点与逐帧扫描一致；持续时间不短于 step 的字幕必然覆盖至少一个采样点。
+        某类型出现或掩码签名变化时开始一条新字幕，字幕结束时若持续不少于 min_caption_frames 帧
+        （逐帧扫描的连续帧去重会丢弃更短的字幕）则产出其入点帧的任务，因此任务按结束顺序产出。
+        入点帧常处于淡入中，每条字幕另外产出入点之后 BISECT_FALLBACK_FRAMES 个备用帧的任务，
+        备用帧到入点帧的对应关系记录在 inpoint_frames 中，供后处理为每条字幕只保留一个结果。
+        """
+        self.inpoint_frames.clear()
+        sample_frames = list(range(self.start_frame, self.end_frame, step))
+        if sample_frames[-1] != self.end_frame - 1:
+            sample_frames.append(self.end_frame - 1)
+
+        open_captions = {}  # 类型 → (入点帧, 像素数, 过滤后的ROI, 掩码签名)
+        previous_frame, previous_state = self.start_frame - 1, {}
+        for frame_number in sample_frames:
+            state = self.read_caption_state(frame_number)
+            for change_frame, change_state in self._bisect_state_changes(previous_frame, previous_state,
+                                                                         frame_number, state):
+                yield from self._update_open_captions(open_captions, change_frame, change_state, min_caption_frames)
+            previous_frame, previous_state = frame_number, state
+
+        yield from self._update_open_captions(open_captions, self.end_frame, {}, min_caption_frames)
+
+    def _bisect_state_changes(self, left_frame: int, left_state: dict,
+                              right_frame: int, right_state: dict) -> List[Tuple[int, dict]]:
+        """在 (left_frame, right_frame] 中二分查找字幕状态变化的帧，按帧顺序返回 [(变化帧, 变化后的状态)]"""
+        if self.same_caption_state(left_state, right_state):
+            return []
+        if right_frame - left_frame == 1:
+            return [(right_frame, right_state)]
+
+        middle_frame = (left_frame + right_frame) // 2
+        middle_state = self.read_caption_state(middle_frame)
+        return (self._bisect_state_changes(left_frame, left_state, middle_frame, middle_state) +
+                self._bisect_state_changes(middle_frame, middle_state, right_frame, right_state))
+
+    def _update_open_captions(self, open_captions: dict, frame_number: int, state: dict,
+                              min_caption_frames: int) -> Iterator[FrameData]:
+        """在状态变化帧上结束消失或变化的字幕（足够长的产出入点任务），并开始新出现的字幕"""
+        for text_type in list(open_captions):
+            start_frame, pixel_count, filtered_roi, signature = open_captions[text_type]
+            if text_type in state and self.same_signature(signature, state[text_type][2]):
+                continue
+
+            del open_captions[text_type]
+            if frame_number - start_frame >= min_caption_frames:
+                frame_data = self.build_frame_data(start_frame, text_type, pixel_count, filtered_roi)
+                if frame_data:
+                    yield frame_data
+                yield from self._iter_fallback_tasks(start_frame, frame_number, text_type)
+
+        for text_type, (pixel_count, filtered_roi, signature) in state.items():
+            if text_type not in open_captions:
+                open_captions[text_type] = (frame_number, pixel_count, filtered_roi, signature)
+
+    def _iter_fallback_tasks(self, start_frame: int, end_frame: int, text_type: str) -> Iterator[FrameData]:
+        """字幕 [start_frame, end_frame) 入点之后备用帧的OCR任务（该帧仍有此类型字幕时）"""
+        for offset in range(1, BISECT_FALLBACK_FRAMES + 1):
+            fallback_frame = start_frame + offset * BISECT_FALLBACK_STEP
+            if fallback_frame >= end_frame:
+                break
+            state = self.read_caption_state(fallback_frame)
+            if text_type not in state:
+                continue
+            pixel_count, filtered_roi, _ = state[text_type]
+            frame_data = self.build_frame_data(fallback_frame, text_type, pixel_count, filtered_roi)
+            if frame_data:
+                self.inpoint_frames[(fallback_frame, text_type)] = start_frame
+                yield frame_data
+
+    def iter_roi_frames(self, start_frame: int, end_frame: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """顺序解码 [start_frame, end_frame)，逐帧产出 (帧号, ROI)"""
+        if self.roi_reader:
+            frames = self.roi_reader.read_frames(start_frame, end_frame - start_frame)
+            for frame_number, roi in enumerate(frames, start=start_frame):
+                yield frame_number, roi
+            return
+
+        self._seek_to(start_frame)
+        for frame_number in range(start_frame, end_frame):
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            yield frame_number, self.extract_roi(frame)
+
+    @staticmethod
+    def partition_frame_ranges(frame_ranges: List[Tuple[int, int]], num_chunks: int) -> List[List[Tuple[int, int]]]:
+        """将有序的帧区间列表按帧数均匀切分为最多 num_chunks 个连续分段，每个分段是一组区间"""
+        total_frames = sum(end - start for start, end in frame_ranges)
+        if total_frames <= 0:
+            return []
+        chunk_size = -(-total_frames // max(1, num_chunks))
+
+        chunks: List[List[Tuple[int, int]]] = [[]]
+        chunk_frames = 0
+        for start, end in frame_ranges:
+            while start < end:
+                if chunk_frames >= chunk_size:
+                    chunks.append([])
+                    chunk_frames = 0
+                piece_end = min(end, start + chunk_size - chunk_frames)
+                chunks[-1].append((start, piece_end))
+                chunk_frames += piece_end - start
+                start = piece_end
+        return chunks
+
     def get_all_frames_to_process(self) -> List[int]:
         """获取所有需要处理的帧号列表"""
         return list(range(self.start_frame, self.end_frame))
 
-    def get_progress_info(self, processed_frames: int) -> str:
+    def get_progress_info(self, processed_frames: int, total_frames: Optional[int] = None) -> str:
         """获取处理进度信息"""
-        if self.total_frames_to_process > 0:
-            progress = (processed_frames / self.total_frames_to_process) * 100
+        total_frames = self.total_frames_to_process if total_frames is None else total_frames
+        if total_frames > 0:
+            progress = (processed_frames / total_frames) * 100
             return f"{progress:.2f}%"
         return "进度计算中..."
 